@@ -0,0 +1,61 @@
+"""Measures the peak memory used while holding every function extracted from a
+synthetic source tree, as `pygendocs check` does.
+
+Usage:
+    python benchmarks/bench_memory.py --files 2000 --functions 40
+"""
+import argparse
+import json
+import resource
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+from synthetic import TreeSpec, generate_tree
+
+from pygendocs.functions import get_functions_from_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--functions", type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = generate_tree(
+            Path(tmp),
+            TreeSpec(
+                files=args.files,
+                functions=args.functions,
+                depth=0,
+                docstring_ratio=0,
+                method_ratio=0,
+            ),
+        )
+
+        baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        start = time.perf_counter()
+        functions = get_functions_from_files(paths)
+        elapsed = time.perf_counter() - start
+
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    json.dump(
+        {
+            "files": args.files,
+            "functions": len(functions),
+            "seconds": round(elapsed, 3),
+            "peak_rss_mb": round(peak_kb / 1024, 1),
+            "scan_rss_mb": round((peak_kb - baseline_kb) / 1024, 1),
+        },
+        sys.stdout,
+    )
+    print()
+
+
+if __name__ == "__main__":
+    main()
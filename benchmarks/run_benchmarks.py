@@ -0,0 +1,265 @@
+"""Benchmark suite for pygendocs, run against a synthetic source tree.
+
+Measures scanning, filtering, and writing docstrings in process, and the `check`
+command and peak memory of a scan in fresh interpreters. Results are written as
+JSON, and can be compared against a previously stored baseline.
+
+Usage:
+    python benchmarks/run_benchmarks.py --files 500 --output results.json
+    python benchmarks/run_benchmarks.py --baseline results.json --fail-on-regression
+"""
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from synthetic import TreeSpec, generate_tree
+
+from pygendocs.cli import filter_functions, get_functions_from_paths
+from pygendocs.config import PyGenDocsConfiguration
+from pygendocs.functions import write_new_docstring, write_new_docstrings
+
+_MEMORY_SCRIPT = """
+import resource, sys
+from pygendocs.config import PyGenDocsConfiguration
+from pygendocs.cli import get_functions_from_paths
+
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+cfg = PyGenDocsConfiguration(scan_index=False, jobs=int(sys.argv[2]))
+functions = get_functions_from_paths([sys.argv[1]], cfg)
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(len(functions), before, after)
+"""
+"""Scans a tree and prints the function count, and peak RSS in KiB before and
+after scanning. Run in a fresh interpreter so earlier benchmarks don't inflate it."""
+
+
+def timed(
+    fn: Callable[[], object],
+    repeat: int,
+    setup: Optional[Callable[[], None]] = None,
+) -> Dict[str, float]:
+    """Time `repeat` calls of `fn`, calling `setup` untimed before each one."""
+    samples = []
+
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    return {
+        "min_s": round(min(samples), 4),
+        "median_s": round(statistics.median(samples), 4),
+    }
+
+
+def run_suite(root: Path, repeat: int, jobs: int, writes: int) -> Dict[str, dict]:
+    """Run every benchmark against the tree at `root`."""
+    results = {}
+
+    cfg = PyGenDocsConfiguration(
+        scan_index=False, jobs=jobs, cache_dir=str(root / ".pygendocs_cache")
+    )
+    indexed_cfg = cfg.model_copy(update={"scan_index": True})
+
+    ### Scanning
+    results["scan"] = timed(lambda: get_functions_from_paths([root], cfg), repeat)
+
+    get_functions_from_paths([root], indexed_cfg)
+    results["scan_warm_index"] = timed(
+        lambda: get_functions_from_paths([root], indexed_cfg), repeat
+    )
+
+    functions = get_functions_from_paths([root], cfg)
+    results["filter"] = timed(lambda: filter_functions(functions, cfg), repeat)
+
+    ### Writing, to a fresh copy of the tree each time
+    work = root.parent / "write_copy"
+
+    def _copy_tree():
+        shutil.rmtree(work, ignore_errors=True)
+        shutil.copytree(root, work, ignore=shutil.ignore_patterns(".pygendocs_cache"))
+
+    def _targets():
+        missing = filter_functions(get_functions_from_paths([work], cfg), cfg)
+        return {fn: "Synthetic docstring." for fn in missing[:writes]}
+
+    def _write_each():
+        targets = _targets()
+
+        # NOTE: Insert from the bottom of each file upwards, so that the line
+        #       numbers of functions which haven't been written yet stay correct.
+        for fn in sorted(
+            targets, key=lambda fn: (fn.source_file, fn.lineno), reverse=True
+        ):
+            write_new_docstring(fn, targets[fn])
+
+    results["write_each"] = timed(_write_each, repeat, setup=_copy_tree)
+    results["write_batched"] = timed(
+        lambda: write_new_docstrings(_targets(), jobs), repeat, setup=_copy_tree
+    )
+
+    shutil.rmtree(work, ignore_errors=True)
+
+    ### End to end, including interpreter startup
+    results["check_command"] = timed(
+        lambda: _run_check(root, ["--no-index"], jobs), repeat
+    )
+    results["check_command_warm_index"] = timed(
+        lambda: _run_check(root, ["--index"], jobs), repeat
+    )
+
+    ### Peak memory
+    out = subprocess.run(
+        [sys.executable, "-c", _MEMORY_SCRIPT, str(root), str(jobs)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+
+    count, before_kb, after_kb = (int(x) for x in out[-3:])
+
+    results["scan_memory"] = {
+        "functions": count,
+        "peak_rss_mb": round(after_kb / 1024, 1),
+        "scan_rss_mb": round((after_kb - before_kb) / 1024, 1),
+    }
+
+    return results
+
+
+def _run_check(root: Path, args: List[str], jobs: int):
+    # NOTE: `check` exits 1 when coverage is under the threshold, which is expected
+    #       for synthetic trees.
+    proc = subprocess.run(
+        [sys.executable, "-m", "pygendocs", "check", ".", "--jobs", str(jobs), *args],
+        cwd=root,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+    if proc.returncode not in (0, 1):
+        raise RuntimeError(f"check command failed:\n{proc.stderr}")
+
+
+def compare(
+    results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float
+) -> List[str]:
+    """Print a comparison of `results` against `baseline` to stderr, and return the
+    names of metrics which regressed by more than `tolerance`."""
+    regressions = []
+
+    print(
+        f"{'metric':<40} {'baseline':>10} {'current':>10} {'ratio':>7}",
+        file=sys.stderr,
+    )
+
+    for bench, metrics in results.items():
+        for metric, value in metrics.items():
+            if not metric.endswith(("_s", "_mb")):
+                continue
+
+            old = baseline.get(bench, {}).get(metric)
+
+            if not old:
+                continue
+
+            ratio = value / old
+            name = f"{bench}.{metric}"
+            flag = ""
+
+            if ratio > 1 + tolerance:
+                regressions.append(name)
+                flag = "  REGRESSION"
+
+            print(
+                f"{name:<40} {old:>10} {value:>10} {ratio:>6.2f}x{flag}",
+                file=sys.stderr,
+            )
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+
+    spec_defaults = TreeSpec()
+
+    for name, value in spec_defaults.to_dict().items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=type(value), default=value
+        )
+
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument(
+        "--writes", type=int, default=200, help="Number of docstrings written."
+    )
+    parser.add_argument("--output", type=Path, help="File to write results to.")
+    parser.add_argument("--baseline", type=Path, help="Results file to compare to.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Fractional slowdown or growth over the baseline counted as a regression.",
+    )
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    spec = TreeSpec(**{k: getattr(args, k) for k in spec_defaults.to_dict()})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "tree"
+        generate_tree(root, spec)
+
+        results = run_suite(root, args.repeat, args.jobs, args.writes)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "repeat": args.repeat,
+            "jobs": args.jobs,
+            "writes": args.writes,
+            "tree": spec.to_dict(),
+        },
+        "results": results,
+    }
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+
+        if baseline["meta"]["tree"] != spec.to_dict():
+            print(
+                "WARNING: baseline was run against a different tree.", file=sys.stderr
+            )
+
+        regressions = compare(results, baseline["results"], args.tolerance)
+
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
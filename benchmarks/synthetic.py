@@ -0,0 +1,97 @@
+"""Generation of synthetic python source trees for benchmarking pygendocs.
+
+Trees are generated deterministically from a seed, so the same parameters always
+produce the same files.
+"""
+import random
+
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List
+
+
+@dataclass
+class TreeSpec:
+    """Shape of a synthetic source tree."""
+
+    files: int = 200
+    """Number of python files in the tree."""
+
+    functions: int = 40
+    """Number of functions in each file."""
+
+    depth: int = 2
+    """Number of nested package directories files are spread across."""
+
+    fanout: int = 4
+    """Number of subdirectories in each package directory."""
+
+    docstring_ratio: float = 0.5
+    """Fraction of functions which already have a docstring."""
+
+    method_ratio: float = 0.25
+    """Fraction of functions defined as methods of a class."""
+
+    body_lines: int = 12
+    """Average number of statements in each function body. Actual bodies vary
+    between half and one and a half times this, so file sizes vary too."""
+
+    seed: int = 0
+    """Seed for the random number generator shaping the tree."""
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def generate_tree(root: Path, spec: TreeSpec) -> List[Path]:
+    """Write a synthetic source tree shaped by `spec` beneath `root`.
+
+    Returns the paths of the generated files.
+    """
+    rng = random.Random(spec.seed)
+    paths = []
+
+    for i in range(spec.files):
+        directory = root
+
+        for level in range(spec.depth):
+            directory = directory / f"pkg_{(i // spec.fanout**level) % spec.fanout}"
+
+        directory.mkdir(parents=True, exist_ok=True)
+
+        p = directory / f"module_{i}.py"
+        p.write_text(_module_source(rng, spec))
+        paths.append(p)
+
+    return paths
+
+
+def _module_source(rng: random.Random, spec: TreeSpec) -> str:
+    methods = round(spec.functions * spec.method_ratio)
+    parts = ['"""Synthetic module."""\nimport os\n\n\n']
+
+    for j in range(spec.functions - methods):
+        parts.append(_function_source(rng, spec, f"function_{j}", "") + "\n\n")
+
+    if methods:
+        parts.append("class Synthetic:\n")
+
+        for j in range(methods):
+            parts.append(_function_source(rng, spec, f"method_{j}", "    ") + "\n")
+
+    return "".join(parts)
+
+
+def _function_source(rng: random.Random, spec: TreeSpec, name: str, indent: str) -> str:
+    lines = [f"{indent}def {name}(a, b, c=None):"]
+
+    if rng.random() < spec.docstring_ratio:
+        lines.append(f'{indent}    """Synthetic function {name}."""')
+
+    lines.extend(
+        f"{indent}    x_{k} = a + b * {k}"
+        for k in range(max(1, round(spec.body_lines * rng.uniform(0.5, 1.5))))
+    )
+    lines.append(f"{indent}    return x_0\n")
+
+    return "\n".join(lines)
@@ -19,8 +19,9 @@ from rich.status import Status
 from rich.markup import escape
 from rich.prompt import Prompt
 
-from . import llm
-from .llm import get_llm_api_client, dispatch_completion, generate_function_docstring
+# NOTE: Modules which depend on openai, tiktoken, or GitPython are
+#       imported inside the commands that use them. Those imports dominate startup
+#       time, and commands such as `check` are run frequently in pre-commit hooks.
 from .cli import (
     clean_input_paths,
     print_message,
@@ -30,89 +31,210 @@ from .cli import (
     print_function,
     get_updated_config,
     format_function_location,
+    format_api_urls,
     answered_yes,
+    generate_and_write,
+    generate_docstrings,
+    generate_docstrings_by_config,
+    get_changes,
+    get_functions_from_daemon,
+    profiled,
 )
-from .config import read_from_toml
-from .functions import ResolvedFunction, get_functions_from_file, write_new_docstring
-from .git import repo_has_changes, is_git_repo
+from . import profiling
+from .cache import DocstringCache
+from .config import ConfigResolver
+from .functions import IncrementalWriter, ResolvedFunction, write_new_docstrings
+from .report import CoverageSummary, ReportFormat, get_reporter
 
 
 app = typer.Typer(add_completion=False, no_args_is_help=True)
 
-_CFG = read_from_toml()
+cache_app = typer.Typer(
+    help="Inspect and manage the persistent cache of generated docstrings.",
+    no_args_is_help=True,
+)
+app.add_typer(cache_app, name="cache")
 
 
 @dataclass
 class CommonArgs:
+    """Options shared between commands.
+
+    Options which can also be set in `pyproject.toml` default to None, meaning
+    that the configured value is used unless the option is passed explicitly.
+    """
+
     Paths: List[Path] = typer.Argument(
         None,
         help="Input paths to scan for functions. Can be a combination of directories and files. Directories will be recursed into.",
     )
-    IgnoreConstructors: bool = typer.Option(
-        _CFG.ignore_constructors, help="Ignore class constructor functions."
+    IgnoreConstructors: Optional[bool] = typer.Option(
+        None,
+        "--ignore-constructors/--no-ignore-constructors",
+        help="Ignore class constructor functions.",
+        show_default=False,
     )
-    IgnorePrivate: bool = typer.Option(
-        _CFG.ignore_private,
+    IgnorePrivate: Optional[bool] = typer.Option(
+        None,
+        "--ignore-private/--no-ignore-private",
         help="Ignore private functions. Private functions have two leading underscores.",
+        show_default=False,
     )
-    IgnoreInternal: bool = typer.Option(
-        _CFG.ignore_internal,
+    IgnoreInternal: Optional[bool] = typer.Option(
+        None,
+        "--ignore-internal/--no-ignore-internal",
         help="Ignore internal functions. Internal functions have one leading underscore.",
+        show_default=False,
+    )
+    Jobs: Optional[int] = typer.Option(
+        None,
+        help="Number of processes used to parse input files. Use 0 for one per cpu.",
+        show_default=False,
+    )
+    Index: Optional[bool] = typer.Option(
+        None,
+        "--index/--no-index",
+        help="Reuse results from previous scans for files which have not changed.",
+        show_default=False,
+    )
+    RebuildIndex: bool = typer.Option(
+        False, help="Discard the existing scan index and parse every file again."
+    )
+    ChangedSince: Optional[str] = typer.Option(
+        None,
+        help="Only consider functions changed since this git ref, including uncommitted changes.",
+        show_default=False,
+    )
+    Staged: bool = typer.Option(
+        False, help="Only consider functions changed in the git index."
+    )
+    Profile: bool = typer.Option(
+        False, help="Time each phase of the command, and print a summary."
+    )
+    ProfileTrace: Optional[Path] = typer.Option(
+        None,
+        help="File to write the JSON trace of --profile to. Defaults to profile.json in the cache directory.",
+        show_default=False,
     )
 
 
 @app.command()
+@profiled
 def run(
     paths: List[Path] = CommonArgs.Paths,
-    ignore_constructors: bool = CommonArgs.IgnoreConstructors,
-    ignore_private: bool = CommonArgs.IgnorePrivate,
-    ignore_internal: bool = CommonArgs.IgnoreInternal,
+    ignore_constructors: Optional[bool] = CommonArgs.IgnoreConstructors,
+    ignore_private: Optional[bool] = CommonArgs.IgnorePrivate,
+    ignore_internal: Optional[bool] = CommonArgs.IgnoreInternal,
+    jobs: Optional[int] = CommonArgs.Jobs,
+    index: Optional[bool] = CommonArgs.Index,
+    rebuild_index: bool = CommonArgs.RebuildIndex,
+    changed_since: Optional[str] = CommonArgs.ChangedSince,
+    staged: bool = CommonArgs.Staged,
+    concurrency: Optional[int] = typer.Option(
+        None,
+        help="Maximum number of docstring requests in flight at once.",
+        show_default=False,
+    ),
+    timeout: Optional[float] = typer.Option(
+        None,
+        help="Seconds after which a single docstring request is abandoned.",
+        show_default=False,
+    ),
+    batch_tokens: Optional[int] = typer.Option(
+        None,
+        help="Pack several functions into each request, up to this many prompt tokens. Use 0 to disable.",
+        show_default=False,
+    ),
+    cache: Optional[bool] = typer.Option(
+        None,
+        "--cache/--no-cache",
+        help="Reuse previously generated docstrings for unchanged functions.",
+        show_default=False,
+    ),
+    stream: Optional[bool] = typer.Option(
+        None,
+        "--stream/--no-stream",
+        help="Display docstrings while they are being generated.",
+        show_default=False,
+    ),
+    dedup: Optional[bool] = typer.Option(
+        None,
+        "--dedup/--no-dedup",
+        help="Generate one docstring for each set of functions with identical bodies.",
+        show_default=False,
+    ),
     force: bool = typer.Option(False, help="Ignore git safety checks."),
+    yes: bool = typer.Option(
+        False,
+        "--yes",
+        "-y",
+        help="Don't ask for confirmation, and write each file as soon as its docstrings are generated.",
+    ),
+    resume: bool = typer.Option(
+        False,
+        help="Continue an interrupted run, reusing the docstrings it generated for functions which have not changed since.",
+    ),
+    profile: bool = CommonArgs.Profile,
+    profile_trace: Optional[Path] = CommonArgs.ProfileTrace,
 ):
     """Automatically identifies and generates missing docstrings for python files
     using OpenAI (or the LLM of your choice)."""
 
-    ### Check that the current running environment is in a clean git repo
-    if not force:
-        suggestion_message = "[/]NLP code generation can deliver mixed results, so it is recommended that modified files exist in version tracking so changes can be reverted.  [dim]Override with --force."
-
-        if not is_git_repo():
-            print()
-            print_message(
-                "[bold yellow]WARNING: [/]The current directory is not part of a git repository."
-            )
-            print_message(suggestion_message)
-            print()
-            sys.exit(1)
+    from .git import repo_has_changes, is_git_repo
+    from .journal import RunJournal
 
-        if repo_has_changes():
-            print()
-            print_message(
-                "[bold yellow]WARNING: [/]The current git repo has pending changes."
-            )
-            print_message(suggestion_message)
-            print()
-            sys.exit(1)
-
-    ### Update config with command line opts
-    cfg = get_updated_config(
+    ### Update config with command line opts, and resolve per-file config lazily
+    resolver = ConfigResolver(
         {
             "ignore_internal": ignore_internal,
             "ignore_private": ignore_private,
             "ignore_constructors": ignore_constructors,
+            "jobs": jobs,
+            "scan_index": index,
+            "llm_concurrency": concurrency,
+            "llm_request_timeout": timeout,
+            "docstring_cache": cache,
+            "llm_batch_token_budget": batch_tokens,
+            "llm_stream": stream,
+            "deduplicate_functions": dedup,
         },
     )
+    cfg = resolver.for_directory(os.curdir)
+
+    ### Check that the current running environment is in a clean git repo
+    with profiling.span("git_checks"):
+        if not force:
+            suggestion_message = "[/]NLP code generation can deliver mixed results, so it is recommended that modified files exist in version tracking so changes can be reverted.  [dim]Override with --force."
+
+            if not is_git_repo():
+                print()
+                print_message(
+                    "[bold yellow]WARNING: [/]The current directory is not part of a git repository."
+                )
+                print_message(suggestion_message)
+                print()
+                sys.exit(1)
+
+            if repo_has_changes(paths, exclude=[cfg.cache_dir]):
+                print()
+                print_message(
+                    "[bold yellow]WARNING: [/]The current git repo has pending changes to the given paths."
+                )
+                print_message(suggestion_message)
+                print()
+                sys.exit(1)
 
     ### Scan for functions to modify
-    functions = filter_functions(get_functions_from_paths(paths), cfg)
-
-    # NOTE: Preprocessing step to sort functions by reverse-appearence in file.
-    #       This is so that when writing new lines into the file, we insert
-    #       upwards from the bottom as to not corrupt existing line numbers we
-    #       have scanned.
-    functions = sorted(
-        functions, key=lambda fn: (fn.source_file, fn.ast_object.lineno), reverse=True
-    )
+    with profiling.span("scan"):
+        changes = get_changes(paths, changed_since, staged)
+        all_functions = get_functions_from_paths(
+            paths, cfg, rebuild_index, changes, resolver
+        )
+
+    with profiling.span("filter"):
+        functions = filter_functions(all_functions, cfg, resolver)
+
+    functions = sorted(functions, key=lambda fn: (fn.source_file, fn.lineno))
 
     if not functions:
         print()
@@ -125,21 +247,81 @@ def run(
         print("[bold]The following functions are missing docstrings:")
 
         for fn in functions:
-            print(" -", f"{fn.source_file}:[bold]{fn.name}")
+            print(" -", format_function_location(fn))
+
+    ### Reuse docstrings journaled by an interrupted run
+    journal = RunJournal.open(cfg.cache_dir)
+    resumed = journal.resume(functions) if resume else {}
+
+    if resume:
+        print()
+        print_message(
+            f"Reusing {len(resumed)} of these docstrings from the interrupted run."
+        )
 
     print()
-    if not answered_yes("Generate docstrings for these functions?"):
-        sys.exit(0)
+    with profiling.span("prompt"):
+        if not yes and not answered_yes("Generate docstrings for these functions?"):
+            sys.exit(0)
 
-    ### Dispatch docstring gen
-    generated_docstrings = {}
-    """Mapping from collected function objects to their newly generated docstrings"""
+    if not resume or not journal.exists():
+        journal.reset()
 
-    for fn in functions:
-        with Status(f"Generating docstring for {fn.name}"):
-            generated_docstrings[fn] = generate_function_docstring(
-                fn.source_str, cfg.llm_configuration
+    pending = [fn for fn in functions if fn not in resumed]
+    generated = {}
+
+    ### Generate and write each file as soon as it is ready
+    if yes:
+        try:
+            writer = generate_and_write(pending, resumed, cfg, journal, resolver)
+        except KeyboardInterrupt:
+            print()
+            print_message(
+                "Interrupted. Completed files were written, rerun with [bold]--resume[/] to continue."
             )
+            print()
+            sys.exit(130)
+
+        print()
+
+        if not writer.written:
+            print_message("No docstrings were written.")
+            print()
+            sys.exit(1)
+
+        # NOTE: Keep the journal for files which failed to write, to retry them.
+        if not writer.errors:
+            journal.remove()
+
+        return
+
+    ### Dispatch docstring gen, journaling each docstring as it arrives
+    try:
+        with profiling.span("generate"):
+            if pending:
+                generated = generate_docstrings_by_config(
+                    pending, cfg, resolver, on_result=journal.append
+                )
+    except KeyboardInterrupt:
+        print()
+        print_message(
+            "Interrupted. Generated docstrings were kept, rerun with [bold]--resume[/] to continue."
+        )
+        print()
+        sys.exit(130)
+
+    generated_docstrings = {
+        fn: resumed[fn] if fn in resumed else generated[fn]
+        for fn in functions
+        if fn in resumed or fn in generated
+    }
+    """Mapping from collected function objects to their newly generated docstrings"""
+
+    if not generated_docstrings:
+        print()
+        print_message("No docstrings were generated.")
+        print()
+        sys.exit(1)
 
     print()
     print_message("The following docstrings were generated:")
@@ -155,29 +337,59 @@ def run(
         )
 
     print()
-    if not answered_yes("Apply changes?"):
-        sys.exit(0)
+    with profiling.span("prompt"):
+        if not answered_yes("Apply changes?"):
+            print()
+            print_message(
+                "[dim]Rerun with --resume to apply these docstrings without generating them again."
+            )
+            print()
+            sys.exit(0)
 
     print()
 
-    for fn, docstring in generated_docstrings.items():
-        with Status(f"Writing docstring for {fn.name}..."):
-            write_new_docstring(fn, docstring)
+    with Status(f"Writing docstrings..."), profiling.span("write"):
+        write_new_docstrings(generated_docstrings, cfg.jobs)
+
+    journal.remove()
 
+    for fn in generated_docstrings:
         print(f"✅ Wrote new docstring for {format_function_location(fn)} ")
 
     print()
 
 
 @app.command()
+@profiled
 def check(
     paths: List[Path] = CommonArgs.Paths,
-    coverage: float = typer.Option(
-        100, help="Coverage threshold of docstrings to fail under."
+    coverage: Optional[float] = typer.Option(
+        None,
+        help="Coverage threshold of docstrings to fail under. Defaults to 100.",
+        show_default=False,
     ),
-    ignore_internal: bool = CommonArgs.IgnoreInternal,
-    ignore_private: bool = CommonArgs.IgnorePrivate,
-    ignore_constructors: bool = CommonArgs.IgnoreConstructors,
+    ignore_internal: Optional[bool] = CommonArgs.IgnoreInternal,
+    ignore_private: Optional[bool] = CommonArgs.IgnorePrivate,
+    ignore_constructors: Optional[bool] = CommonArgs.IgnoreConstructors,
+    jobs: Optional[int] = CommonArgs.Jobs,
+    index: Optional[bool] = CommonArgs.Index,
+    rebuild_index: bool = CommonArgs.RebuildIndex,
+    changed_since: Optional[str] = CommonArgs.ChangedSince,
+    staged: bool = CommonArgs.Staged,
+    format: ReportFormat = typer.Option(
+        ReportFormat.rich,
+        "--format",
+        help="Output format. Formats other than rich are plain text, suited to CI logs and tooling.",
+    ),
+    quiet: bool = typer.Option(
+        False, "--quiet", "-q", help="Only report the coverage summary."
+    ),
+    daemon: bool = typer.Option(
+        False,
+        help="Answer from a running `pygendocs watch` if possible, instead of scanning.",
+    ),
+    profile: bool = CommonArgs.Profile,
+    profile_trace: Optional[Path] = CommonArgs.ProfileTrace,
 ):
     """Scans the given input paths for functions that are missing docstrings.
 
@@ -186,53 +398,110 @@ def check(
 
     Coverage threshold, and which types of functions to check can be configured in the command
     line or in your `pyproject.toml`file.
+
+    With --changed-since or --staged, only functions overlapping changed lines are
+    checked, and coverage is computed over those functions.
     """
-    ### Update config with command line options
-    cfg = get_updated_config(
+    ### Update config with command line options, and resolve per-file config lazily
+    resolver = ConfigResolver(
         {
             "ignore_internal": ignore_internal,
             "ignore_private": ignore_private,
             "ignore_constructors": ignore_constructors,
             "coverage_threshold": coverage,
+            "jobs": jobs,
+            "scan_index": index,
         },
     )
+    cfg = resolver.for_directory(os.curdir)
 
-    ### Parse input files
-    all_functions = get_functions_from_paths(paths)
-    functions = filter_functions(all_functions, cfg)
+    ### Parse input files, or ask a running watcher for them
+    with profiling.span("scan"):
+        changes = get_changes(paths, changed_since, staged)
+        all_functions = None
 
-    ### Print the source code for each function
-    if functions:
-        print()
-        print_message(
-            f"The following {len(functions)} functions are missing docstrings:"
-        )
-        print()
+        if daemon:
+            all_functions = get_functions_from_daemon(paths, cfg, changes, resolver)
 
-        for fn in functions:
-            print_function(fn)
+        if all_functions is None:
+            all_functions = get_functions_from_paths(
+                paths, cfg, rebuild_index, changes, resolver
+            )
 
-        print()
+    with profiling.span("filter"):
+        functions = filter_functions(all_functions, cfg, resolver)
 
-    ### Calculate coverage and report
-    cov = 100 - (float(len(functions)) * 100 / len(all_functions))
+    ### Report functions missing docstrings, and coverage
+    with profiling.span("report"):
+        reporter = get_reporter(format, quiet=quiet)
 
-    if cov >= coverage:
-        print()
-        print_message(
-            f"[green bold]{cov:.2f}%[/] of functions have docstrings. [dim](Threshold {coverage}%)"
+        for fn in functions:
+            reporter.function(fn)
+
+        summary = CoverageSummary(
+            functions=len(all_functions),
+            missing=len(functions),
+            threshold=cfg.coverage_threshold,
         )
+        reporter.finish(summary)
+
+    if not summary.passed:
+        sys.exit(1)
+
+
+@app.command()
+def watch(
+    paths: List[Path] = CommonArgs.Paths,
+    jobs: Optional[int] = CommonArgs.Jobs,
+    interval: float = typer.Option(
+        1.0, help="Seconds between polls of the input paths for changes."
+    ),
+):
+    """Keep the functions of the given input paths in memory, updating them as
+    files change, so that `check --daemon` can answer instantly.
+
+    Only changed files are parsed again. Runs until interrupted.
+    """
+    from .daemon import WatchedTree, default_socket_path, serve
+
+    cfg = get_updated_config({"jobs": jobs})
+    socket_path = default_socket_path(cfg)
+
+    tree = WatchedTree(paths or [Path(".")], cfg)
+
+    with Status("Scanning input files..."):
+        tree.refresh()
+
+    status = tree.handle({"command": "status"})
+
+    print()
+    print_message(
+        f"Watching {status['files']} files with {status['functions']} functions. "
+        f"Listening on [bold]{socket_path}"
+    )
+    print()
+
+    def _on_refresh(parsed: int):
+        print(f"  [dim]Re-parsed {parsed} changed files.")
+
+    try:
+        serve(tree, socket_path, interval, on_refresh=_on_refresh)
+    except RuntimeError as e:
+        print_message(f"[bold red]ERROR: [/]{e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
         print()
-    else:
-        print_message(
-            f"Only [bold red]{cov:.2f}%[/] of functions have docstrings. [dim](Threshold {coverage}%)"
-        )
+        print_message("Stopped watching.")
         print()
-        sys.exit(1)
 
 
 @app.command()
-def test(message: Annotated[Optional[str], typer.Argument()] = None):
+def test(
+    message: Annotated[Optional[str], typer.Argument()] = None,
+    stream: bool = typer.Option(
+        True, help="Display the response while it is being generated."
+    ),
+):
     """Run a test scenario against the current LLM server configuration.
 
     Useful to check correctness if hosting your own LLM server, by making sure
@@ -240,9 +509,13 @@ def test(message: Annotated[Optional[str], typer.Argument()] = None):
 
     Pass a message surrounded by quotes, which the configured LLM will respond to.
     """
+    from rich.live import Live
+
+    from .llm import get_llm_api_client, dispatch_completion, stream_completion
+
     ### Fetch config data
-    config = read_from_toml()
-    api_key = try_get_api_key(config.llm_api_token_env_key)
+    config = get_updated_config({})
+    try_get_api_key(config.llm_api_token_env_key)
 
     print()
     print_message(f"Running test on current LLM configuration:")
@@ -250,7 +523,7 @@ def test(message: Annotated[Optional[str], typer.Argument()] = None):
     ### Print current config in a table
     t = Table("URL", "Model", "Max Tokens", box=box.SIMPLE_HEAD)
     t.add_row(
-        config.llm_api_url or "DEFAULT",
+        format_api_urls(config),
         config.llm_model,
         str(config.llm_completion_max_tokens),
     )
@@ -262,13 +535,233 @@ def test(message: Annotated[Optional[str], typer.Argument()] = None):
 
     print(Panel(message, title=f"🙋", title_align="left", padding=1))
 
-    client = get_llm_api_client(config.llm_api_url, api_key)
+    client = get_llm_api_client(config.llm_configuration)
+    title = f"🤖 ({config.llm_model}):"
+
+    if not stream:
+        resp = dispatch_completion(client, config.llm_configuration, message)
+        print(Panel(resp, title=title, title_align="left", padding=1))
+        return
+
+    with Live(Panel("", title=title, title_align="left", padding=1)) as live:
+        resp, stats = stream_completion(
+            client,
+            config.llm_configuration,
+            message,
+            on_text=lambda text: live.update(
+                Panel(escape(text), title=title, title_align="left", padding=1)
+            ),
+        )
+
+    if stats.time_to_first_token is not None:
+        print_message(
+            f"{stats.time_to_first_token:.2f}s to first token, "
+            f"{stats.tokens_per_second:.1f} tokens/s "
+            f"[dim]({stats.completion_tokens} tokens in {stats.duration:.2f}s)"
+        )
+        print()
+
+
+@app.command()
+def bench(
+    requests: int = typer.Option(100, help="Number of docstrings to request."),
+    concurrency: Optional[int] = typer.Option(
+        None,
+        help="Maximum number of requests in flight at once.",
+        show_default=False,
+    ),
+    batch_tokens: Optional[int] = typer.Option(
+        None,
+        help="Pack several functions into each request, up to this many prompt tokens. Use 0 to disable.",
+        show_default=False,
+    ),
+    stream: Optional[bool] = typer.Option(
+        None, "--stream/--no-stream", help="Stream completions.", show_default=False
+    ),
+    max_retries: Optional[int] = typer.Option(
+        None, help="Number of times a failed request is retried.", show_default=False
+    ),
+    stub: bool = typer.Option(
+        False,
+        help="Run against a bundled stub server instead of the configured llm server.",
+    ),
+    stub_latency: float = typer.Option(
+        0.5, help="Median seconds before the stub server starts responding."
+    ),
+    stub_latency_sigma: float = typer.Option(
+        0.5, help="Log-normal spread of stub server latencies."
+    ),
+    stub_error_rate: float = typer.Option(
+        0.0, help="Fraction of requests the stub server fails."
+    ),
+    stub_tokens_per_second: float = typer.Option(
+        50.0, help="Rate at which the stub server generates tokens."
+    ),
+    stub_completion_tokens: int = typer.Option(
+        40, help="Number of tokens in each stub server completion."
+    ),
+    stub_replicas: int = typer.Option(
+        1, help="Number of stub servers to route requests across."
+    ),
+):
+    """Load test the llm server through the same path used by `run`, and report
+    its throughput and latency.
+
+    Useful to size a self-hosted llm server, and to tune concurrency and rate
+    limits. Use --stub to measure pygendocs itself against a simulated server.
+    """
+    import tempfile
+
+    from .bench import run_load_test, write_load_test_functions
+    from .stub_server import StubServer, StubServerConfig
+
+    cfg = get_updated_config(
+        {
+            "llm_concurrency": concurrency,
+            "llm_batch_token_budget": batch_tokens,
+            "llm_stream": stream,
+            "llm_max_retries": max_retries,
+        }
+    )
+
+    servers = []
+
+    if stub:
+        servers = [
+            StubServer(
+                StubServerConfig(
+                    latency=stub_latency,
+                    latency_sigma=stub_latency_sigma,
+                    error_rate=stub_error_rate,
+                    tokens_per_second=stub_tokens_per_second,
+                    completion_tokens=stub_completion_tokens,
+                )
+            ).start()
+            for _ in range(max(1, stub_replicas))
+        ]
+
+        urls = [server.url for server in servers]
+        cfg = cfg.model_copy(update={"llm_api_url": urls if len(urls) > 1 else urls[0]})
+
+        # NOTE: The stub doesn't check keys, but the client requires one.
+        os.environ.setdefault(cfg.llm_api_token_env_key, "stub")
+
+    else:
+        try_get_api_key(cfg.llm_api_token_env_key)
+
+    print()
+    print_message(
+        f"Sending {requests} docstring requests to [bold]{format_api_urls(cfg)}[/] "
+        f"with concurrency {cfg.llm_concurrency}:"
+    )
+    print()
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            result = run_load_test(write_load_test_functions(tmp, requests), cfg)
+    finally:
+        for server in servers:
+            server.stop()
+
+    def _ms(seconds: Optional[float]) -> str:
+        return "-" if seconds is None else f"{seconds * 1000:.0f} ms"
+
+    t = Table(
+        "Requests/s", "p50", "p95", "p99", "Succeeded", "Failed", box=box.SIMPLE_HEAD
+    )
+    t.add_row(
+        f"{result.requests_per_second:.2f}",
+        _ms(result.latency_percentile(50)),
+        _ms(result.latency_percentile(95)),
+        _ms(result.latency_percentile(99)),
+        str(result.succeeded),
+        f"[red]{result.failed}" if result.failed else "0",
+    )
+
+    print()
+    print(t)
+
+    if result.errors:
+        errors = Table("Error", "Attempts", box=box.SIMPLE_HEAD)
+
+        for kind, count in result.errors.most_common():
+            errors.add_row(kind, str(count))
+
+        print(errors)
+
+    print_message(
+        f"{requests} docstrings in {result.duration:.2f}s "
+        f"[dim](latencies are per attempt, including retried attempts)"
+    )
+    print()
+
+
+@cache_app.command("stats")
+def cache_stats():
+    """Show the size and hit rate of the docstring cache."""
+    cfg = get_updated_config({})
 
-    resp = dispatch_completion(
-        client, config.llm_configuration, message or "Say hello!"
+    with DocstringCache.open(cfg.cache_dir) as cache:
+        stats = cache.stats()
+
+    t = Table("Entries", "Size", "Hits", "Misses", "Hit Rate", box=box.SIMPLE_HEAD)
+    t.add_row(
+        str(stats.entries),
+        f"{stats.size_bytes / 1024:.1f} KiB",
+        str(stats.hits),
+        str(stats.misses),
+        f"{stats.hit_rate * 100:.1f}%",
     )
 
-    print(Panel(resp, title=f"🤖 ({config.llm_model}):", title_align="left", padding=1))
+    print()
+    print(t)
+
+
+@cache_app.command("prune")
+def cache_prune(
+    max_entries: Optional[int] = typer.Option(
+        None,
+        help="Number of most recently used docstrings to keep.",
+        show_default=False,
+    ),
+    max_age_days: Optional[float] = typer.Option(
+        None,
+        help="Evict docstrings unused for this many days.",
+        show_default=False,
+    ),
+):
+    """Evict old and least recently used docstrings from the cache.
+
+    Limits default to those configured in your `pyproject.toml`.
+    """
+    cfg = get_updated_config(
+        {
+            "docstring_cache_max_entries": max_entries,
+            "docstring_cache_max_age_days": max_age_days,
+        }
+    )
+
+    with DocstringCache.open(cfg.cache_dir) as cache:
+        evicted = cache.prune(
+            cfg.docstring_cache_max_entries, cfg.docstring_cache_max_age_days
+        )
+
+    print()
+    print_message(f"Evicted {evicted} docstrings from the cache.")
+    print()
+
+
+@cache_app.command("clear")
+def cache_clear():
+    """Remove every docstring from the cache."""
+    cfg = get_updated_config({})
+
+    with DocstringCache.open(cfg.cache_dir) as cache:
+        cache.clear()
+
+    print()
+    print_message("Cleared the docstring cache.")
+    print()
 
 
 if __name__ == "__main__":
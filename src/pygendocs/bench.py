@@ -0,0 +1,118 @@
+"""Load testing of the configured llm server through the real dispatch path.
+
+See the `bench` command, which can also run against a bundled `StubServer`.
+"""
+
+import bisect
+import threading
+import time
+
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List, Optional
+
+from .config import PyGenDocsConfiguration
+from .functions import ResolvedFunction, get_functions_from_file
+
+
+@dataclass
+class LoadTestResult:
+    """Throughput, latency, and errors observed during a load test."""
+
+    requests: int
+    """Number of functions docstrings were requested for."""
+
+    succeeded: int = 0
+    """Number of functions a docstring was generated for."""
+
+    duration: float = 0.0
+    """Seconds from the first request being sent until the last one finished."""
+
+    latencies: List[float] = field(default_factory=list)
+    """Sorted latencies in seconds of every successful request attempt."""
+
+    errors: Counter = field(default_factory=Counter)
+    """Number of failed request attempts, by HTTP status or error type. Attempts
+    which were later retried successfully are included."""
+
+    @property
+    def failed(self) -> int:
+        """Number of functions no docstring could be generated for."""
+        return self.requests - self.succeeded
+
+    @property
+    def requests_per_second(self) -> float:
+        """Rate at which request attempts completed, successful or not."""
+        attempts = len(self.latencies) + sum(self.errors.values())
+        return attempts / self.duration if self.duration > 0 else 0.0
+
+    def latency_percentile(self, pct: float) -> Optional[float]:
+        """Latency of successful attempts at the given percentile, or None if there
+        were none."""
+        return percentile(self.latencies, pct) if self.latencies else None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of the sorted, non-empty list `values`."""
+    return values[min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))]
+
+
+def write_load_test_functions(
+    directory: str | Path, count: int
+) -> List[ResolvedFunction]:
+    """Write `count` distinct, undocumented functions to a module in `directory`,
+    and return them in the order they were written."""
+    path = Path(directory) / "load_test.py"
+
+    path.write_text(
+        "".join(
+            f"def load_test_{i}(values, offset={i}):\n"
+            f"    total = sum(v * {i % 7 + 1} for v in values)\n"
+            f"    return total + offset\n\n\n"
+            for i in range(count)
+        )
+    )
+
+    return sorted(get_functions_from_file(path), key=lambda fn: fn.lineno)
+
+
+def run_load_test(
+    functions: List[ResolvedFunction], cfg: PyGenDocsConfiguration
+) -> LoadTestResult:
+    """Generate docstrings for `functions` with the settings in `cfg`, recording
+    the latency and outcome of every request attempt.
+
+    Docstrings are never read from or written to the cache.
+    """
+    from .cli import generate_docstrings
+    from .scheduler import RequestScheduler
+
+    result = LoadTestResult(requests=len(functions))
+    lock = threading.Lock()
+
+    def _on_attempt(latency: float, error: Optional[Exception]):
+        with lock:
+            if error is None:
+                bisect.insort(result.latencies, latency)
+            else:
+                result.errors[_error_kind(error)] += 1
+
+    start = time.perf_counter()
+
+    docstrings = generate_docstrings(
+        functions,
+        cfg.model_copy(update={"docstring_cache": False}),
+        scheduler=RequestScheduler.from_config(cfg, on_attempt=_on_attempt),
+        report_errors=False,
+    )
+
+    result.duration = time.perf_counter() - start
+    result.succeeded = len(docstrings)
+
+    return result
+
+
+def _error_kind(e: Exception) -> str:
+    status = getattr(e, "status_code", None)
+    return f"HTTP {status}" if status is not None else type(e).__name__
@@ -0,0 +1,210 @@
+"""Persistent, project local cache of generated docstrings.
+
+Docstrings are stored in a SQLite database, keyed by a content hash of everything
+that influences the generated text. See `llm.docstring_cache_key`.
+"""
+
+import logging
+import os
+import sqlite3
+import time
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from .config import make_cache_dir
+
+_LOGGER = logging.getLogger(__name__)
+
+_CACHE_FILE_NAME = "docstrings.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docstrings (
+    key TEXT PRIMARY KEY,
+    docstring TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS docstrings_accessed ON docstrings (accessed);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+@dataclass
+class CacheStats:
+    """Summary of the contents and usage of a `DocstringCache`."""
+
+    entries: int
+    """Number of stored docstrings."""
+
+    size_bytes: int
+    """Size of the cache database on disk, including its write-ahead log."""
+
+    hits: int
+    """Total number of lookups which found a stored docstring."""
+
+    misses: int
+    """Total number of lookups which did not find a stored docstring."""
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class DocstringCache:
+    """SQLite backed mapping from cache keys to generated docstrings.
+
+    Hit and miss counts are accumulated in memory and persisted on `close`. This
+    object is not thread safe, and should only be used from the thread that
+    created it.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        """Location of the cache database on disk."""
+
+        make_cache_dir(self.path.parent)
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+        self._accessed = set()
+
+        self.hits = 0
+        """Number of lookups which found a stored docstring since opening."""
+
+        self.misses = 0
+        """Number of lookups which did not find a stored docstring since opening."""
+
+    @classmethod
+    def open(cls, cache_dir: str | Path) -> "DocstringCache":
+        """Open the docstring cache stored in `cache_dir`, creating it if needed."""
+        return cls(Path(cache_dir) / _CACHE_FILE_NAME)
+
+    def __enter__(self) -> "DocstringCache":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the docstring stored under `key`, or None if there is none."""
+        row = self._conn.execute(
+            "SELECT docstring FROM docstrings WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+
+        # NOTE: Access times are only used for eviction, so are written in bulk on
+        #       close rather than with a transaction per lookup.
+        self._accessed.add(key)
+
+        return row[0]
+
+    def put(self, key: str, docstring: str):
+        """Store `docstring` under `key`, replacing any existing entry."""
+        now = time.time()
+
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO docstrings VALUES (?, ?, ?, ?)",
+                (key, docstring, now, now),
+            )
+
+    def prune(
+        self, max_entries: Optional[int] = None, max_age_days: Optional[float] = None
+    ) -> int:
+        """Evict entries which have not been used within `max_age_days`, and then
+        the least recently used entries in excess of `max_entries`.
+
+        Returns the number of evicted entries.
+        """
+        evicted = 0
+
+        self._flush_accessed()
+
+        with self._conn:
+            if max_age_days is not None:
+                cutoff = time.time() - max_age_days * 24 * 60 * 60
+                evicted += self._conn.execute(
+                    "DELETE FROM docstrings WHERE accessed < ?", (cutoff,)
+                ).rowcount
+
+            if max_entries is not None:
+                evicted += self._conn.execute(
+                    "DELETE FROM docstrings WHERE key IN ("
+                    "SELECT key FROM docstrings ORDER BY accessed DESC "
+                    "LIMIT -1 OFFSET ?)",
+                    (max(0, max_entries),),
+                ).rowcount
+
+        if evicted:
+            _LOGGER.debug(f"Evicted {evicted} entries from docstring cache")
+
+        return evicted
+
+    def clear(self):
+        """Remove all entries and usage statistics from the cache."""
+        with self._conn:
+            self._conn.execute("DELETE FROM docstrings")
+            self._conn.execute("DELETE FROM stats")
+
+        self.hits = self.misses = 0
+        self._accessed.clear()
+
+        self._conn.execute("VACUUM")
+
+    def stats(self) -> CacheStats:
+        """Return a summary of the cache, including unsaved hits and misses."""
+        entries = self._conn.execute("SELECT COUNT(*) FROM docstrings").fetchone()[0]
+        stored = dict(self._conn.execute("SELECT name, value FROM stats").fetchall())
+
+        return CacheStats(
+            entries=entries,
+            size_bytes=sum(
+                os.path.getsize(f)
+                for f in (self.path, f"{self.path}-wal", f"{self.path}-shm")
+                if os.path.exists(f)
+            ),
+            hits=stored.get("hits", 0) + self.hits,
+            misses=stored.get("misses", 0) + self.misses,
+        )
+
+    def close(self):
+        """Persist usage statistics and access times, and close the database."""
+        self._flush_accessed()
+
+        with self._conn:
+            for name, value in (("hits", self.hits), ("misses", self.misses)):
+                self._conn.execute(
+                    "INSERT INTO stats VALUES (?, ?) "
+                    "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value",
+                    (name, value),
+                )
+
+        self.hits = self.misses = 0
+
+        self._conn.close()
+
+    def _flush_accessed(self):
+        """Write the access times of entries looked up since the last flush."""
+        now = time.time()
+
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE docstrings SET accessed = ? WHERE key = ?",
+                ((now, key) for key in self._accessed),
+            )
+
+        self._accessed.clear()
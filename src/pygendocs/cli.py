@@ -3,78 +3,662 @@
 These functions should only be called directly from the cli, as some of them 
 will call sys.exit() on a fail state.
 """
+import functools
 import os
-import re
+import statistics
 import sys
+import threading
 
 from pathlib import Path
-from typing import Iterable, List
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+)
 from itertools import chain
 
-from rich import print
+from rich import box, print
+from rich.console import Group
+from rich.live import Live
 from rich.status import Status
 from rich.panel import Panel
 from rich.syntax import Syntax
+from rich.table import Table
 from rich.prompt import Prompt
+from rich.progress import Progress, SpinnerColumn, TextColumn, TimeElapsedColumn
+
+from . import profiling
+from .config import (
+    ConfigResolver,
+    PyGenDocsConfiguration,
+    find_config_file,
+    make_cache_dir,
+)
+from .functions import (
+    FunctionFilter,
+    IncrementalWriter,
+    get_functions_from_files,
+    ResolvedFunction,
+)
+from .index import ScanIndex, get_functions_with_index
+from .walk import WalkRules, filter_source_files, iter_source_files
+
+if TYPE_CHECKING:
+    from .endpoints import EndpointPool
+    from .journal import RunJournal
+    from .llm import CompletionStats
+    from .scheduler import RequestScheduler
+
+_PER_FILE_LLM_OPTIONS = (
+    "docstring_style",
+    "llm_model",
+    "llm_completion_max_tokens",
+    "llm_api_url",
+    "llm_api_token_env_key",
+    "llm_request_timeout",
+    "llm_prompt_token_budget",
+)
+"""Options affecting generated docstrings which packages of a monorepo may configure
+separately. All other options apply to the whole run."""
+
+_STREAMED_PANEL_LINES = 12
+"""Number of trailing lines of each partial docstring shown while streaming."""
+
+
+def get_functions_from_paths(
+    paths: List[Path],
+    cfg: PyGenDocsConfiguration,
+    rebuild_index: bool = False,
+    changes: Optional[Dict[str, List[Tuple[int, int]]]] = None,
+    resolver: Optional[ConfigResolver] = None,
+) -> List[ResolvedFunction]:
+    """Collect all functions from the given input `paths`, skipping functions
+    ignored by `cfg`, or by the configuration of each file if a `resolver` of
+    per-file configuration is given.
 
-from .config import PyGenDocsConfiguration, read_from_toml
-from .functions import get_functions_from_file, ResolvedFunction
-
+    If the scan index is enabled in `cfg`, only files which have changed since the
+    last scan are parsed. Passing `rebuild_index` discards any existing index.
 
-def get_functions_from_paths(paths: List[Path]) -> List[ResolvedFunction]:
+    If `changes` is given, as returned by `get_changes`, only the changed files
+    among `paths` are scanned, and only functions overlapping a changed line range
+    are returned.
+    """
     with Status(f"Scanning input files...") as s:
-        cleaned_paths = clean_input_paths(paths)
-
-        return list(
-            chain.from_iterable(get_functions_from_file(p) for p in cleaned_paths)
+        cleaned_paths = profiling.timed_iter(
+            "scan.walk", clean_input_paths(paths, cfg, changes, resolver)
         )
 
+        function_filter = get_scan_filter(cfg, resolver)
+
+        if not cfg.scan_index:
+            functions = get_functions_from_files(
+                cleaned_paths, cfg.jobs, function_filter
+            )
+        else:
+            with profiling.span("scan.index_load"):
+                index = ScanIndex.load(cfg.cache_dir, rebuild=rebuild_index)
+
+            functions = get_functions_with_index(
+                cleaned_paths, index, cfg.jobs, function_filter
+            )
+
+            with profiling.span("scan.index_save"):
+                index.save()
+
+    if changes is not None:
+        functions = filter_changed_functions(functions, changes)
+
+    if resolver is not None:
+        functions = filter_by_file_config(functions, resolver)
+
+    return functions
+
+
+def clean_input_paths(
+    paths: Iterable[Path],
+    cfg: PyGenDocsConfiguration,
+    changes: Optional[Dict[str, List[Tuple[int, int]]]] = None,
+    resolver: Optional[ConfigResolver] = None,
+) -> Iterator[str]:
+    """Lazily expands the given input paths into the source files they contain,
+    without duplicates, honouring the include and exclude patterns in `cfg`, or
+    those of the configuration each directory resolves to if a `resolver` is given.
+
+    If `changes` is given, only the changed files among `paths` are returned, and
+    no directories are walked. With no `paths`, every changed file is returned.
+    """
+    rules_for = get_walk_rules(cfg, resolver)
+
+    if changes is not None:
+        return filter_source_files(changes, paths, rules_for=rules_for)
+
+    return iter_source_files(paths, rules_for=rules_for)
+
 
-def clean_input_paths(paths: List[Path]) -> List[Path]:
-    """Sorts and removes duplicates from the given paths."""
-    return sorted(list(set(flatten_input_paths(list(p.resolve() for p in paths)))))
+def get_walk_rules(
+    cfg: PyGenDocsConfiguration, resolver: Optional[ConfigResolver] = None
+) -> Callable[[str], WalkRules]:
+    """Function returning the file selection rules applying to each directory.
 
+    With a `resolver` of per-directory configuration, each directory follows the
+    include and exclude patterns of the pyproject.toml it resolves to, anchored to
+    the directory of that file. Otherwise every directory follows `cfg`, anchored
+    to the current directory.
+    """
+    if resolver is None:
+        rules = WalkRules.from_patterns(cfg.include, cfg.exclude, cfg.respect_gitignore)
+        return lambda directory: rules
+
+    by_config_file: Dict[Optional[str], WalkRules] = {}
 
-def flatten_input_paths(paths: Iterable[Path]) -> List[Path]:
-    """Expands and flattens input directories and files to conatin all descendent files."""
-    cleaned_paths = []
+    def _rules_for(directory: str) -> WalkRules:
+        config_file = find_config_file(directory)
+        rules = by_config_file.get(config_file)
 
-    for p in paths:
-        if p.is_dir():
-            cleaned_paths.extend(flatten_input_paths(p.glob("*")))
+        if rules is None:
+            dir_cfg = resolver.for_directory(directory)
+            rules = by_config_file[config_file] = WalkRules.from_patterns(
+                dir_cfg.include,
+                dir_cfg.exclude,
+                dir_cfg.respect_gitignore,
+                base=os.path.dirname(config_file) if config_file else os.curdir,
+            )
 
-        elif p.is_file() and p.suffix == ".py":
-            cleaned_paths.append(p)
+        return rules
 
-    return cleaned_paths
+    return _rules_for
 
 
 def filter_functions(
-    functions: List[ResolvedFunction], cfg: PyGenDocsConfiguration
+    functions: List[ResolvedFunction],
+    cfg: PyGenDocsConfiguration,
+    resolver: Optional[ConfigResolver] = None,
 ) -> List[ResolvedFunction]:
     """Filter out functions based on the given configuration.
 
     For example, the configuration can specify to ignore class constructors,
-    private functions, and protected functions.
+    private functions, and protected functions. Functions are filtered in a
+    single pass, and functions collected by `get_functions_from_paths` have
+    already had these rules applied while parsing.
+
+    If a `resolver` is given, `functions` must already have been filtered by the
+    configuration of their own source file, as `get_functions_from_paths` does, so
+    only those missing docstrings are selected.
+
+    Return the subset of `functions` which are missing docstrings and adhere to
+    the config.
+    """
+    if resolver is not None:
+        return [f for f in functions if not f.has_docstring]
+
+    function_filter = FunctionFilter.from_config(cfg)
+
+    return [f for f in functions if not f.has_docstring and function_filter(f.name)]
+
+
+def filter_by_file_config(
+    functions: List[ResolvedFunction], resolver: ConfigResolver
+) -> List[ResolvedFunction]:
+    """Return the subset of `functions` accepted by the ignore options of the
+    configuration their own source file resolves to."""
+    filters: Dict[str, FunctionFilter] = {}
+
+    def _accepts(fn: ResolvedFunction) -> bool:
+        function_filter = filters.get(fn.source_file)
+
+        if function_filter is None:
+            function_filter = filters[fn.source_file] = FunctionFilter.from_config(
+                resolver.for_file(fn.source_file)
+            )
+
+        return function_filter(fn.name)
+
+    return [fn for fn in functions if _accepts(fn)]
+
+
+def get_scan_filter(
+    cfg: PyGenDocsConfiguration, resolver: Optional[ConfigResolver] = None
+) -> FunctionFilter:
+    """Filter applied to functions while parsing.
+
+    With a `resolver` of per-file configuration, only the ignore options given as
+    overrides apply to every file, so only those are applied while parsing. The
+    rest are applied per file by `filter_functions`.
+    """
+    if resolver is None:
+        return FunctionFilter.from_config(cfg)
+
+    return FunctionFilter(
+        ignore_constructors=bool(resolver.overrides.get("ignore_constructors")),
+        ignore_internal=bool(resolver.overrides.get("ignore_internal")),
+        ignore_private=bool(resolver.overrides.get("ignore_private")),
+    )
+
+
+def get_changes(
+    paths: List[Path], since: Optional[str], staged: bool
+) -> Optional[Dict[str, List[Tuple[int, int]]]]:
+    """Find the changed line ranges of files beneath `paths`, either since the git
+    ref `since` or in the git index if `staged` is set.
+
+    Returns None if neither is set. Will print a message and exit if the changes
+    can't be read from git.
+    """
+    if since is None and not staged:
+        return None
+
+    from git.exc import GitCommandError, InvalidGitRepositoryError
+
+    from .git import changed_line_ranges
+
+    try:
+        return changed_line_ranges(since, staged, paths)
+    except InvalidGitRepositoryError:
+        print_error("The current directory is not part of a git repository.")
+    except GitCommandError as e:
+        message = e.stderr.strip().removeprefix("stderr: '").removesuffix("'")
+        print_error(f"Could not read changes from git: {message}")
+
+    sys.exit(1)
+
+
+def get_functions_from_daemon(
+    paths: List[Path],
+    cfg: PyGenDocsConfiguration,
+    changes: Optional[Dict[str, List[Tuple[int, int]]]] = None,
+    resolver: Optional[ConfigResolver] = None,
+) -> Optional[List[ResolvedFunction]]:
+    """Like `get_functions_from_paths`, but ask a running `pygendocs watch` for the
+    functions instead of scanning.
+
+    Returns None, after printing the reason to stderr, if no watcher could answer.
+    """
+    from .daemon import check_with_daemon, default_socket_path
+
+    functions, error = check_with_daemon(
+        default_socket_path(cfg),
+        paths or [Path(".")],
+        get_scan_filter(cfg, resolver),
+        cfg,
+    )
+
+    if functions is None:
+        print(f"  [dim]Scanning instead of using the watcher: {error}", file=sys.stderr)
+        return None
+
+    if changes is not None:
+        # NOTE: Functions are stored with the paths the watcher found them at.
+        changed = {os.path.abspath(f): r for f, r in changes.items()}
+        functions = filter_changed_functions(functions, changed)
+
+    if resolver is not None:
+        functions = filter_by_file_config(functions, resolver)
+
+    return functions
+
+
+def filter_changed_functions(
+    functions: List[ResolvedFunction], changes: Dict[str, List[Tuple[int, int]]]
+) -> List[ResolvedFunction]:
+    """Return the subset of `functions` whose span overlaps one of the changed line
+    ranges of their file in `changes`."""
+    return [
+        fn
+        for fn in functions
+        if any(
+            start <= fn.end_lineno and fn.lineno <= end
+            for start, end in changes.get(fn.source_file, ())
+        )
+    ]
+
+
+def generate_docstrings(
+    functions: List[ResolvedFunction],
+    cfg: PyGenDocsConfiguration,
+    scheduler: Optional["RequestScheduler"] = None,
+    report_errors: bool = True,
+    on_result: Optional[Callable[[ResolvedFunction, str], None]] = None,
+) -> Dict[ResolvedFunction, str]:
+    """Generate docstrings for the given `functions` concurrently, displaying live
+    progress while requests are in flight.
+
+    Functions whose docstring could not be generated are reported and left out of
+    the returned mapping, which is otherwise ordered the same as `functions`.
+
+    If streaming is enabled in `cfg`, docstrings are displayed while they are being
+    generated, and a summary of completion latency is printed afterwards.
+
+    Requests are sent through `scheduler`, or one configured from `cfg` if not
+    given. Errors are only printed if `report_errors` is set. `on_result` is called
+    with each docstring, cached or generated, as soon as it is ready, possibly from
+    worker threads.
+    """
+    from .cache import DocstringCache
+    from .dispatch import generate_function_docstrings
+    from .llm import get_endpoint_pool
+    from .scheduler import RequestScheduler
+
+    cache = DocstringCache.open(cfg.cache_dir) if cfg.docstring_cache else None
+
+    progress = Progress(
+        SpinnerColumn(),
+        TextColumn("[bold]Generating docstrings"),
+        TextColumn(
+            "{task.completed}/{task.total} done ({task.fields[cached]} cached), "
+            "{task.fields[in_flight]} in flight, [red]{task.fields[failed]} failed[/], "
+            "{task.fields[retries]} retries"
+        ),
+        TimeElapsedColumn(),
+    )
+    task = progress.add_task(
+        "", total=len(functions), in_flight=0, failed=0, cached=0, retries=0
+    )
+
+    ### Partial docstrings of streamed requests which are still in flight
+    partials: Dict[ResolvedFunction, str] = {}
+    partials_lock = threading.Lock()
+
+    def _on_partial(fn: ResolvedFunction, text: Optional[str]):
+        with partials_lock:
+            if text is None:
+                partials.pop(fn, None)
+            else:
+                partials[fn] = text
+
+    def _render() -> Group:
+        with partials_lock:
+            streaming = list(partials.items())
+
+        return Group(
+            *(
+                Panel(
+                    Syntax(_tail(text, _STREAMED_PANEL_LINES), "python"),
+                    title=format_function_location(fn),
+                    title_align="left",
+                )
+                for fn, text in streaming
+            ),
+            progress,
+        )
+
+    try:
+        with Live(get_renderable=_render, refresh_per_second=10) as live:
+            results = generate_function_docstrings(
+                functions,
+                cfg.llm_configuration,
+                concurrency=cfg.llm_concurrency,
+                on_progress=lambda p: progress.update(
+                    task,
+                    completed=p.done,
+                    in_flight=p.in_flight,
+                    failed=p.failed,
+                    cached=p.cached,
+                    retries=p.retries,
+                ),
+                cache=cache,
+                batch_token_budget=cfg.llm_batch_token_budget,
+                scheduler=scheduler or RequestScheduler.from_config(cfg),
+                stream=cfg.llm_stream,
+                on_partial=_on_partial if cfg.llm_stream else None,
+                on_result=on_result,
+                deduplicate=cfg.deduplicate_functions,
+                deduplicate_ignore_names=cfg.deduplicate_ignore_names,
+            )
+
+        # NOTE: Rich only ends the last line of the display itself on a terminal.
+        if not live.console.is_terminal:
+            live.console.line()
+
+    finally:
+        if cache is not None:
+            cache.prune(
+                cfg.docstring_cache_max_entries, cfg.docstring_cache_max_age_days
+            )
+            cache.close()
+
+    if report_errors:
+        for fn, e in results.errors.items():
+            print_error(
+                f"Failed to generate docstring for {format_function_location(fn)}: {e}"
+            )
+
+    if results.deduplicated:
+        print_message(
+            f"{results.deduplicated} of {results.generated} functions had the same body "
+            f"as another, and reused its docstring "
+            f"([bold]{results.deduplicated / results.generated:.0%}[/] fewer requests)."
+        )
+
+    if results.trimmed:
+        print_message(
+            f"{results.trimmed} functions were trimmed to the prompt token budget, "
+            f"saving [bold]{results.tokens_saved}[/] prompt tokens."
+        )
+
+    if results.stats:
+        print_completion_stats(list(results.stats.values()))
+
+    # NOTE: Only requests which weren't served from the cache reach an endpoint.
+    if len(cfg.llm_configuration.base_urls) > 1 and results.generated:
+        print_endpoint_stats(get_endpoint_pool(cfg.llm_configuration))
+
+    return results.docstrings
+
+
+def generate_docstrings_by_config(
+    functions: List[ResolvedFunction],
+    cfg: PyGenDocsConfiguration,
+    resolver: Optional[ConfigResolver] = None,
+    **kwargs,
+) -> Dict[ResolvedFunction, str]:
+    """Like `generate_docstrings`, but with the llm settings, such as the docstring
+    style, of the configuration each function's own source file resolves to.
+
+    Functions sharing the same settings are generated together, so this makes a
+    single call to `generate_docstrings` unless packages configure them differently.
+    """
+    if resolver is None:
+        return generate_docstrings(functions, cfg, **kwargs)
+
+    groups: Dict[tuple, List[ResolvedFunction]] = {}
+
+    for fn in functions:
+        file_cfg = resolver.for_file(fn.source_file)
+        key = tuple(getattr(file_cfg, k) for k in _PER_FILE_LLM_OPTIONS)
+        groups.setdefault(key, []).append(fn)
+
+    generated = {}
+
+    for key, group in groups.items():
+        group_cfg = cfg.model_copy(update=dict(zip(_PER_FILE_LLM_OPTIONS, key)))
+        generated.update(generate_docstrings(group, group_cfg, **kwargs))
+
+    return {fn: generated[fn] for fn in functions if fn in generated}
+
 
-    Return a subset of `functions` that adheres to the config.
+def generate_and_write(
+    functions: List[ResolvedFunction],
+    resumed: Dict[ResolvedFunction, str],
+    cfg: PyGenDocsConfiguration,
+    journal: "RunJournal",
+    resolver: Optional[ConfigResolver] = None,
+) -> IncrementalWriter:
+    """Generate docstrings for `functions`, and write each file as soon as all of its
+    docstrings are ready, rather than after every docstring has been generated.
+
+    Already generated `resumed` docstrings are written along with the new ones, and
+    each new docstring is recorded in `journal` before it is written. See
+    `generate_docstrings_by_config` for the meaning of `resolver`.
+
+    Written docstrings are reported once generation finishes, or is interrupted.
+    Returns the writer, recording what was written and any errors writing files.
     """
-    ### Filter for functions which already have docstrings
-    res = [f for f in functions if not f.has_docstring]
 
-    ### Filter constructors
-    if cfg.ignore_constructors:
-        res = [f for f in res if not f.name == "__init__"]
+    def _on_result(fn: ResolvedFunction, docstring: str):
+        journal.append(fn, docstring)
+        writer.put(fn, docstring)
+
+    writer = IncrementalWriter([*resumed, *functions])
+
+    try:
+        with profiling.span("generate"), writer:
+            for fn, docstring in resumed.items():
+                writer.put(fn, docstring)
+
+            if functions:
+                generate_docstrings_by_config(
+                    functions, cfg, resolver, on_result=_on_result
+                )
+
+    finally:
+        # NOTE: Reported afterwards, as printing from the writer thread would
+        #       interleave with the live progress display.
+        print()
+
+        for fn in sorted(writer.written, key=lambda fn: (fn.source_file, fn.lineno)):
+            print(f"✅ Wrote new docstring for {format_function_location(fn)} ")
+
+        for file, e in writer.errors.items():
+            print_error(f"Failed to write docstrings to {file}: {e}")
+
+    return writer
+
+
+def print_completion_stats(stats: List["CompletionStats"]):
+    """Prints a summary of the latency and throughput of streamed completions."""
+    from .bench import percentile
+
+    ttft = sorted(s.time_to_first_token for s in stats if s.time_to_first_token)
+
+    if not ttft:
+        return
+
+    rates = [s.tokens_per_second for s in stats if s.tokens_per_second]
+
+    print_message(
+        f"Time to first token: {percentile(ttft, 50):.2f}s p50, "
+        f"{percentile(ttft, 95):.2f}s p95. "
+        f"Generation speed: {statistics.fmean(rates) if rates else 0:.1f} tokens/s"
+    )
 
-    ### Filter internal
-    if cfg.ignore_internal:
-        res = [f for f in res if not re.match("^_[^_]+", f.name)]
 
-    ### Filter private
-    if cfg.ignore_private:
-        res = [f for f in res if not re.match("^__[^_]+", f.name)]
+def print_endpoint_stats(pool: "EndpointPool"):
+    """Prints a table of the requests, latency, and throughput of each endpoint."""
+    from .bench import percentile
 
-    return res
+    t = Table(box=box.SIMPLE_HEAD)
+    t.add_column("Endpoint", overflow="fold")
+
+    for column in ("Requests", "Failed", "p50", "p95", "Tokens/s"):
+        t.add_column(column, justify="right", no_wrap=True)
+
+    t.add_column("Status", no_wrap=True)
+
+    for e in pool.endpoints:
+        latencies = e.latencies
+
+        if pool.is_ejected(e):
+            status = "[red]ejected"
+        elif e.ejections:
+            status = f"[yellow]readmitted[/] [dim]({e.ejections}x ejected)"
+        else:
+            status = "[green]healthy"
+
+        t.add_row(
+            e.url or "DEFAULT",
+            str(e.requests),
+            str(e.failures),
+            f"{percentile(latencies, 50):.2f}s" if latencies else "-",
+            f"{percentile(latencies, 95):.2f}s" if latencies else "-",
+            f"{e.tokens_per_second:.1f}",
+            status,
+        )
+
+    print()
+    print(t)
+
+
+def _tail(text: str, lines: int) -> str:
+    """Return the last `lines` lines of `text`."""
+    return "\n".join(text.split("\n")[-lines:])
+
+
+def profiled(command: Callable) -> Callable:
+    """Decorate a cli command accepting `profile` and `profile_trace` options so
+    that, if `profile` is passed, the phases of the command are timed.
+
+    Once the command finishes or exits, a summary table is printed to stderr, so
+    that it doesn't mix with machine readable output, and the trace of every span
+    is written as JSON to `profile_trace`, which defaults to `profile.json` in the
+    configured cache directory.
+    """
+
+    @functools.wraps(command)
+    def wrapper(*args, **kwargs):
+        if not kwargs.get("profile"):
+            return command(*args, **kwargs)
+
+        profiler = profiling.enable()
+
+        try:
+            with profiling.span(command.__name__):
+                return command(*args, **kwargs)
+
+        finally:
+            profiling.disable()
+
+            trace = kwargs.get("profile_trace") or (
+                make_cache_dir(get_updated_config({}).cache_dir) / "profile.json"
+            )
+            profiler.write_trace(trace, command=command.__name__, argv=sys.argv[1:])
+
+            print_profile(profiler, file=sys.stderr)
+            print_message(f"Wrote profile trace to [bold]{trace}", file=sys.stderr)
+            print(file=sys.stderr)
+
+    return wrapper
+
+
+def print_profile(profiler: "profiling.Profiler", file: Optional[TextIO] = None):
+    """Prints a table summarizing the time spent in each profiled phase to `file`,
+    or stdout if not given."""
+    phases = profiler.summary()
+    # NOTE: The command itself is always the first phase to start.
+    total = phases[0].total if phases else 0.0
+
+    t = Table(box=box.SIMPLE_HEAD)
+    t.add_column("Phase", no_wrap=True)
+
+    for column in ("Calls", "Total", "Mean", "Max", "%"):
+        t.add_column(column, justify="right", no_wrap=True)
+
+    t.add_column("Counters")
+
+    for p in phases:
+        t.add_row(
+            p.name,
+            str(p.calls),
+            f"{p.total:.3f}s",
+            f"{p.mean * 1000:.1f}ms",
+            f"{p.max * 1000:.1f}ms",
+            f"{p.total * 100 / total:.1f}" if total else "-",
+            ", ".join(f"{k}={v:g}" for k, v in sorted(p.attrs.items())),
+        )
+
+    print(file=file)
+    print(t, file=file)
+    print(
+        "  [dim]Phases run concurrently on several threads can exceed 100%, and "
+        "nested phases are included in their parents.",
+        file=file,
+    )
+    print(file=file)
 
 
 def try_get_api_key(api_env_key: str) -> str:
@@ -92,9 +676,10 @@ def try_get_api_key(api_env_key: str) -> str:
         sys.exit(1)
 
 
-def print_message(m: str):
-    """Prints the given message `m` with some standard formatting."""
-    print(f"  [bold yellow]>[/] [bold]{m}")
+def print_message(m: str, file: Optional[TextIO] = None):
+    """Prints the given message `m` with some standard formatting to `file`, or
+    stdout if not given."""
+    print(f"  [bold yellow]>[/] [bold]{m}", file=file)
 
 
 def print_error(m: str):
@@ -112,21 +697,28 @@ def print_function(fn: ResolvedFunction, lines: int = 50):
     print(
         Panel(
             Syntax("\n" + body, "python"),
-            title=f"{fn.source_file}:[bold]{fn.name}",
+            title=format_function_location(fn),
             title_align="left",
         )
     )
 
 
 def get_updated_config(opts: dict) -> PyGenDocsConfiguration:
-    """Generate a config struct from default or from the contents of pyproject.toml,
-    and then update it with the contents of `opts`.
+    """Generate a config struct from default or from the contents of the nearest
+    pyproject.toml, and then update it with the contents of `opts`.
+
+    Options in `opts` with a value of None were not specified, and are ignored.
     """
-    return PyGenDocsConfiguration(**dict(read_from_toml().model_dump(), **opts))
+    return ConfigResolver(opts).for_directory(os.curdir)
 
 
 def format_function_location(fn: ResolvedFunction) -> str:
-    return f"{fn.source_file}:[bold]{fn.name}"
+    return f"{fn.source_file}:[bold]{fn.qualified_name}"
+
+
+def format_api_urls(cfg: PyGenDocsConfiguration) -> str:
+    """The configured llm server urls, for display."""
+    return ", ".join(url or "DEFAULT" for url in cfg.llm_configuration.base_urls)
 
 
 def answered_yes(m: str, default="yes") -> bool:
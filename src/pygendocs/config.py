@@ -1,8 +1,12 @@
 """Functionality to parse user defined config variables.
 """
 
+import os
+
 from enum import Enum
-from typing import Optional
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Union
 
 import tomli
 
@@ -13,7 +17,21 @@ class LLMConfiguration(BaseModel):
     model: str
     max_tokens: int = 800
     api_token_env_key: str
-    base_url: Optional[str] = None
+    base_url: Union[str, List[str], None] = None
+    timeout: Optional[float] = None
+    docstring_style: str = "Google"
+    prompt_token_budget: int = 0
+    batch_max_tokens: int = 4096
+    endpoint_eject_after: int = 3
+    endpoint_eject_seconds: float = 30.0
+
+    @property
+    def base_urls(self) -> List[Optional[str]]:
+        """Every configured endpoint, or only None for the openai default."""
+        if isinstance(self.base_url, list):
+            return list(self.base_url) or [None]
+
+        return [self.base_url]
 
     def __hash__(self):
         return hash(
@@ -25,6 +43,7 @@ class LLMConfiguration(BaseModel):
                         self.max_tokens,
                         self.api_token_env_key,
                         self.base_url,
+                        self.docstring_style,
                     ]
                 )
             )
@@ -57,6 +76,53 @@ class PyGenDocsConfiguration(BaseModel):
 
     coverage_threshold: float = 100
 
+    jobs: int = 1
+    """Number of worker processes used to parse input files. Values less than one
+    will use one worker per available cpu. Defaults to 1, parsing files serially."""
+
+    include: List[str] = ["*.py"]
+    """Glob patterns which files found in input directories must match to be scanned."""
+
+    exclude: List[str] = [
+        ".git",
+        ".hg",
+        ".svn",
+        ".venv",
+        "venv",
+        "node_modules",
+        "__pycache__",
+        ".tox",
+        ".nox",
+        ".pygendocs_cache",
+        "*.egg-info",
+        "build",
+        "dist",
+    ]
+    """Gitignore-style glob patterns for files and directories to skip when walking
+    input directories. Excluded directories are not descended into. Setting this
+    replaces the default list."""
+
+    respect_gitignore: bool = True
+    """Whether or not to skip files and directories ignored by `.gitignore` files."""
+
+    scan_index: bool = True
+    """Whether or not to keep a persistent index of scanned files in `cache_dir`, so
+    that files which have not changed since the last scan are not parsed again."""
+
+    cache_dir: str = ".pygendocs_cache"
+    """Directory in which pygendocs stores persistent state, such as the scan index."""
+
+    docstring_cache: bool = True
+    """Whether or not to cache generated docstrings in `cache_dir`, so that unchanged
+    functions are not sent to the llm again."""
+
+    docstring_cache_max_entries: Optional[int] = 10000
+    """Maximum number of docstrings kept in the cache. The least recently used
+    docstrings are evicted first."""
+
+    docstring_cache_max_age_days: Optional[float] = 90
+    """Docstrings which have not been used for this many days are evicted."""
+
     include_fixme_header: bool = True
     """Whether or not to prepend an additional line of documentation containing a FIXME: 
     tag signalling that this docstring was autogenerated and should be reviewed."""
@@ -67,12 +133,24 @@ class PyGenDocsConfiguration(BaseModel):
     Defaults to Google python style.
     """
 
-    llm_api_url: Optional[str] = None  # "https://api.openai.com/v1/chat/completions"
+    llm_api_url: Union[
+        str, List[str], None
+    ] = None  # "https://api.openai.com/v1/chat/completions"
     """The environment variable from which the url of the chosen llm api is hosted.
-    
+
+    Several urls of replicas of the same server may be given as a list. Requests are
+    then sent to the replica with the fewest in flight. See `endpoints.EndpointPool`.
+
     Defaults to openai chatgpt completion endpoint.
     """
 
+    llm_endpoint_eject_after: int = 3
+    """Number of consecutive connection or server errors after which a replica in
+    `llm_api_url` stops receiving requests for a while."""
+
+    llm_endpoint_eject_seconds: float = 30
+    """Seconds for which a failing replica stops receiving requests."""
+
     llm_api_token_env_key: str = "OPENAI_API_KEY"
     """The environment variable from which any required llm api token will be read from.
 
@@ -86,6 +164,50 @@ class PyGenDocsConfiguration(BaseModel):
     """Token limit for responses. See openai api documentation for more information
     about tokens """
 
+    llm_concurrency: int = 4
+    """Maximum number of completion requests awaiting a response at once."""
+
+    llm_request_timeout: Optional[float] = 120
+    """Time in seconds after which a single completion request is abandoned."""
+
+    llm_requests_per_minute: Optional[float] = None
+    """Maximum number of completion requests sent per minute. Unlimited by default."""
+
+    llm_tokens_per_minute: Optional[float] = None
+    """Maximum number of tokens, counting prompts and the completion token limit,
+    sent per minute. Unlimited by default."""
+
+    llm_max_retries: int = 5
+    """Number of times a request is retried after a rate limit, timeout, connection,
+    or server error. Retries back off exponentially, honouring `Retry-After`."""
+
+    llm_prompt_token_budget: int = 0
+    """If greater than zero, functions longer than this many tokens are trimmed
+    before being sent to the llm. Their signature, and return, raise, and yield
+    statements are kept, followed by as many of their leading lines as fit.
+    Defaults to 0, sending every function whole."""
+
+    llm_batch_token_budget: int = 0
+    """If greater than zero, several small functions are packed into each completion
+    request, up to this many prompt tokens. Defaults to 0, one function per request."""
+
+    llm_batch_completion_max_tokens: int = 4096
+    """Token limit for the responses of batched requests, which otherwise allow
+    `llm_completion_max_tokens` per function. Keep this within the completion limit
+    of the model, as requests asking for more are rejected."""
+
+    deduplicate_functions: bool = True
+    """Whether or not to generate a single docstring for functions with identical
+    bodies, ignoring formatting and comments, and reuse it for each of them."""
+
+    deduplicate_ignore_names: bool = False
+    """Whether or not functions which only differ by name count as identical when
+    deduplicating."""
+
+    llm_stream: bool = False
+    """Whether or not to stream completions, displaying docstrings while they are
+    generated and recording time to first token. Batched requests are not streamed."""
+
     class config:
         """Needed for pydantic to support arbitrary types."""
 
@@ -98,15 +220,108 @@ class PyGenDocsConfiguration(BaseModel):
             max_tokens=self.llm_completion_max_tokens,
             base_url=self.llm_api_url,
             api_token_env_key=self.llm_api_token_env_key,
+            timeout=self.llm_request_timeout,
+            docstring_style=self.docstring_style.value,
+            prompt_token_budget=self.llm_prompt_token_budget,
+            batch_max_tokens=self.llm_batch_completion_max_tokens,
+            endpoint_eject_after=self.llm_endpoint_eject_after,
+            endpoint_eject_seconds=self.llm_endpoint_eject_seconds,
         )
 
 
-def read_from_toml(config_file: str = "pyproject.toml") -> PyGenDocsConfiguration:
-    """Load the configuration for the given project from the project's toml file."""
+_CONFIG_FILE_NAME = "pyproject.toml"
+
+
+def make_cache_dir(cache_dir: str | Path) -> Path:
+    """Create `cache_dir` if needed, along with a `.gitignore` ignoring everything
+    in it, so that it never shows up as a change in the user's repository."""
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    gitignore = cache_dir / ".gitignore"
+
+    if not gitignore.exists():
+        gitignore.write_text("# Created by pygendocs.\n*\n")
+
+    return cache_dir
+
+
+def read_from_toml(config_file: str = _CONFIG_FILE_NAME) -> PyGenDocsConfiguration:
+    """Load the configuration for the given project from the project's toml file.
+
+    Each toml file is only parsed once, unless it is modified.
+    """
     try:
-        with open(config_file, "r") as f:
-            config_dict = tomli.loads(f.read()).get("tool", {}).get("pygendocs", {})
+        mtime_ns = os.stat(config_file).st_mtime_ns
     except FileNotFoundError:
-        config_dict = {}
+        return PyGenDocsConfiguration()
+
+    return PyGenDocsConfiguration(
+        **_read_config_section(os.path.abspath(config_file), mtime_ns)
+    )
+
+
+@lru_cache(maxsize=None)
+def _read_config_section(config_file: str, mtime_ns: int) -> dict:
+    """The `[tool.pygendocs]` table of `config_file`, as it was at `mtime_ns`."""
+    with open(config_file, "r") as f:
+        return tomli.loads(f.read()).get("tool", {}).get("pygendocs", {})
+
+
+@lru_cache(maxsize=None)
+def find_config_file(directory: str) -> Optional[str]:
+    """Path of the nearest pyproject.toml in the absolute `directory` or any of its
+    parents, or None if there is none."""
+    config_file = os.path.join(directory, _CONFIG_FILE_NAME)
+
+    if os.path.isfile(config_file):
+        return config_file
+
+    parent = os.path.dirname(directory)
+    return None if parent == directory else find_config_file(parent)
+
+
+class ConfigResolver:
+    """Resolves the configuration applying to each source file, read from the
+    nearest pyproject.toml above it, so that each package of a monorepo can be
+    configured separately.
+
+    Configurations are memoized per directory and per pyproject.toml, so resolving
+    the configuration of every scanned file stays cheap.
+    """
+
+    def __init__(self, overrides: Optional[dict] = None):
+        self.overrides = {k: v for k, v in (overrides or {}).items() if v is not None}
+        """Options applied on top of every configuration, such as those given on the
+        command line. Options with a value of None are ignored."""
+
+        self._by_directory: Dict[str, PyGenDocsConfiguration] = {}
+        self._by_config_file: Dict[Optional[str], PyGenDocsConfiguration] = {}
+
+    def for_directory(self, directory: str | os.PathLike) -> PyGenDocsConfiguration:
+        """Configuration applying to files in `directory`."""
+        directory = os.path.abspath(directory)
+        cfg = self._by_directory.get(directory)
+
+        if cfg is None:
+            config_file = find_config_file(directory)
+            cfg = self._by_config_file.get(config_file)
+
+            if cfg is None:
+                base = (
+                    read_from_toml(config_file)
+                    if config_file
+                    else PyGenDocsConfiguration()
+                )
+                cfg = PyGenDocsConfiguration(
+                    **dict(base.model_dump(), **self.overrides)
+                )
+                self._by_config_file[config_file] = cfg
+
+            self._by_directory[directory] = cfg
+
+        return cfg
 
-    return PyGenDocsConfiguration(**config_dict)
+    def for_file(self, file: str | os.PathLike) -> PyGenDocsConfiguration:
+        """Configuration applying to `file`."""
+        return self.for_directory(os.path.dirname(os.path.abspath(file)))
@@ -0,0 +1,338 @@
+"""Long running watcher which keeps the functions of a source tree in memory, and
+answers coverage queries over a local Unix socket.
+
+The watcher polls the tree for changes, and only re-parses files whose size or
+modification time changed. The tree is only walked again when one of its
+directories changed, and queries bring the files they ask about up to date before
+being answered. Clients send a single JSON line per connection, and receive a
+single JSON line in response. See `query_daemon`.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .config import PyGenDocsConfiguration, make_cache_dir
+from .functions import FunctionFilter, ResolvedFunction
+from .index import ScanIndex, get_functions_with_index
+from .walk import iter_source_files
+
+_LOGGER = logging.getLogger(__name__)
+
+_SOCKET_FILE_NAME = "watch.sock"
+
+
+def default_socket_path(cfg: PyGenDocsConfiguration) -> Path:
+    """Location of the socket a watcher for the project in the current directory
+    listens on."""
+    return Path(cfg.cache_dir) / _SOCKET_FILE_NAME
+
+
+class WatchedTree:
+    """In-memory index of every function beneath a set of input paths.
+
+    Functions are stored unfiltered, so that queries can apply their own
+    `FunctionFilter`.
+    """
+
+    def __init__(self, paths: List[str | Path], cfg: PyGenDocsConfiguration):
+        self.paths = [os.path.abspath(p) for p in paths]
+        """Absolute paths being watched."""
+
+        self.cfg = cfg
+
+        # NOTE: This index is only held in memory, and is never saved.
+        self.index = ScanIndex(os.devnull)
+        """Scan results of every watched file."""
+
+        self.refreshed: Optional[float] = None
+        """Wall clock time of the last completed refresh."""
+
+        self._directories: Optional[Dict[str, Tuple[int, Optional[int]]]] = None
+        """State of every directory as of the last walk. See `_directory_state`."""
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, paths: Optional[List[str]] = None) -> int:
+        """Bring the index up to date with the files on disk, parsing only files
+        which are new or changed.
+
+        The tree is only walked again if one of its directories changed since the
+        last walk, such as by files being added, removed, or ignored. Otherwise only
+        the files already known are checked, or only those beneath the absolute
+        `paths` if given.
+
+        Returns the number of files which were parsed.
+        """
+        with self._refresh_lock:
+            with self._lock:
+                entries = self.index.entries
+
+            directories = None
+
+            if self._directories is None or self._directories_changed():
+                directories = {}
+                files = self._walk(directories)
+            else:
+                files = [f for f in entries if paths is None or _is_beneath(f, paths)]
+
+            # NOTE: Refresh a copy, so queries can read the current entries meanwhile.
+            index = ScanIndex(self.index.path, entries=dict(entries))
+
+            try:
+                get_functions_with_index(files, index, self.cfg.jobs)
+            except FileNotFoundError:
+                # NOTE: A known file was removed since its directory was checked.
+                directories = {}
+                files = self._walk(directories)
+                get_functions_with_index(files, index, self.cfg.jobs)
+
+            if directories is not None:
+                index.entries = {f: index.entries[f] for f in files}
+                self._directories = directories
+
+            parsed = sum(1 for f in files if entries.get(f) is not index.entries[f])
+
+            with self._lock:
+                self.index = index
+                self.refreshed = time.time()
+
+            return parsed
+
+    def _walk(self, directories: Dict[str, Tuple[int, Optional[int]]]) -> List[str]:
+        """Find every watched source file, recording the state of each directory
+        walked in `directories`."""
+        return list(
+            iter_source_files(
+                self.paths,
+                include=self.cfg.include,
+                exclude=self.cfg.exclude,
+                respect_gitignore=self.cfg.respect_gitignore,
+                on_directory=lambda d: directories.__setitem__(d, _directory_state(d)),
+            )
+        )
+
+    def _directories_changed(self) -> bool:
+        for d, state in self._directories.items():
+            try:
+                if _directory_state(d) != state:
+                    return True
+            except FileNotFoundError:
+                return True
+
+        return False
+
+    def watches(self, path: str) -> bool:
+        """Whether `path` is, or is beneath, one of the watched paths."""
+        return _is_beneath(path, self.paths)
+
+    def functions(
+        self, paths: List[str], function_filter: FunctionFilter
+    ) -> List[ResolvedFunction]:
+        """Functions accepted by `function_filter` in the watched files beneath the
+        absolute `paths`, grouped by file in sorted order."""
+        with self._lock:
+            entries = self.index.entries
+
+        return [
+            fn
+            for f in sorted(entries)
+            if _is_beneath(f, paths)
+            for fn in entries[f].functions
+            if function_filter(fn.name)
+        ]
+
+    def handle(self, request: dict) -> dict:
+        """Answer a single client `request`."""
+        command = request.get("command")
+
+        if command == "status":
+            with self._lock:
+                entries = self.index.entries
+
+            return {
+                "ok": True,
+                "paths": self.paths,
+                "files": len(entries),
+                "functions": sum(len(e.functions) for e in entries.values()),
+                "refreshed": self.refreshed,
+            }
+
+        if command == "check":
+            paths = [os.path.abspath(p) for p in request.get("paths") or self.paths]
+            unwatched = [p for p in paths if not self.watches(p)]
+
+            if unwatched:
+                return {"ok": False, "error": f"Not watching {', '.join(unwatched)}"}
+
+            settings = _walk_settings(self.cfg)
+
+            if request.get("settings", settings) != settings:
+                return {
+                    "ok": False,
+                    "error": "Watching with different include, exclude, or gitignore "
+                    "settings",
+                }
+
+            # NOTE: Answer from the files as they are now, not as of the last poll.
+            self.refresh(paths)
+
+            functions = self.functions(paths, FunctionFilter(**request["filter"]))
+
+            return {
+                "ok": True,
+                "functions": [asdict(fn) for fn in functions],
+                "refreshed": self.refreshed,
+            }
+
+        return {"ok": False, "error": f"Unknown command {command!r}"}
+
+
+def serve(
+    tree: WatchedTree,
+    socket_path: str | Path,
+    interval: float = 1.0,
+    on_refresh=None,
+    stop: Optional[threading.Event] = None,
+):
+    """Answer queries about `tree` on the Unix socket at `socket_path`, refreshing
+    it every `interval` seconds, until interrupted or `stop` is set.
+
+    `on_refresh` is called with the number of parsed files after each refresh
+    which parsed any.
+    """
+    if stop is None:
+        stop = threading.Event()
+
+    socket_path = Path(socket_path)
+    make_cache_dir(socket_path.parent)
+
+    if _is_listening(socket_path):
+        raise RuntimeError(f"Another watcher is already listening on {socket_path}")
+
+    # NOTE: A socket file left behind by a watcher which was killed would make
+    #       binding fail.
+    socket_path.unlink(missing_ok=True)
+
+    class _Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                response = tree.handle(json.loads(self.rfile.readline()))
+            except Exception as e:
+                _LOGGER.debug(f"Failed to answer watch query: {e}")
+                response = {"ok": False, "error": str(e)}
+
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+
+    server = socketserver.ThreadingUnixStreamServer(str(socket_path), _Handler)
+    server.daemon_threads = True
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        while not stop.wait(interval):
+            try:
+                parsed = tree.refresh()
+            except OSError as e:
+                # NOTE: Files may disappear mid-refresh, the next one catches up.
+                _LOGGER.debug(f"Refresh failed, retrying: {e}")
+                continue
+
+            if parsed and on_refresh is not None:
+                on_refresh(parsed)
+
+    finally:
+        server.shutdown()
+        server.server_close()
+        socket_path.unlink(missing_ok=True)
+
+
+def query_daemon(
+    socket_path: str | Path, request: dict, timeout: float = 10.0
+) -> Optional[dict]:
+    """Send `request` to the watcher listening on `socket_path`, and return its
+    response, or None if no watcher is listening."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.settimeout(timeout)
+            s.connect(str(socket_path))
+            s.sendall(json.dumps(request).encode() + b"\n")
+
+            with s.makefile("rb") as f:
+                return json.loads(f.readline())
+
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+
+
+def check_with_daemon(
+    socket_path: str | Path,
+    paths: List[str | Path],
+    function_filter: FunctionFilter,
+    cfg: Optional[PyGenDocsConfiguration] = None,
+) -> Tuple[Optional[List[ResolvedFunction]], Optional[str]]:
+    """Ask the watcher on `socket_path` for the functions accepted by
+    `function_filter` beneath `paths`. If `cfg` is given, the watcher only answers
+    if it finds files with the same settings.
+
+    Returns the functions, or None and the reason the watcher could not answer.
+    """
+    request = {
+        "command": "check",
+        "paths": [os.path.abspath(p) for p in paths],
+        "filter": asdict(function_filter),
+    }
+
+    if cfg is not None:
+        request["settings"] = _walk_settings(cfg)
+
+    response = query_daemon(socket_path, request)
+
+    if response is None:
+        return None, "no watcher is running"
+
+    if not response.get("ok"):
+        return None, response.get("error", "unknown error")
+
+    return [ResolvedFunction(**fn) for fn in response["functions"]], None
+
+
+def _walk_settings(cfg: PyGenDocsConfiguration) -> dict:
+    """Settings which decide the files found beneath the watched paths."""
+    return {
+        "include": list(cfg.include),
+        "exclude": list(cfg.exclude),
+        "respect_gitignore": cfg.respect_gitignore,
+    }
+
+
+def _directory_state(directory: str) -> Tuple[int, Optional[int]]:
+    """Modification times of `directory`, which changes as entries are added,
+    removed, or renamed in it, and of its `.gitignore` file, or None if it has
+    none."""
+    mtime_ns = os.stat(directory).st_mtime_ns
+
+    try:
+        gitignore_mtime_ns = os.stat(os.path.join(directory, ".gitignore")).st_mtime_ns
+    except FileNotFoundError:
+        gitignore_mtime_ns = None
+
+    return mtime_ns, gitignore_mtime_ns
+
+
+def _is_beneath(path: str, roots: List[str]) -> bool:
+    return any(path == r or path.startswith(r + os.sep) for r in roots)
+
+
+def _is_listening(socket_path: Path) -> bool:
+    return query_daemon(socket_path, {"command": "status"}, timeout=1.0) is not None
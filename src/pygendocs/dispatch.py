@@ -0,0 +1,391 @@
+"""Concurrent dispatch of docstring generation requests to the llm server.
+"""
+import hashlib
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Callable, Dict, List, Optional, TypeVar, Union
+
+from . import profiling
+from .cache import DocstringCache
+from .config import LLMConfiguration
+from .functions import ResolvedFunction, normalize_function_source
+from .scheduler import RequestScheduler
+from .llm import (
+    CompletionStats,
+    batch_completion_max_tokens,
+    count_tokens,
+    docstring_cache_key,
+    generate_function_docstring,
+    generate_function_docstring_streamed,
+    generate_function_docstrings_batched,
+    pack_batches,
+    prepare_function_body,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_Outcome = Union[str, Exception]
+"""Either a generated docstring, or the error raised while generating it."""
+
+
+@dataclass
+class DispatchProgress:
+    """Snapshot of the state of a batch of dispatched requests."""
+
+    total: int
+    """Total number of requests to be dispatched."""
+
+    done: int = 0
+    """Number of requests which completed successfully."""
+
+    in_flight: int = 0
+    """Number of requests currently awaiting a response."""
+
+    failed: int = 0
+    """Number of requests which raised an error."""
+
+    cached: int = 0
+    """Number of docstrings served from the cache without a request. These are also
+    counted as done."""
+
+    retries: int = 0
+    """Number of times a request was retried after a transient failure."""
+
+
+@dataclass
+class DispatchResults:
+    """Results of a batch of dispatched docstring requests."""
+
+    docstrings: Dict[ResolvedFunction, str] = field(default_factory=dict)
+    """Mapping from functions to their newly generated docstrings, in the order the
+    functions were given."""
+
+    errors: Dict[ResolvedFunction, Exception] = field(default_factory=dict)
+    """Mapping from functions to the error raised while generating their docstring."""
+
+    stats: Dict[ResolvedFunction, CompletionStats] = field(default_factory=dict)
+    """Mapping from functions to timing stats about their streamed completion. Only
+    populated when streaming."""
+
+    generated: int = 0
+    """Number of functions which needed a docstring generated, as they weren't
+    cached."""
+
+    deduplicated: int = 0
+    """Number of those functions which reused the docstring generated for another
+    function with an identical body, rather than being sent to the llm."""
+
+    trimmed: int = 0
+    """Number of functions trimmed to the prompt token budget before being sent."""
+
+    tokens_saved: int = 0
+    """Total number of prompt tokens saved by trimming functions."""
+
+
+def generate_function_docstrings(
+    functions: List[ResolvedFunction],
+    cfg: LLMConfiguration,
+    concurrency: int = 1,
+    on_progress: Optional[Callable[[DispatchProgress], None]] = None,
+    cache: Optional[DocstringCache] = None,
+    batch_token_budget: int = 0,
+    scheduler: Optional[RequestScheduler] = None,
+    stream: bool = False,
+    on_partial: Optional[Callable[[ResolvedFunction, Optional[str]], None]] = None,
+    on_result: Optional[Callable[[ResolvedFunction, str], None]] = None,
+    deduplicate: bool = False,
+    deduplicate_ignore_names: bool = False,
+) -> DispatchResults:
+    """Generate docstrings for each of the given `functions`, with at most
+    `concurrency` requests in flight at once.
+
+    If `batch_token_budget` is given, several functions are packed into each
+    request up to that many prompt tokens. Functions whose docstring can't be
+    parsed from a batched reply, or whose batched request failed, are retried with
+    a request of their own.
+
+    A failed request does not stop the remaining requests, and is instead recorded
+    in the returned `DispatchResults.errors`.
+
+    Args:
+        functions: Functions to generate docstrings for.
+        cfg: The current LLMConfiguration struct.
+        concurrency: Maximum number of requests awaiting a response at once.
+        on_progress: Optional callback receiving a `DispatchProgress` snapshot each
+            time a request starts or finishes. May be called from worker threads.
+        cache: Optional docstring cache. Functions with a cached docstring are not
+            dispatched, and newly generated docstrings are stored in it. Batched
+            and unbatched docstrings are cached separately.
+        batch_token_budget: Maximum prompt tokens per batched request. Batching is
+            disabled if this is less than one.
+        scheduler: Scheduler applying rate limits and retries to each request.
+            Defaults to one allowing `concurrency` requests with no rate limits.
+        stream: Whether or not to stream completions as they are generated.
+            Batched requests are never streamed.
+        on_partial: Optional callback receiving each function and its partial
+            docstring while streaming, and None once the function is finished.
+            May be called from worker threads.
+        on_result: Optional callback receiving each function and its docstring as
+            soon as it is ready, before the remaining requests finish. Cached
+            docstrings are passed to it before any request is sent. May be called
+            from worker threads.
+        deduplicate: Whether or not to send functions whose bodies are identical,
+            ignoring formatting and comments, to the llm only once, and give every
+            one of them the generated docstring.
+        deduplicate_ignore_names: Whether or not functions which only differ by
+            name count as identical when deduplicating.
+
+    Returns:
+        A `DispatchResults` struct, ordered the same as `functions`.
+    """
+    progress = DispatchProgress(total=len(functions))
+    lock = threading.Lock()
+
+    if scheduler is None:
+        scheduler = RequestScheduler(max_concurrency=concurrency)
+
+    def _update(**deltas):
+        with lock:
+            for k, v in deltas.items():
+                setattr(progress, k, getattr(progress, k) + v)
+
+            snapshot = replace(progress)
+
+        if on_progress is not None:
+            on_progress(snapshot)
+
+    def _schedule(request: Callable[[], T], bodies: List[str]) -> T:
+        tokens = 0
+
+        if scheduler.limits_tokens:
+            tokens = sum(count_tokens(b, cfg.model) for b in bodies)
+
+            if len(bodies) > 1:
+                tokens += batch_completion_max_tokens(len(bodies), cfg)
+            else:
+                tokens += cfg.max_tokens
+
+        return scheduler.call(
+            request, tokens, on_retry=lambda e, delay: _update(retries=1)
+        )
+
+    def _finish(fn: ResolvedFunction, outcome: _Outcome):
+        failed = isinstance(outcome, Exception)
+        copies = duplicates.get(fn, [])
+
+        _update(**_outcome_deltas(outcome))
+
+        if copies:
+            _update(**{"failed" if failed else "done": len(copies)})
+
+        if on_result is not None and not failed:
+            for f in (fn, *copies):
+                on_result(f, outcome)
+
+    trims = {"trimmed": 0, "tokens_saved": 0}
+
+    def _on_trim(saved: int):
+        with lock:
+            trims["trimmed"] += 1
+            trims["tokens_saved"] += saved
+
+    def _prepare(fn: ResolvedFunction) -> str:
+        return prepare_function_body(fn.source_str, cfg, on_trim=_on_trim)
+
+    # NOTE: Bodies prepared while packing batches, so they aren't trimmed twice.
+    prompt_bodies: Dict[ResolvedFunction, str] = {}
+
+    def _prompt_body(fn: ResolvedFunction) -> str:
+        body = prompt_bodies.pop(fn, None)
+        return body if body is not None else _prepare(fn)
+
+    def _partial_callback(fn: ResolvedFunction) -> Optional[Callable[[str], None]]:
+        if on_partial is None:
+            return None
+
+        return lambda text: on_partial(fn, text)
+
+    def _generate(batch: List[ResolvedFunction]) -> Dict[ResolvedFunction, _Outcome]:
+        _update(in_flight=len(batch))
+
+        outcomes: Dict[ResolvedFunction, _Outcome] = {}
+        batch_bodies: Dict[ResolvedFunction, str] = {}
+
+        if len(batch) > 1:
+            bodies = [_prompt_body(fn) for fn in batch]
+            batch_bodies = dict(zip(batch, bodies))
+
+            try:
+                replies = _schedule(
+                    lambda: generate_function_docstrings_batched(bodies, cfg), bodies
+                )
+            except Exception as e:
+                # NOTE: Retry each function on its own below, as the batch may have
+                #       failed for being too large rather than the server failing.
+                _LOGGER.debug(f"Batched request of {len(batch)} functions failed: {e}")
+                replies = [None] * len(batch)
+
+            for fn, reply in zip(batch, replies):
+                if reply:
+                    outcomes[fn] = reply
+                    _finish(fn, reply)
+
+        ### Single requests, including fallbacks for failed or unparsed batches
+        for fn in batch:
+            if fn in outcomes:
+                continue
+
+            body = batch_bodies.get(fn) or _prompt_body(fn)
+
+            try:
+                if stream:
+                    outcomes[fn], stats[fn] = _schedule(
+                        lambda: generate_function_docstring_streamed(
+                            body, cfg, on_text=_partial_callback(fn)
+                        ),
+                        [body],
+                    )
+                else:
+                    outcomes[fn] = _schedule(
+                        lambda: generate_function_docstring(body, cfg), [body]
+                    )
+            except Exception as e:
+                _LOGGER.debug(f"Docstring generation failed for {fn.name}: {e}")
+                outcomes[fn] = e
+
+            # NOTE: Empty docstrings are failures, so they aren't journaled or cached.
+            if not isinstance(outcomes[fn], Exception) and not outcomes[fn]:
+                outcomes[fn] = ValueError(f"Empty docstring generated for {fn.name}")
+
+            if stream and on_partial is not None:
+                on_partial(fn, None)
+
+            _finish(fn, outcomes[fn])
+
+        return outcomes
+
+    generated: Dict[ResolvedFunction, str] = {}
+    errors: Dict[ResolvedFunction, Exception] = {}
+    stats: Dict[ResolvedFunction, CompletionStats] = {}
+
+    ### Serve what we can from the cache
+    keys: Dict[ResolvedFunction, str] = {}
+    pending: List[ResolvedFunction] = []
+
+    with profiling.span("cache.lookup") as s:
+        for fn in functions:
+            if cache is None:
+                pending.append(fn)
+                continue
+
+            keys[fn] = docstring_cache_key(
+                fn.source_str, cfg, batched=batch_token_budget > 0
+            )
+            docstring = cache.get(keys[fn])
+
+            # NOTE: Empty docstrings were stored by older versions, so regenerate them.
+            if not docstring:
+                pending.append(fn)
+            else:
+                generated[fn] = docstring
+
+        s.add(hits=len(generated), misses=len(pending) if cache is not None else 0)
+
+    if generated:
+        _update(done=len(generated), cached=len(generated))
+
+        if on_result is not None:
+            for fn, docstring in generated.items():
+                on_result(fn, docstring)
+
+    ### Only send one of each set of functions with identical bodies
+    duplicates: Dict[ResolvedFunction, List[ResolvedFunction]] = {}
+    to_generate = len(pending)
+
+    if deduplicate:
+        with profiling.span("dedup") as s:
+            pending = _deduplicate(pending, duplicates, deduplicate_ignore_names)
+            s.add(functions=to_generate, unique=len(pending))
+
+    ### Dispatch the rest
+    if batch_token_budget > 0:
+        prompt_bodies.update((fn, _prepare(fn)) for fn in pending)
+        batches = [
+            [pending[i] for i in batch]
+            for batch in pack_batches(
+                [prompt_bodies[fn] for fn in pending],
+                batch_token_budget,
+                cfg.model,
+            )
+        ]
+    else:
+        batches = [[fn] for fn in pending]
+
+    if batches:
+        executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+
+        try:
+            futures = [executor.submit(_generate, batch) for batch in batches]
+
+            for future in futures:
+                for rep, outcome in future.result().items():
+                    for fn in (rep, *duplicates.get(rep, [])):
+                        if isinstance(outcome, Exception):
+                            errors[fn] = outcome
+                            continue
+
+                        generated[fn] = outcome
+
+                        if cache is not None:
+                            with profiling.span("cache.store"):
+                                cache.put(keys[fn], outcome)
+
+        finally:
+            # NOTE: On interrupt, drop queued requests rather than waiting for them.
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return DispatchResults(
+        docstrings={fn: generated[fn] for fn in functions if fn in generated},
+        errors={fn: errors[fn] for fn in functions if fn in errors},
+        stats={fn: stats[fn] for fn in functions if fn in stats},
+        generated=to_generate,
+        deduplicated=to_generate - len(pending),
+        **trims,
+    )
+
+
+def _deduplicate(
+    functions: List[ResolvedFunction],
+    duplicates: Dict[ResolvedFunction, List[ResolvedFunction]],
+    ignore_names: bool,
+) -> List[ResolvedFunction]:
+    """Return the first of each set of `functions` with identical normalized bodies,
+    recording the others in `duplicates` under the function they duplicate."""
+    first: Dict[str, ResolvedFunction] = {}
+    unique: List[ResolvedFunction] = []
+
+    for fn in functions:
+        normalized = normalize_function_source(fn.source_str, ignore_names)
+        key = hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+        rep = first.setdefault(key, fn)
+
+        if rep is fn:
+            unique.append(fn)
+        else:
+            duplicates.setdefault(rep, []).append(fn)
+
+    return unique
+
+
+def _outcome_deltas(outcome: _Outcome) -> dict:
+    """Progress counter changes for a request which finished with `outcome`."""
+    if isinstance(outcome, Exception):
+        return {"in_flight": -1, "failed": 1}
+
+    return {"in_flight": -1, "done": 1}
@@ -0,0 +1,200 @@
+"""Routing of completion requests across several replicas of an llm server.
+
+Each endpoint keeps its own client, and so its own pool of keep-alive http
+connections. Requests go to the healthy endpoint with the fewest requests in
+flight, and endpoints which fail repeatedly are ejected for a while, so that
+requests retried by the `RequestScheduler` land on a working replica.
+"""
+
+import bisect
+import logging
+import threading
+import time
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional
+
+import openai
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class Endpoint:
+    """A single replica of the llm server, and statistics about its requests."""
+
+    url: Optional[str]
+    """Base url of the replica, or None for the openai default."""
+
+    client: openai.OpenAI
+    """Client sending requests to this replica, with its own connection pool."""
+
+    in_flight: int = 0
+    """Number of requests currently awaiting a response."""
+
+    requests: int = 0
+    """Number of finished requests, successful or not."""
+
+    failures: int = 0
+    """Number of requests which failed because of the replica."""
+
+    consecutive_failures: int = 0
+    """Number of requests which failed since the last successful one."""
+
+    ejections: int = 0
+    """Number of times the replica was ejected from the pool."""
+
+    ejected_until: float = 0.0
+    """Clock time until which no requests are routed to the replica."""
+
+    completion_tokens: int = 0
+    """Total number of tokens completed by successful requests."""
+
+    latencies: List[float] = field(default_factory=list)
+    """Sorted latencies in seconds of every successful request."""
+
+    first_request: Optional[float] = None
+    """Clock time the first request was sent."""
+
+    last_response: Optional[float] = None
+    """Clock time the last request finished."""
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Rate of completed tokens, from the first request to the last response."""
+        if self.first_request is None or self.last_response is None:
+            return 0.0
+
+        elapsed = self.last_response - self.first_request
+        return self.completion_tokens / elapsed if elapsed > 0 else 0.0
+
+    def is_ejected(self, now: float) -> bool:
+        return now < self.ejected_until
+
+
+class EndpointPool:
+    """Routes requests to the healthy endpoint with the fewest in flight.
+
+    After `eject_after` consecutive failures an endpoint is ejected for
+    `eject_seconds`, and a failure right after it is readmitted ejects it again.
+    If every endpoint is ejected, requests go to the one readmitted soonest rather
+    than failing outright.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        eject_after: int = 3,
+        eject_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.endpoints = endpoints
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_urls(
+        cls, urls: List[Optional[str]], api_key: str, **kwargs
+    ) -> "EndpointPool":
+        """Create a pool with an endpoint for each of `urls`."""
+        return cls(
+            [
+                Endpoint(
+                    url, openai.OpenAI(base_url=url, api_key=api_key, max_retries=0)
+                )
+                for url in urls
+            ],
+            **kwargs,
+        )
+
+    @contextmanager
+    def endpoint(self) -> Iterator[Endpoint]:
+        """Pick an endpoint for a request sent within the block.
+
+        The outcome of the block is recorded against the endpoint, and errors which
+        indicate an unhealthy replica count towards ejecting it. Record the tokens
+        completed by the request with `add_tokens`.
+        """
+        endpoint = self._acquire()
+        start = self._clock()
+
+        try:
+            yield endpoint
+        except Exception as e:
+            self._release(endpoint, self._clock() - start, e)
+            raise
+        else:
+            self._release(endpoint, self._clock() - start)
+
+    def add_tokens(self, endpoint: Endpoint, tokens: int):
+        """Count `tokens` completion tokens towards the throughput of `endpoint`."""
+        with self._lock:
+            endpoint.completion_tokens += tokens
+
+    def is_ejected(self, endpoint: Endpoint) -> bool:
+        """Whether or not `endpoint` is currently not receiving requests."""
+        return endpoint.is_ejected(self._clock())
+
+    def _acquire(self) -> Endpoint:
+        with self._lock:
+            now = self._clock()
+            healthy = [e for e in self.endpoints if not e.is_ejected(now)]
+
+            if healthy:
+                endpoint = min(healthy, key=lambda e: (e.in_flight, e.requests))
+            else:
+                endpoint = min(self.endpoints, key=lambda e: e.ejected_until)
+
+            endpoint.in_flight += 1
+
+            if endpoint.first_request is None:
+                endpoint.first_request = now
+
+            return endpoint
+
+    def _release(
+        self, endpoint: Endpoint, latency: float, error: Optional[Exception] = None
+    ):
+        with self._lock:
+            now = self._clock()
+
+            endpoint.in_flight -= 1
+            endpoint.requests += 1
+            endpoint.last_response = now
+
+            if error is None:
+                endpoint.consecutive_failures = 0
+                bisect.insort(endpoint.latencies, latency)
+                return
+
+            if not is_endpoint_failure(error):
+                return
+
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+
+            if endpoint.consecutive_failures >= self.eject_after:
+                endpoint.ejections += 1
+                endpoint.ejected_until = now + self.eject_seconds
+
+                # NOTE: Readmitted endpoints are ejected again by a single failure.
+                endpoint.consecutive_failures = self.eject_after - 1
+
+                _LOGGER.warning(
+                    f"Ejected llm endpoint {endpoint.url} for {self.eject_seconds}s "
+                    f"after repeated failures: {error}"
+                )
+
+
+def is_endpoint_failure(e: Exception) -> bool:
+    """Whether or not `e` indicates that the replica which raised it is unhealthy,
+    rather than the request being invalid or rate limited."""
+    if isinstance(e, openai.APIConnectionError):
+        return True
+
+    status = getattr(e, "status_code", None)
+    return status is not None and status >= 500
@@ -3,45 +3,87 @@
 
 import ast
 import logging
-
+import os
+import queue
+import re
+import shutil
+import tempfile
+import threading
+
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from itertools import chain
 from pathlib import Path
-from typing import List, Union
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 from textwrap import indent
 
-from pydantic import BaseModel
-
+from . import profiling
 from .config import PyGenDocsConfiguration
 
 _LOGGER = logging.getLogger(__name__)
 
+_PARSE_CHUNKSIZE = 16
+"""Number of files handed to a parsing worker process at a time."""
 
-class ResolvedFunction(BaseModel):
+
+@dataclass(frozen=True, slots=True)
+class ResolvedFunction:
     """`ResolvedFunction` dataclass contains meta information about a funcion
-    that has been extracted from a source file for the purposes of modification."""
+    that has been extracted from a source file for the purposes of modification.
+
+    Only the location of the function is stored, rather than its ast or source
+    text, so that large numbers of these records stay cheap to hold and to pickle.
+    """
 
     name: str
     """The function name,"""
 
+    qualified_name: str
+    """Dotted name of this function within its module, such as `Class.method`."""
+
     source_file: str
     """Source file this function originates from."""
 
-    source_str: str
-    """Actual string data of this function."""
+    lineno: int
+    """Line number of the function definition."""
+
+    end_lineno: int
+    """Line number of the last line of the function body."""
+
+    col_offset: int
+    """Column offset of the function definition."""
+
+    docstring_lineno: int
+    """Line number at which a docstring should be inserted. See `docstring_lineno`."""
 
     has_docstring: bool
     """Whether or not this function has a docstring."""
 
-    ast_object: ast.FunctionDef
-    """Reference to the `ast.FunctionDef` object describing this function."""
+    @property
+    def source_str(self) -> str:
+        """Actual string data of this function, read from `source_file` on demand."""
+        lines = _read_source_lines(
+            self.source_file, os.stat(self.source_file).st_mtime_ns
+        )
+        lines = list(lines[self.lineno - 1 : self.end_lineno])
+
+        # NOTE: ast column offsets are in utf-8 bytes.
+        lines[0] = lines[0].encode()[self.col_offset :].decode()
+
+        return "".join(lines).rstrip("\r\n")
 
-    class Config:
-        arbitrary_types_allowed = True
 
-    def __hash__(self):
-        return hash(f"{self.source_file}:{self.name}")
+@lru_cache(maxsize=16)
+def _read_source_lines(file: str, mtime_ns: int) -> Tuple[str, ...]:
+    """Reads the lines of `file`. Cached by modification time, so that reading the
+    source of many functions from the same file only reads it once."""
+    with open(file, "r") as f:
+        return tuple(f.readlines())
 
 
-def docstring_lineno(fn: ast.FunctionDef) -> int:
+def docstring_lineno(fn: ast.FunctionDef | ast.AsyncFunctionDef) -> int:
     """Determines the appropriate line number a function docstring should be
     inserted at. If a docstring already exists, the line number of the docstring is returned.
     """
@@ -58,9 +100,110 @@ def docstring_lineno(fn: ast.FunctionDef) -> int:
         return fn.body[0].lineno - 1
 
 
-def get_functions_from_file(file: str | Path) -> List[ResolvedFunction]:
-    """Extract all function definitions from the given `file` as encoded by
-    their `ast.FunctionDef` representations.
+_INTERNAL_NAME = re.compile("^_[^_]+")
+"""Internal functions have one leading underscore."""
+
+_PRIVATE_NAME = re.compile("^__[^_]+")
+"""Private functions have two leading underscores."""
+
+
+@dataclass(frozen=True)
+class FunctionFilter:
+    """Predicate deciding which functions are collected from source files, by name.
+
+    This is a small, picklable subset of `PyGenDocsConfiguration`, so that it can
+    be sent to parsing worker processes.
+    """
+
+    ignore_constructors: bool = False
+    ignore_internal: bool = False
+    ignore_private: bool = False
+
+    @classmethod
+    def from_config(cls, cfg: PyGenDocsConfiguration) -> "FunctionFilter":
+        return cls(
+            ignore_constructors=cfg.ignore_constructors,
+            ignore_internal=cfg.ignore_internal,
+            ignore_private=cfg.ignore_private,
+        )
+
+    def __call__(self, name: str) -> bool:
+        """Returns whether or not a function called `name` should be collected."""
+        if self.ignore_constructors and name == "__init__":
+            return False
+
+        if self.ignore_internal and _INTERNAL_NAME.match(name):
+            return False
+
+        if self.ignore_private and _PRIVATE_NAME.match(name):
+            return False
+
+        return True
+
+
+_STATEMENT_CONTAINERS = (ast.stmt, ast.excepthandler, ast.match_case)
+"""Node types which are, or which may contain, statements."""
+
+
+class _FunctionCollector(ast.NodeVisitor):
+    """Collects a `ResolvedFunction` for each sync and async function definition in
+    a module, in a single pass over its statements.
+
+    Functions rejected by `function_filter` are skipped, but functions nested
+    within them are still visited.
+    """
+
+    def __init__(self, file: str, function_filter: Optional[FunctionFilter]):
+        self.file = file
+        self.function_filter = function_filter
+        self.functions: List[ResolvedFunction] = []
+        self._prefix = ""
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self._visit_scope(node, f"{self._prefix}{node.name}.")
+
+    def visit_FunctionDef(self, node: ast.FunctionDef | ast.AsyncFunctionDef):
+        qualified_name = self._prefix + node.name
+
+        if self.function_filter is None or self.function_filter(node.name):
+            self.functions.append(
+                ResolvedFunction(
+                    name=node.name,
+                    qualified_name=qualified_name,
+                    source_file=self.file,
+                    lineno=node.lineno,
+                    end_lineno=node.end_lineno,
+                    col_offset=node.col_offset,
+                    docstring_lineno=docstring_lineno(node),
+                    has_docstring=ast.get_docstring(node) is not None,
+                )
+            )
+
+        self._visit_scope(node, f"{qualified_name}.<locals>.")
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def generic_visit(self, node: ast.AST):
+        # NOTE: Function definitions are statements, so they can only appear in
+        #       statement lists. Expressions are never descended into.
+        for _, value in ast.iter_fields(node):
+            if isinstance(value, list):
+                for item in value:
+                    if isinstance(item, _STATEMENT_CONTAINERS):
+                        self.visit(item)
+
+    def _visit_scope(self, node: ast.AST, prefix: str):
+        outer, self._prefix = self._prefix, prefix
+        self.generic_visit(node)
+        self._prefix = outer
+
+
+def get_functions_from_file(
+    file: str | Path, function_filter: Optional[FunctionFilter] = None
+) -> List[ResolvedFunction]:
+    """Extract all sync and async function definitions from the given `file`.
+
+    If a `function_filter` is given, only functions it accepts are returned.
 
     Function structs are sorted by function name.
     """
@@ -69,29 +212,79 @@ def get_functions_from_file(file: str | Path) -> List[ResolvedFunction]:
     with open(file, "r") as f:
         src = f.read()
 
-    nodes = ast.parse(src, filename=file).body
+    collector = _FunctionCollector(file, function_filter)
+    collector.visit(ast.parse(src, filename=file))
 
-    ### Recursively collect all function definitions from the file
-    all_nodes = []
+    return sorted(collector.functions, key=lambda fn: fn.name)
 
-    for n in nodes:
-        all_nodes.extend(ast.walk(n))
 
-    ### Create a `ResolvedFunction` object for each function
-    function_structs = []
+def normalize_function_source(source: str, ignore_name: bool = False) -> str:
+    """Returns a normalized representation of the function `source`, which is
+    unaffected by formatting and comments, and by the name of the function if
+    `ignore_name` is set.
 
-    for fn in (n for n in all_nodes if isinstance(n, ast.FunctionDef)):
-        function_structs.append(
-            ResolvedFunction(
-                name=fn.name,
-                source_file=file,
-                source_str=ast.get_source_segment(src, fn),
-                ast_object=fn,
-                has_docstring=ast.get_docstring(fn) is not None,
-            )
-        )
+    Source which cannot be parsed is normalized by collapsing its whitespace.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return " ".join(source.split())
 
-    return sorted(function_structs, key=lambda fn: fn.name)
+    if ignore_name:
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                node.name = ""
+
+    return ast.dump(tree)
+
+
+def parse_files(
+    files: Iterable[str | Path],
+    jobs: int = 1,
+    function_filter: Optional[FunctionFilter] = None,
+) -> List[List[ResolvedFunction]]:
+    """Extract all function definitions accepted by `function_filter` from each of
+    the given `files`.
+
+    If `jobs` is greater than one, files are parsed across a pool of `jobs` worker
+    processes. A `jobs` value less than one uses one worker per available cpu.
+
+    Returns one list of functions per file, in the same order as `files`
+    regardless of the number of jobs used.
+    """
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+
+    parse = partial(get_functions_from_file, function_filter=function_filter)
+
+    with profiling.span("scan.parse") as s:
+        if jobs <= 1:
+            results = [parse(f) for f in files]
+
+        else:
+            # NOTE: `files` may be a lazy iterator, so its length can't be used to
+            #       size chunks. Chunks of several files amortize the cost of
+            #       pickling results back to the parent process, while still
+            #       letting workers start parsing before all files have been found.
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = list(executor.map(parse, files, chunksize=_PARSE_CHUNKSIZE))
+
+        s.add(files=len(results), functions=sum(len(r) for r in results))
+
+    return results
+
+
+def get_functions_from_files(
+    files: Iterable[str | Path],
+    jobs: int = 1,
+    function_filter: Optional[FunctionFilter] = None,
+) -> List[ResolvedFunction]:
+    """Extract all function definitions from each of the given `files`.
+
+    See `parse_files` for the meaning of the arguments. Functions are returned
+    grouped in the same order as `files`.
+    """
+    return list(chain.from_iterable(parse_files(files, jobs, function_filter)))
 
 
 def sanitize_docstring(fn: ResolvedFunction, docstring: str):
@@ -100,21 +293,158 @@ def sanitize_docstring(fn: ResolvedFunction, docstring: str):
         docstring = docstring + "\n"
 
     ### Indent docstring body
-    docstring = indent(docstring, " " * (4 + fn.ast_object.col_offset))
+    docstring = indent(docstring, " " * (4 + fn.col_offset))
 
     return docstring
 
 
 def write_new_docstring(fn: ResolvedFunction, docstring: str):
     """Write the new `docstring` for the given function `fn`."""
+    write_docstrings_to_file(fn.source_file, {fn: docstring})
+
+
+def write_new_docstrings(docstrings: Dict[ResolvedFunction, str], jobs: int = 1):
+    """Write each of the new `docstrings` into the file its function originates from.
+
+    Each file is read and replaced once, regardless of how many of its functions
+    are given. If `jobs` is greater than one, up to `jobs` files are written in
+    parallel. A `jobs` value less than one uses one thread per available cpu.
+    """
+    by_file: Dict[str, Dict[ResolvedFunction, str]] = defaultdict(dict)
+
+    for fn, docstring in docstrings.items():
+        by_file[fn.source_file][fn] = docstring
+
+    if jobs < 1:
+        jobs = os.cpu_count() or 1
+
+    if jobs <= 1 or len(by_file) <= 1:
+        for file, file_docstrings in by_file.items():
+            write_docstrings_to_file(file, file_docstrings)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(jobs, len(by_file))) as executor:
+        # NOTE: Consume the results so that errors raised in workers propagate.
+        list(executor.map(write_docstrings_to_file, by_file, by_file.values()))
+
+
+def write_docstrings_to_file(file: str, docstrings: Dict[ResolvedFunction, str]):
+    """Insert the new `docstrings` for functions originating from `file`.
+
+    All insertions are applied to a single read of the file, which is then
+    atomically replaced, so an interrupted write never leaves a partial file.
+    """
+    with profiling.span("write.file", docstrings=len(docstrings)) as s:
+        with open(file, "r", newline="") as f:
+            lines = f.readlines()
+
+        # NOTE: Insert upwards from the bottom of the file so that earlier
+        #       insertions don't shift the line numbers of functions yet to be
+        #       written.
+        for fn in sorted(docstrings, key=lambda fn: fn.docstring_lineno, reverse=True):
+            lines.insert(fn.docstring_lineno, sanitize_docstring(fn, docstrings[fn]))
+
+        data = "".join(lines)
+        _atomic_write(file, data)
+
+        s.add(bytes=len(data.encode()) if profiling.is_enabled() else 0)
+
+
+class IncrementalWriter:
+    """Writes docstrings into their files on a background thread, each file as soon
+    as the docstrings of all of its expected functions have arrived.
+
+    Docstrings are handed over with `put` as they are generated, from any thread.
+    Files for which some docstrings never arrive, such as when their generation
+    failed, are written with the docstrings they did receive on `close`.
+    """
+
+    def __init__(
+        self,
+        functions: List[ResolvedFunction],
+        on_write: Optional[Callable[[str, Dict[ResolvedFunction, str]], None]] = None,
+    ):
+        self.written: Dict[ResolvedFunction, str] = {}
+        """Docstrings which have been written to disk."""
+
+        self.errors: Dict[str, Exception] = {}
+        """Mapping from files to the error raised while writing them."""
+
+        self.on_write = on_write
+        """Optional callback receiving each file and the docstrings written into it.
+        Called from the writer thread."""
+
+        # NOTE: Number of docstrings each file waits for, out of every function a
+        #       docstring may be put for.
+        self._expected = Counter(fn.source_file for fn in functions)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="docstring-writer")
+
+    def __enter__(self) -> "IncrementalWriter":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def put(self, fn: ResolvedFunction, docstring: str):
+        """Queue `docstring` to be written to `fn`."""
+        self._queue.put((fn, docstring))
+
+    def close(self):
+        """Write any partially complete files, and wait for all writes to finish."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        ready: Dict[str, Dict[ResolvedFunction, str]] = defaultdict(dict)
+
+        while (item := self._queue.get()) is not None:
+            fn, docstring = item
+            ready[fn.source_file][fn] = docstring
+
+            if len(ready[fn.source_file]) == self._expected[fn.source_file]:
+                self._write(fn.source_file, ready.pop(fn.source_file))
+
+        for file, docstrings in ready.items():
+            self._write(file, docstrings)
+
+    def _write(self, file: str, docstrings: Dict[ResolvedFunction, str]):
+        try:
+            write_docstrings_to_file(file, docstrings)
+        except Exception as e:
+            _LOGGER.debug(f"Failed to write docstrings to {file}: {e}")
+            self.errors[file] = e
+            return
+
+        self.written.update(docstrings)
+
+        if self.on_write is not None:
+            self.on_write(file, docstrings)
+
+
+def _atomic_write(file: str, data: str):
+    """Replace the contents of `file` with `data`, preserving its permissions.
+
+    Data is written to a temporary file in the same directory which is then
+    renamed over `file`, so readers only ever observe the old or new contents. If
+    `file` is a symlink, the file it points to is replaced, and the link is kept.
+    """
+    file = os.path.realpath(file)
+    directory, name = os.path.split(file)
+
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
 
-    with open(fn.source_file, "r") as f:
-        file = f.readlines()
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            f.write(data)
 
-    file.insert(docstring_lineno(fn.ast_object), sanitize_docstring(fn, docstring))
+        shutil.copymode(file, tmp)
+        os.replace(tmp, file)
 
-    with open(fn.source_file, "w") as f:
-        f.writelines(file)
+    except BaseException:
+        os.unlink(tmp)
+        raise
 
 
 def _dump_function_information(fn: ast.FunctionDef) -> str:
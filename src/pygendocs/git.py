@@ -11,19 +11,179 @@ NOTE: This uses the PyGit library which imports as 'git'. Be sure to import this
 function as .git or with a full import path to avoid a collision.
 """
 
+import os
+import re
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
 from git import Repo
-from git.exc import InvalidGitRepositoryError
+from git.exc import InvalidGitRepositoryError, NoSuchPathError
 
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+"""Matches a unified diff hunk header, capturing the start and length of the
+hunk in the new version of the file."""
 
-def is_git_repo() -> bool:
+
+def get_repo(path: str | Path = ".") -> Optional[Repo]:
+    """Get the git repository containing `path`, or None if it is not inside one.
+
+    Repositories are opened once and shared between calls.
+    """
+    return _open_repo(os.path.abspath(path))
+
+
+@lru_cache
+def _open_repo(path: str) -> Optional[Repo]:
     try:
-        Repo(".")
-        return True
-    except InvalidGitRepositoryError:
+        return Repo(path, search_parent_directories=True)
+    except (InvalidGitRepositoryError, NoSuchPathError):
+        return None
+
+
+def is_git_repo() -> bool:
+    return get_repo() is not None
+
+
+def repo_has_changes(
+    paths: Iterable[str | Path] = (), exclude: Iterable[str | Path] = ()
+) -> bool:
+    """Whether the repository in the current directory has staged, unstaged, or
+    untracked changes to any of the given `paths`, or anywhere if no `paths` are
+    given. Changes beneath the `exclude` paths, such as pygendocs' own cache, and
+    paths outside of the repository are ignored.
+
+    Untracked files are found without descending into ignored directories, or
+    listing the contents of untracked ones.
+    """
+    repo = get_repo()
+    root = repo.working_tree_dir
+
+    def _inside(p: str) -> bool:
+        return p == root or p.startswith(root + os.sep)
+
+    paths = [os.path.abspath(p) for p in paths]
+    pathspec = [p for p in paths if _inside(p)]
+
+    if paths and not pathspec:
         return False
 
+    pathspec += [
+        f":(exclude,top){os.path.relpath(p, root)}"
+        for p in (os.path.abspath(p) for p in exclude)
+        if _inside(p) and p != root
+    ]
+
+    # NOTE: A single porcelain status replaces `Repo.is_dirty` and
+    #       `Repo.untracked_files`, which diff the index and working tree
+    #       separately and list every untracked file in the repository.
+    status = repo.git.status(
+        "--porcelain", "-z", "--untracked-files=normal", "--", *pathspec
+    )
+
+    return bool(status)
+
+
+def changed_line_ranges(
+    since: Optional[str] = None,
+    staged: bool = False,
+    paths: Iterable[str | Path] = (),
+) -> Dict[str, List[Tuple[int, int]]]:
+    """Find the files added or modified either since the commit `since`, or in the
+    index if `staged` is set, along with the line ranges which changed in them.
+
+    Changes since a commit include uncommitted changes in the working tree, and
+    untracked files which are not ignored, the whole of which count as changed.
+
+    Args:
+        since: Commit, branch, or other ref to compare the working tree against.
+        staged: Whether to compare the index against HEAD instead.
+        paths: Optional paths to limit the comparison to.
+
+    Returns:
+        A mapping from the absolute path of each changed file to the inclusive,
+        1-based ranges of lines which were added or modified in it. Lines which
+        were only deleted are represented by the line preceding the deletion.
+
+    Raises:
+        `git.exc.GitCommandError` if `since` is not a valid ref.
+    """
+    repo = get_repo()
+
+    if repo is None:
+        raise InvalidGitRepositoryError(os.getcwd())
+
+    args = ["--cached"] if staged else []
+
+    if since is not None:
+        args.append(since)
+
+    diff = repo.git.diff(
+        *args,
+        "--unified=0",
+        "--no-color",
+        "--no-ext-diff",
+        "--diff-filter=ACMR",
+        "--src-prefix=a/",
+        "--dst-prefix=b/",
+        "--",
+        *(os.path.abspath(p) for p in paths),
+    )
+
+    changes: Dict[str, List[Tuple[int, int]]] = {}
+    ranges = None
+
+    for line in diff.splitlines():
+        if line.startswith(("+++ b/", '+++ "b/')):
+            file = os.path.join(repo.working_tree_dir, _unquote(line[4:])[2:])
+            ranges = changes.setdefault(os.path.abspath(file), [])
+            continue
+
+        match = _HUNK_HEADER.match(line)
+
+        if match is None or ranges is None:
+            continue
+
+        start = int(match.group(1))
+        count = int(match.group(2) or 1)
+
+        ranges.append((start, start + count - 1) if count else (start, start))
+
+    if not staged:
+        # NOTE: New files which were never added don't appear in the diff at all.
+        untracked = repo.git.ls_files(
+            "--others",
+            "--exclude-standard",
+            "-z",
+            "--",
+            *(os.path.abspath(p) for p in paths),
+        )
+
+        for name in filter(None, untracked.split("\0")):
+            file = os.path.abspath(os.path.join(repo.working_tree_dir, name))
+            changes[file] = [(1, max(1, _count_lines(file)))]
+
+    return changes
+
+
+def _count_lines(file: str) -> int:
+    try:
+        with open(file, "rb") as f:
+            return sum(1 for _ in f)
+    except OSError:
+        return 0
+
 
-def repo_has_changes() -> bool:
-    repo = Repo(".")
+def _unquote(path: str) -> str:
+    """Undo the C-style quoting git applies to paths with unusual characters."""
+    if not path.startswith('"'):
+        return path
 
-    return bool(repo.is_dirty() or repo.untracked_files)
+    return (
+        path[1:-1]
+        .encode("latin-1", "backslashreplace")
+        .decode("unicode_escape")
+        .encode("latin-1")
+        .decode("utf-8", "replace")
+    )
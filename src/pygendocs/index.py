@@ -0,0 +1,238 @@
+"""Persistent on-disk index of the functions extracted from source files.
+
+Files whose size, modification time, or content are unchanged since the last
+scan are served from the index instead of being read and parsed again.
+
+The index is stored as JSON rather than pickled, as it lives in the working tree
+and may come from an untrusted checkout, and loading a pickle can run arbitrary
+code.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from . import profiling
+from .config import make_cache_dir
+from .functions import FunctionFilter, ResolvedFunction, parse_files
+
+_LOGGER = logging.getLogger(__name__)
+
+_INDEX_VERSION = 4
+"""Bumped whenever the layout of stored entries changes, invalidating old indexes."""
+
+_INDEX_FILE_NAME = "scan_index.json"
+
+_STORED_FUNCTION_FIELDS = (
+    "name",
+    "qualified_name",
+    "lineno",
+    "end_lineno",
+    "col_offset",
+    "docstring_lineno",
+    "has_docstring",
+)
+"""Fields of `ResolvedFunction` stored for each function, in order. The source file
+is the key of the entry the function is stored under."""
+
+
+@dataclass
+class IndexEntry:
+    """Stored scan results for a single source file."""
+
+    size: int
+    """Size of the file in bytes when it was last parsed."""
+
+    mtime_ns: int
+    """Modification time of the file when it was last parsed."""
+
+    content_hash: str
+    """Hash of the file contents when it was last parsed."""
+
+    functions: List[ResolvedFunction]
+    """Every function extracted from the file, before any `FunctionFilter`."""
+
+    def to_json(self) -> dict:
+        return {
+            "size": self.size,
+            "mtime_ns": self.mtime_ns,
+            "content_hash": self.content_hash,
+            "functions": [
+                [getattr(fn, k) for k in _STORED_FUNCTION_FIELDS]
+                for fn in self.functions
+            ],
+        }
+
+    @classmethod
+    def from_json(cls, file: str, data: dict) -> "IndexEntry":
+        return cls(
+            size=int(data["size"]),
+            mtime_ns=int(data["mtime_ns"]),
+            content_hash=str(data["content_hash"]),
+            functions=[
+                ResolvedFunction(
+                    source_file=file, **dict(zip(_STORED_FUNCTION_FIELDS, row))
+                )
+                for row in data["functions"]
+            ],
+        )
+
+
+class ScanIndex:
+    """Mapping of source file paths to their previously extracted functions.
+
+    Functions are stored unfiltered, so that the same index serves scans with any
+    `FunctionFilter`.
+    """
+
+    def __init__(self, path: str | Path, entries: Dict[str, IndexEntry] = None):
+        self.path = Path(path)
+        """Location of the index file on disk."""
+
+        self.entries: Dict[str, IndexEntry] = entries or {}
+        """Mapping from source file path to its stored scan results."""
+
+    @classmethod
+    def load(cls, cache_dir: str | Path, rebuild: bool = False) -> "ScanIndex":
+        """Load the index stored in `cache_dir`.
+
+        A missing, unreadable, or outdated index results in an empty index, as does
+        passing `rebuild`.
+        """
+        path = Path(cache_dir) / _INDEX_FILE_NAME
+        empty = cls(path)
+
+        if rebuild:
+            return empty
+
+        try:
+            with open(path, "r") as f:
+                stored = json.load(f)
+
+            if stored.get("version") != _INDEX_VERSION:
+                return empty
+
+            entries = {
+                file: IndexEntry.from_json(file, data)
+                for file, data in stored["entries"].items()
+            }
+        except FileNotFoundError:
+            return empty
+        except Exception as e:
+            _LOGGER.warning(f"Discarding unreadable scan index {path}: {e}")
+            return empty
+
+        return cls(path, entries)
+
+    def save(self):
+        """Atomically write the index to disk, dropping entries for deleted files."""
+        self.entries = {p: e for p, e in self.entries.items() if os.path.exists(p)}
+
+        make_cache_dir(self.path.parent)
+
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(
+                    {
+                        "version": _INDEX_VERSION,
+                        "entries": {p: e.to_json() for p, e in self.entries.items()},
+                    },
+                    f,
+                    separators=(",", ":"),
+                )
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def lookup(self, file: str, stat: os.stat_result) -> Optional[IndexEntry]:
+        """Return the stored entry for `file` if it is still valid for the file
+        described by `stat`, otherwise None.
+
+        Size and modification time are checked first, and the file contents are
+        only hashed if those differ from the stored values.
+        """
+        entry = self.entries.get(file)
+
+        if entry is None or entry.size != stat.st_size:
+            return None
+
+        if entry.mtime_ns == stat.st_mtime_ns:
+            return entry
+
+        if entry.content_hash == hash_file(file):
+            # NOTE: File was touched but not modified. Refresh the mtime so the
+            #       next lookup can skip hashing.
+            entry.mtime_ns = stat.st_mtime_ns
+            return entry
+
+        return None
+
+
+def hash_file(file: str | Path) -> str:
+    """Returns a hex digest of the contents of `file`."""
+    with open(file, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def get_functions_with_index(
+    files: List[str | Path],
+    index: ScanIndex,
+    jobs: int = 1,
+    function_filter: Optional[FunctionFilter] = None,
+) -> List[ResolvedFunction]:
+    """Extract all function definitions accepted by `function_filter` from the
+    given `files`, only parsing those which have changed since they were last
+    stored in `index`.
+
+    `index` is updated in place with the newly parsed files, but is not saved.
+
+    Functions are returned grouped in the same order as `files`.
+    """
+    files = [str(f) for f in files]
+
+    results: Dict[str, List[ResolvedFunction]] = {}
+    stale: Dict[str, IndexEntry] = {}
+
+    with profiling.span("scan.index_lookup") as s:
+        for f in files:
+            stat = os.stat(f)
+            entry = index.lookup(f, stat)
+
+            if entry is not None:
+                results[f] = entry.functions
+            else:
+                # NOTE: Record the file's state before it is parsed, so that a
+                #       file modified mid-scan is picked up again on the next scan.
+                stale[f] = IndexEntry(
+                    size=stat.st_size,
+                    mtime_ns=stat.st_mtime_ns,
+                    content_hash=hash_file(f),
+                    functions=[],
+                )
+
+        s.add(hits=len(results), misses=len(stale))
+
+    _LOGGER.debug(f"Scan index: {len(files) - len(stale)} hits, {len(stale)} misses")
+
+    parsed = parse_files(list(stale), jobs)
+
+    for (f, entry), functions in zip(stale.items(), parsed):
+        entry.functions = functions
+        index.entries[f] = entry
+        results[f] = functions
+
+    return [
+        fn
+        for f in files
+        for fn in results[f]
+        if function_filter is None or function_filter(fn.name)
+    ]
@@ -0,0 +1,111 @@
+"""On-disk journal of the docstrings generated during a `pygendocs run`, so that an
+interrupted run can be resumed without paying for its docstrings again.
+
+The journal is a JSON lines file, with one record appended per docstring as soon
+as it is generated. Records are matched to functions on resume by file, qualified
+name, and a hash of the function source, so functions which changed since are
+generated again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from pathlib import Path
+from typing import Dict, List
+
+from .config import make_cache_dir
+from .functions import ResolvedFunction
+
+_LOGGER = logging.getLogger(__name__)
+
+_JOURNAL_FILE_NAME = "run_journal.jsonl"
+
+
+def source_hash(fn: ResolvedFunction) -> str:
+    """Digest of the current source text of `fn`."""
+    return hashlib.blake2b(fn.source_str.encode(), digest_size=16).hexdigest()
+
+
+class RunJournal:
+    """Append-only record of generated docstrings.
+
+    `append` is thread safe, and flushes each record to disk before returning.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        """Location of the journal on disk."""
+
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, cache_dir: str | Path) -> "RunJournal":
+        """Journal of the run of the project whose cache is in `cache_dir`."""
+        return cls(Path(cache_dir) / _JOURNAL_FILE_NAME)
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def reset(self):
+        """Discard every record, starting an empty journal."""
+        make_cache_dir(self.path.parent)
+        self.path.write_text("")
+
+    def remove(self):
+        """Delete the journal, once its docstrings have been written."""
+        self.path.unlink(missing_ok=True)
+
+    def append(self, fn: ResolvedFunction, docstring: str):
+        """Record that `docstring` was generated for `fn`."""
+        record = json.dumps(
+            {
+                "file": os.path.abspath(fn.source_file),
+                "qualified_name": fn.qualified_name,
+                "source_hash": source_hash(fn),
+                "docstring": docstring,
+            }
+        )
+
+        with self._lock, open(self.path, "a") as f:
+            f.write(record + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def resume(self, functions: List[ResolvedFunction]) -> Dict[ResolvedFunction, str]:
+        """Find the journaled docstrings of `functions` whose source is unchanged
+        since they were recorded.
+
+        Returns a mapping from functions to their journaled docstrings, ordered the
+        same as `functions`.
+        """
+        records = {}
+
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        r = json.loads(line)
+                    except ValueError:
+                        # NOTE: The last record is cut short if the run was killed
+                        #       while writing it.
+                        _LOGGER.debug(f"Skipping malformed journal record: {line!r}")
+                        continue
+
+                    key = (r["file"], r["qualified_name"], r["source_hash"])
+                    records[key] = r["docstring"]
+
+        except FileNotFoundError:
+            return {}
+
+        resumed = {}
+
+        for fn in functions:
+            key = (os.path.abspath(fn.source_file), fn.qualified_name, source_hash(fn))
+
+            if records.get(key):
+                resumed[fn] = records[key]
+
+        return resumed
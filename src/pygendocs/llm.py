@@ -1,32 +1,77 @@
 """Functions for interacting with an LLM for code and comment generation.
 """
 import ast
+import hashlib
+import json
 import os
 import logging
+import threading
+import time
 
+from dataclasses import dataclass
 from functools import lru_cache
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 
 import openai
 import tiktoken
 
 from rich import print
 
-from cachier import cachier
-
+from . import profiling
 from .config import LLMConfiguration
+from .endpoints import Endpoint, EndpointPool
 from .exceptions import APIKeyNotFoundError
-from .functions import ResolvedFunction
+from .functions import ResolvedFunction, normalize_function_source
 
 
 _LOGGER = logging.getLogger(__name__)
 
+_ENDPOINT_POOL_LOCK = threading.Lock()
+
+_ENCODING_LOCK = threading.Lock()
+
+_ENCODINGS: Dict[str, Optional[tiktoken.Encoding]] = {}
+"""Tokenizer loaded for each model, or None if none could be loaded."""
+
+_DOCSTRING_PROMPT_TEMPLATE = "Generate a python docstring in {style} style for the following function, only returning the docstring:\n\n{function_body}"
+
+_BATCH_PROMPT_TEMPLATE = """Generate a python docstring in {style} style for each of the following {count} functions.
+Respond with only a JSON object mapping each function's number to its docstring, such as {{"1": "...", "2": "..."}}.
+
+{functions}"""
+
+_BATCH_FUNCTION_TEMPLATE = "### Function {number}\n{function_body}\n\n"
+
+
+@dataclass
+class CompletionStats:
+    """Timing information about a single streamed completion request."""
+
+    time_to_first_token: Optional[float]
+    """Seconds from sending the request until the first content arrived, or None if
+    the completion was empty."""
+
+    duration: float
+    """Seconds from sending the request until the completion finished."""
+
+    completion_tokens: int
+    """Number of tokens in the completion, as reported by the server, or else the
+    number of chunks it arrived in."""
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Rate at which completion tokens arrived after the first one."""
+        generating = self.duration - (self.time_to_first_token or 0)
+        return self.completion_tokens / generating if generating > 0 else 0.0
+
 
-@lru_cache
 def get_llm_api_client(cfg: LLMConfiguration):
     """Generate an instance of an openai compatible client to communicate with the llm server.
 
-    This function will cache repeated calls with the same configuration.
+    This function will cache repeated calls with the same configuration. The client
+    does not retry failed requests itself, see `scheduler.RequestScheduler`. If
+    several endpoints are configured, the client of the first is returned.
 
     Args:
         cfg: The current LLMConfiguration struct.
@@ -34,7 +79,36 @@ def get_llm_api_client(cfg: LLMConfiguration):
     Returns:
         An `openai.OpenAI` client object.
     """
-    return openai.OpenAI(base_url=cfg.base_url, api_key=get_api_key(cfg))
+    return get_endpoint_pool(cfg).endpoints[0].client
+
+
+def get_endpoint_pool(cfg: LLMConfiguration) -> EndpointPool:
+    """Get the pool of clients for every endpoint configured in `cfg`, which
+    requests are routed through.
+
+    This function will cache repeated calls with the same configuration, so that
+    connections and endpoint health are shared by every request.
+
+    Args:
+        cfg: The current LLMConfiguration struct.
+
+    Returns:
+        An `EndpointPool` with an endpoint per configured url.
+    """
+    # NOTE: Requests start on several threads at once, which must all share the
+    #       first pool created rather than racing to create their own.
+    with _ENDPOINT_POOL_LOCK:
+        return _get_endpoint_pool(cfg)
+
+
+@lru_cache
+def _get_endpoint_pool(cfg: LLMConfiguration) -> EndpointPool:
+    return EndpointPool.from_urls(
+        cfg.base_urls,
+        get_api_key(cfg),
+        eject_after=cfg.endpoint_eject_after,
+        eject_seconds=cfg.endpoint_eject_seconds,
+    )
 
 
 def get_api_key(cfg: LLMConfiguration) -> str:
@@ -57,12 +131,11 @@ def get_api_key(cfg: LLMConfiguration) -> str:
         )
 
 
-@cachier()
 def generate_function_docstring(function_body: str, cfg: LLMConfiguration) -> str:
     """Generate a function docstring for the given `function_body` according to
     the parameters outlined in the llm configuration struct `cfg`.
 
-    Calls to this function are persistently cached with `cachier`.
+    Calls to this function are not cached. See `docstring_cache_key`.
 
     Args:
         function_body: The text data of a function to generate docstrings for.
@@ -72,12 +145,418 @@ def generate_function_docstring(function_body: str, cfg: LLMConfiguration) -> st
         A newly generated docstring for the given function.
     """
 
-    client = get_llm_api_client(cfg)
+    pool = get_endpoint_pool(cfg)
+
+    with pool.endpoint() as endpoint:
+        docstring, tokens = _create_completion(
+            endpoint.client,
+            cfg,
+            _format_docstring_request_prompt(function_body, cfg.docstring_style),
+        )
+        _record_tokens(pool, endpoint, tokens, docstring, cfg)
+
+    return docstring
+
+
+def generate_function_docstring_streamed(
+    function_body: str,
+    cfg: LLMConfiguration,
+    on_text: Optional[Callable[[str], None]] = None,
+) -> Tuple[str, CompletionStats]:
+    """Generate a function docstring for the given `function_body` like
+    `generate_function_docstring`, but stream the completion as it is generated.
+
+    Args:
+        function_body: The text data of a function to generate docstrings for.
+        cfg: The current LLMConfiguration object.
+        on_text: Optional callback receiving the partial docstring each time more
+            of it arrives.
+
+    Returns:
+        The newly generated docstring, and timing stats about its completion.
+    """
+    pool = get_endpoint_pool(cfg)
+
+    with pool.endpoint() as endpoint:
+        docstring, stats = stream_completion(
+            endpoint.client,
+            cfg,
+            _format_docstring_request_prompt(function_body, cfg.docstring_style),
+            on_text=on_text,
+        )
+        _record_tokens(pool, endpoint, stats.completion_tokens, docstring, cfg)
+
+    return docstring, stats
+
+
+def generate_function_docstrings_batched(
+    function_bodies: List[str], cfg: LLMConfiguration
+) -> List[Optional[str]]:
+    """Generate docstrings for each of the given `function_bodies` with a single
+    completion request, according to the parameters outlined in the llm
+    configuration struct `cfg`.
+
+    Args:
+        function_bodies: The text data of several functions to generate docstrings for.
+        cfg: The current LLMConfiguration object.
+
+    Returns:
+        A docstring for each function in `function_bodies`, or None for each
+        function whose docstring could not be parsed from the response.
+    """
+    pool = get_endpoint_pool(cfg)
+
+    functions = "".join(
+        _BATCH_FUNCTION_TEMPLATE.format(number=i, function_body=body)
+        for i, body in enumerate(function_bodies, 1)
+    )
+
+    with pool.endpoint() as endpoint:
+        reply, tokens = _create_completion(
+            endpoint.client,
+            cfg,
+            _BATCH_PROMPT_TEMPLATE.format(
+                style=cfg.docstring_style,
+                count=len(function_bodies),
+                functions=functions,
+            ),
+            max_tokens=batch_completion_max_tokens(len(function_bodies), cfg),
+        )
+        _record_tokens(pool, endpoint, tokens, reply, cfg)
+
+    return _parse_batched_reply(reply, len(function_bodies))
+
+
+def _record_tokens(
+    pool: EndpointPool,
+    endpoint: Endpoint,
+    tokens: Optional[int],
+    completion: Optional[str],
+    cfg: LLMConfiguration,
+):
+    """Count the tokens of `completion` towards the throughput of `endpoint`, using
+    the count reported by the server if there is one.
+
+    Throughput is only reported when requests are spread across several endpoints,
+    so nothing is counted otherwise.
+    """
+    if len(pool.endpoints) < 2:
+        return
+
+    if tokens is None:
+        tokens = count_tokens(completion, cfg.model) if completion else 0
+
+    pool.add_tokens(endpoint, tokens)
+
+
+def batch_completion_max_tokens(count: int, cfg: LLMConfiguration) -> int:
+    """Completion token limit of a batched request for `count` functions, which is
+    capped so that large batches are not rejected for exceeding the model limit."""
+    return min(cfg.max_tokens * count, cfg.batch_max_tokens)
+
+
+def pack_batches(
+    function_bodies: List[str], token_budget: int, model: str
+) -> List[List[int]]:
+    """Greedily group consecutive `function_bodies` into batches whose prompts,
+    including the batch prompt template, do not exceed `token_budget` tokens.
+
+    A function which exceeds the budget by itself is placed in its own batch.
+
+    Args:
+        function_bodies: The text data of the functions to group.
+        token_budget: Maximum number of prompt tokens per batch.
+        model: Name of the model, used to select a tokenizer.
+
+    Returns:
+        Lists of indices into `function_bodies`, one list per batch.
+    """
+    batches: List[List[int]] = []
+    batch_tokens = 0
+
+    # NOTE: The style and count are a word each, so placeholders are close enough.
+    template_tokens = count_tokens(
+        _BATCH_PROMPT_TEMPLATE.format(style="Google", count=0, functions=""), model
+    )
+
+    for i, body in enumerate(function_bodies):
+        tokens = count_tokens(
+            _BATCH_FUNCTION_TEMPLATE.format(number=i + 1, function_body=body), model
+        )
+
+        if not batches or batch_tokens + tokens > token_budget:
+            batches.append([])
+            batch_tokens = template_tokens
+
+        batches[-1].append(i)
+        batch_tokens += tokens
+
+    return batches
+
+
+def prepare_function_body(
+    function_body: str,
+    cfg: LLMConfiguration,
+    on_trim: Optional[Callable[[int], None]] = None,
+) -> str:
+    """Return the text of `function_body` to send in a prompt, trimmed to the prompt
+    token budget of `cfg` if it has one. See `trim_function_body`.
+
+    `on_trim` is called with the number of prompt tokens saved if the function is
+    trimmed."""
+    if cfg.prompt_token_budget <= 0:
+        return function_body
+
+    tokens = count_tokens(function_body, cfg.model)
 
-    return dispatch_completion(
-        client, cfg, _format_docstring_request_prompt(function_body)
+    if tokens <= cfg.prompt_token_budget:
+        return function_body
+
+    with profiling.span("llm.trim") as s:
+        trimmed = trim_function_body(function_body, cfg.prompt_token_budget, cfg.model)
+        saved = tokens - count_tokens(trimmed, cfg.model)
+
+        s.add(tokens_saved=saved)
+
+    _LOGGER.debug(
+        f"Trimmed a function from {tokens} to {tokens - saved} prompt tokens, "
+        f"saving {saved} tokens"
     )
 
+    if on_trim is not None:
+        on_trim(saved)
+
+    return trimmed
+
+
+def trim_function_body(function_body: str, token_budget: int, model: str) -> str:
+    """Shorten `function_body` to roughly `token_budget` tokens, keeping the parts
+    which matter most for documenting it.
+
+    The signature is always kept, followed by the return, raise, and yield
+    statements of the function itself, and then as many of its leading lines as
+    fit. Omitted runs of lines are replaced by a comment saying how many lines were
+    left out.
+
+    Source which can't be parsed keeps its leading lines only.
+
+    Args:
+        function_body: The text data of a single function.
+        token_budget: Number of tokens to trim the function to.
+        model: Name of the model, used to select a tokenizer.
+
+    Returns:
+        The trimmed function source.
+    """
+    lines = function_body.splitlines()
+    keep = set()
+
+    try:
+        fn = ast.parse(function_body).body[0]
+        body_start = fn.body[0].lineno - 1
+        outcomes = _outcome_statement_lines(fn)
+    except (SyntaxError, IndexError, AttributeError):
+        body_start = 1
+        outcomes = []
+
+    tokens = 0
+
+    def _keep(start: int, end: int) -> bool:
+        """Keep lines `start` to `end`, if they all fit in the budget."""
+        nonlocal tokens
+
+        new = [i for i in range(start, end) if i not in keep]
+        cost = sum(count_tokens(lines[i], model) + 1 for i in new)
+
+        if keep and tokens + cost > token_budget:
+            return False
+
+        keep.update(new)
+        tokens += cost
+        return True
+
+    _keep(0, body_start)
+
+    for start, end in outcomes:
+        _keep(start, end)
+
+    for i in range(body_start, len(lines)):
+        if not _keep(i, i + 1):
+            break
+
+    ### Replace each run of omitted lines with a note
+    trimmed = []
+    omitted = 0
+
+    for i, line in enumerate(lines + [""]):
+        if i in keep or i == len(lines):
+            if omitted:
+                first = lines[i - omitted]
+                indent = first[: len(first) - len(first.lstrip())]
+                trimmed.append(
+                    f"{indent}# ... {omitted} line{'s' * (omitted > 1)} omitted ..."
+                )
+                omitted = 0
+
+            if i < len(lines):
+                trimmed.append(line)
+        else:
+            omitted += 1
+
+    return "\n".join(trimmed)
+
+
+def _outcome_statement_lines(fn: ast.AST) -> List[Tuple[int, int]]:
+    """Zero based line ranges of the return, raise, and yield statements of the
+    function `fn`, along with the first line of each block enclosing them, such as
+    an `if` or `try`. Statements of nested functions and classes are ignored."""
+    ranges = set()
+    stack = [(node, ()) for node in fn.body]
+
+    while stack:
+        node, enclosing = stack.pop()
+
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+
+        if isinstance(node, (ast.Return, ast.Raise)) or (
+            isinstance(node, (ast.Expr, ast.Assign, ast.AnnAssign, ast.AugAssign))
+            and isinstance(node.value, (ast.Yield, ast.YieldFrom))
+        ):
+            ranges.update((line, line + 1) for line in enclosing)
+            ranges.add((node.lineno - 1, node.end_lineno))
+            continue
+
+        children = [
+            child
+            for child in ast.iter_child_nodes(node)
+            if isinstance(child, (ast.stmt, ast.excepthandler, ast.match_case))
+        ]
+
+        if children and hasattr(node, "lineno"):
+            enclosing = (*enclosing, node.lineno - 1)
+
+        stack.extend((child, enclosing) for child in children)
+
+    return sorted(ranges)
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Count the number of tokens `text` encodes to for the given `model`.
+
+    If no tokenizer is available, the count is estimated from the text length.
+    """
+    encoding = _get_encoding(model)
+
+    if encoding is None:
+        return len(text) // 4 + 1
+
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _get_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    """Get the tiktoken encoding for `model`, falling back to the encoding used by
+    recent openai models for unknown models such as self hosted ones.
+
+    Each encoding is only loaded once, even when first needed by several threads
+    at once. Returns None if no encoding can be loaded, for instance when offline.
+    """
+    try:
+        return _ENCODINGS[model]
+    except KeyError:
+        pass
+
+    with _ENCODING_LOCK:
+        if model not in _ENCODINGS:
+            _ENCODINGS[model] = _load_encoding(model)
+
+        return _ENCODINGS[model]
+
+
+def _load_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+
+    except Exception as e:
+        _LOGGER.warning(f"Token counts will be estimated, no tokenizer available: {e}")
+        return None
+
+
+def _parse_batched_reply(reply: str, count: int) -> List[Optional[str]]:
+    """Parse the JSON object mapping function numbers to docstrings out of a
+    batched completion `reply`. Missing or malformed entries are returned as None.
+    """
+    if not reply:
+        return [None] * count
+
+    start, end = reply.find("{"), reply.rfind("}")
+
+    try:
+        parsed = json.loads(reply[start : end + 1]) if start != -1 else None
+    except json.JSONDecodeError:
+        parsed = None
+
+    if not isinstance(parsed, dict):
+        _LOGGER.debug(f"Could not parse batched reply: {reply!r}")
+        return [None] * count
+
+    docstrings = []
+
+    for i in range(1, count + 1):
+        docstring = parsed.get(str(i))
+        docstrings.append(
+            docstring if isinstance(docstring, str) and docstring else None
+        )
+
+    return docstrings
+
+
+def docstring_cache_key(
+    function_body: str, cfg: LLMConfiguration, batched: bool = False
+) -> str:
+    """Compute the key under which the docstring generated for `function_body`
+    with the llm configuration `cfg` is cached.
+
+    The key covers the normalized ast of the function, so that formatting and
+    comment changes do not invalidate it, along with the prompt template, model,
+    and docstring style. For functions which are trimmed before being sent, it also
+    covers the prompt token budget they are trimmed to.
+
+    Args:
+        function_body: The text data of a function to generate docstrings for.
+        cfg: The current LLMConfiguration object.
+        batched: Whether the docstring is generated by a run which batches
+            functions, and so with the batched prompt template.
+
+    Returns:
+        A hex digest identifying the generated docstring.
+    """
+    h = hashlib.sha256()
+
+    parts = [
+        normalize_function_source(function_body),
+        _DOCSTRING_PROMPT_TEMPLATE,
+        cfg.model,
+        cfg.docstring_style,
+    ]
+
+    # NOTE: Only added when batching, so keys of unbatched runs stay the same.
+    if batched:
+        parts.append(_BATCH_PROMPT_TEMPLATE + _BATCH_FUNCTION_TEMPLATE)
+
+    # NOTE: Only added for trimmed functions, so other keys survive budget changes.
+    if 0 < cfg.prompt_token_budget < count_tokens(function_body, cfg.model):
+        parts.append(f"trimmed to {cfg.prompt_token_budget}")
+
+    for part in parts:
+        h.update(part.encode())
+        h.update(b"\0")
+
+    return h.hexdigest()
+
 
 def sanitize_docstring(fn: ResolvedFunction, docstring: str):
     if not docstring.endswith("\n"):
@@ -87,19 +566,112 @@ def sanitize_docstring(fn: ResolvedFunction, docstring: str):
 
 
 def dispatch_completion(
-    client: openai.OpenAI, cfg: LLMConfiguration, message: str
+    client: openai.OpenAI,
+    cfg: LLMConfiguration,
+    message: str,
+    max_tokens: Optional[int] = None,
 ) -> str:
-    return (
-        client.chat.completions.create(
+    return _create_completion(client, cfg, message, max_tokens)[0]
+
+
+def _create_completion(
+    client: openai.OpenAI,
+    cfg: LLMConfiguration,
+    message: str,
+    max_tokens: Optional[int] = None,
+) -> Tuple[str, Optional[int]]:
+    """Like `dispatch_completion`, but also return the number of completion tokens
+    reported by the server, if any."""
+    with profiling.span("llm.completion") as s:
+        resp = client.chat.completions.create(
+            model=cfg.model,
+            messages=[{"role": "user", "content": message}],
+            max_tokens=max_tokens or cfg.max_tokens,
+            n=1,
+            timeout=cfg.timeout,
+        )
+
+        if resp.usage is not None:
+            s.add(
+                prompt_tokens=resp.usage.prompt_tokens,
+                completion_tokens=resp.usage.completion_tokens,
+            )
+
+    tokens = resp.usage.completion_tokens if resp.usage is not None else None
+
+    return resp.choices[0].message.content, tokens
+
+
+def stream_completion(
+    client: openai.OpenAI,
+    cfg: LLMConfiguration,
+    message: str,
+    on_text: Optional[Callable[[str], None]] = None,
+    max_tokens: Optional[int] = None,
+) -> Tuple[str, CompletionStats]:
+    """Like `dispatch_completion`, but streams the completion as it is generated.
+
+    Args:
+        client: Client to send the request with.
+        cfg: The current LLMConfiguration object.
+        message: The prompt to complete.
+        on_text: Optional callback receiving the completion text so far each time
+            more of it arrives.
+        max_tokens: Optional override of the completion token limit in `cfg`.
+
+    Returns:
+        The completion text, and timing stats about the request.
+    """
+    start = time.perf_counter()
+    first_token = None
+    text = ""
+    chunks = 0
+    usage = None
+
+    with profiling.span("llm.completion_stream") as s:
+        stream = client.chat.completions.create(
             model=cfg.model,
             messages=[{"role": "user", "content": message}],
-            max_tokens=cfg.max_tokens,
+            max_tokens=max_tokens or cfg.max_tokens,
             n=1,
+            timeout=cfg.timeout,
+            stream=True,
+        )
+
+        for chunk in stream:
+            # NOTE: Servers may report usage on the last chunk, which has no choices.
+            usage = getattr(chunk, "usage", None) or usage
+
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+
+            chunks += 1
+
+            if first_token is None:
+                first_token = time.perf_counter() - start
+
+            text += chunk.choices[0].delta.content
+
+            if on_text is not None:
+                on_text(text)
+
+        stats = CompletionStats(
+            time_to_first_token=first_token,
+            duration=time.perf_counter() - start,
+            # NOTE: Servers generally send a token per chunk, so the number of
+            #       chunks avoids loading a tokenizer when usage isn't reported.
+            completion_tokens=usage.completion_tokens if usage else chunks,
         )
-        .choices[0]
-        .message.content
+
+        s.add(completion_tokens=stats.completion_tokens)
+
+    _LOGGER.debug(
+        f"Streamed completion: {stats.time_to_first_token}s to first token, "
+        f"{stats.tokens_per_second:.1f} tokens/s"
     )
 
+    return text, stats
+
 
 def generate_new_function_code_with_docstring(
     fn: ResolvedFunction, docstring: str
@@ -107,5 +679,5 @@ def generate_new_function_code_with_docstring(
     print(fn)
 
 
-def _format_docstring_request_prompt(function_body: str) -> str:
-    return f"Generate a python docstring in Google style for the following function, only returning the docstring:\n\n{function_body}"
+def _format_docstring_request_prompt(function_body: str, style: str = "Google") -> str:
+    return _DOCSTRING_PROMPT_TEMPLATE.format(style=style, function_body=function_body)
@@ -0,0 +1,224 @@
+"""Lightweight timing of the phases of a pygendocs command.
+
+Phases are instrumented with `span`, which does nothing unless a `Profiler` has
+been activated with `enable`, so instrumentation can stay in place permanently.
+"""
+
+import json
+import os
+import threading
+import time
+
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class Span:
+    """A single timed occurrence of a phase."""
+
+    name: str
+    """Name of the phase, such as `scan.parse`."""
+
+    start: float
+    """Seconds from the start of profiling until the span started."""
+
+    duration: float = 0.0
+    """Seconds the span lasted."""
+
+    thread: str = ""
+    """Name of the thread the span ran on."""
+
+    attrs: Dict[str, float] = field(default_factory=dict)
+    """Counters recorded during the span, such as numbers of files, bytes, or
+    tokens. Summed across spans of the same name in the summary."""
+
+    def add(self, **attrs: float):
+        """Add to the counters of this span."""
+        for k, v in attrs.items():
+            self.attrs[k] = self.attrs.get(k, 0) + v
+
+
+@dataclass
+class PhaseSummary:
+    """Aggregate of every span with the same name."""
+
+    name: str
+    calls: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    attrs: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.calls if self.calls else 0.0
+
+
+class Profiler:
+    """Thread safe collector of spans."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        """Every finished span, in the order they finished."""
+
+        self.origin = time.perf_counter()
+        """Performance counter value which span start times are relative to."""
+
+        self.started = time.time()
+        """Wall clock time profiling started at."""
+
+        self._lock = threading.Lock()
+
+    def span(self, name: str, **attrs: float) -> "_ActiveSpan":
+        return _ActiveSpan(self, Span(name, 0.0, attrs=dict(attrs)))
+
+    def record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> List[PhaseSummary]:
+        """Aggregate spans by name, in the order each name first started."""
+        phases: Dict[str, PhaseSummary] = {}
+
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+
+        for s in spans:
+            phase = phases.setdefault(s.name, PhaseSummary(s.name))
+            phase.calls += 1
+            phase.total += s.duration
+            phase.max = max(phase.max, s.duration)
+
+            for k, v in s.attrs.items():
+                phase.attrs[k] = phase.attrs.get(k, 0) + v
+
+        return list(phases.values())
+
+    def write_trace(self, path: str | Path, **meta):
+        """Write every span to `path` as JSON, along with any `meta` data."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    **meta,
+                    "started": self.started,
+                    "pid": os.getpid(),
+                    "spans": [asdict(s) for s in spans],
+                },
+                f,
+                indent=1,
+            )
+
+
+class _ActiveSpan:
+    """Context manager timing a span, and recording it with its profiler on exit."""
+
+    __slots__ = ("_profiler", "span")
+
+    def __init__(self, profiler: Profiler, span: Span):
+        self._profiler = profiler
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.span.thread = threading.current_thread().name
+        self.span.start = time.perf_counter() - self._profiler.origin
+        return self.span
+
+    def __exit__(self, *_):
+        self.span.duration = (
+            time.perf_counter() - self._profiler.origin - self.span.start
+        )
+        self._profiler.record(self.span)
+
+
+class _NullSpan:
+    """Stand-in for both `_ActiveSpan` and `Span` while profiling is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+    def add(self, **attrs: float):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+_ACTIVE: Optional[Profiler] = None
+"""The profiler receiving spans, if profiling is enabled."""
+
+
+def enable() -> Profiler:
+    """Start profiling with a new profiler, and return it."""
+    global _ACTIVE
+    _ACTIVE = Profiler()
+    return _ACTIVE
+
+
+def disable():
+    """Stop profiling. Spans which are still open are discarded."""
+    global _ACTIVE
+    _ACTIVE = None
+
+
+def is_enabled() -> bool:
+    return _ACTIVE is not None
+
+
+def span(name: str, **attrs: float):
+    """Time the enclosed block as a span called `name`, with initial counters
+    `attrs`. The span is yielded so more counters can be added with `Span.add`.
+
+    Does nothing if profiling is not enabled.
+    """
+    if _ACTIVE is None:
+        return _NULL_SPAN
+
+    return _ACTIVE.span(name, **attrs)
+
+
+def timed_iter(name: str, iterable: Iterable[T]) -> Iterator[T]:
+    """Wrap a lazy `iterable`, recording the time spent producing its items as a
+    single span called `name` with an `items` counter.
+
+    If profiling is not enabled, a plain iterator over `iterable` is returned.
+    """
+    if _ACTIVE is None:
+        return iter(iterable)
+
+    return _timed_iter(_ACTIVE, name, iterable)
+
+
+def _timed_iter(profiler: Profiler, name: str, iterable: Iterable[T]) -> Iterator[T]:
+    s = Span(name, time.perf_counter() - profiler.origin, attrs={"items": 0})
+    s.thread = threading.current_thread().name
+    it = iter(iterable)
+
+    try:
+        while True:
+            start = time.perf_counter()
+
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                s.duration += time.perf_counter() - start
+
+            s.attrs["items"] += 1
+            yield item
+
+    finally:
+        profiler.record(s)
@@ -0,0 +1,285 @@
+"""Output formats for the results of `pygendocs check`.
+
+Each reporter writes one record per function as it is given one, rather than
+building up the whole report first, so large reports start streaming immediately
+and use constant memory.
+"""
+
+import json
+import os
+import sys
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from enum import Enum
+from typing import TextIO
+
+from .functions import ResolvedFunction
+
+_SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+
+_SARIF_RULE_ID = "missing-docstring"
+
+
+class ReportFormat(str, Enum):
+    rich = "rich"
+    text = "text"
+    json = "json"
+    sarif = "sarif"
+
+
+@dataclass
+class CoverageSummary:
+    """Docstring coverage of the checked functions."""
+
+    functions: int
+    """Number of functions checked."""
+
+    missing: int
+    """Number of checked functions missing a docstring."""
+
+    threshold: float
+    """Coverage percentage under which the check fails."""
+
+    @property
+    def coverage(self) -> float:
+        """Percentage of checked functions which have a docstring."""
+        if not self.functions:
+            return 100.0
+
+        return 100 - self.missing * 100 / self.functions
+
+    @property
+    def passed(self) -> bool:
+        return self.coverage >= self.threshold
+
+
+class Reporter(ABC):
+    """Writes a report of functions missing docstrings to `stream`.
+
+    Call `function` for each function missing a docstring, and then `finish`
+    once. If `quiet` is set, only the summary is reported.
+    """
+
+    def __init__(self, stream: TextIO = sys.stdout, quiet: bool = False):
+        self.stream = stream
+        self.quiet = quiet
+
+    def function(self, fn: ResolvedFunction):
+        if not self.quiet:
+            self._write_function(fn)
+
+    def finish(self, summary: CoverageSummary):
+        self._write_summary(summary)
+        self.stream.flush()
+
+    @abstractmethod
+    def _write_function(self, fn: ResolvedFunction):
+        pass
+
+    @abstractmethod
+    def _write_summary(self, summary: CoverageSummary):
+        pass
+
+
+class RichReporter(Reporter):
+    """Syntax highlighted panels of each function, for reading in a terminal."""
+
+    def __init__(self, stream: TextIO = sys.stdout, quiet: bool = False):
+        super().__init__(stream, quiet)
+        self._started = False
+
+    def _write_function(self, fn: ResolvedFunction):
+        from .cli import print_function, print_message
+
+        if not self._started:
+            self._started = True
+            print()
+            print_message("The following functions are missing docstrings:")
+            print()
+
+        print_function(fn)
+
+    def _write_summary(self, summary: CoverageSummary):
+        from .cli import print_message
+
+        cov, threshold = summary.coverage, summary.threshold
+
+        print()
+
+        if summary.passed:
+            print_message(
+                f"[green bold]{cov:.2f}%[/] of functions have docstrings. [dim](Threshold {threshold}%)"
+            )
+        else:
+            print_message(
+                f"Only [bold red]{cov:.2f}%[/] of functions have docstrings. [dim](Threshold {threshold}%)"
+            )
+
+        print()
+
+
+class TextReporter(Reporter):
+    """One `file:line:column: message` line per function, as printed by compilers
+    and linters."""
+
+    def _write_function(self, fn: ResolvedFunction):
+        self.stream.write(
+            f"{display_path(fn.source_file)}:{fn.lineno}:{fn.col_offset + 1}: "
+            f"{fn.qualified_name} is missing a docstring\n"
+        )
+
+    def _write_summary(self, summary: CoverageSummary):
+        self.stream.write(
+            f"{summary.coverage:.2f}% of {summary.functions} functions have "
+            f"docstrings (threshold {summary.threshold}%): "
+            f"{'passed' if summary.passed else 'failed'}\n"
+        )
+
+
+class JsonReporter(Reporter):
+    """JSON lines, with one object per function followed by a summary object."""
+
+    def _write_function(self, fn: ResolvedFunction):
+        self.stream.write(
+            json.dumps(
+                {
+                    "type": "missing_docstring",
+                    "file": display_path(fn.source_file),
+                    "line": fn.lineno,
+                    "end_line": fn.end_lineno,
+                    "column": fn.col_offset + 1,
+                    "name": fn.name,
+                    "qualified_name": fn.qualified_name,
+                }
+            )
+            + "\n"
+        )
+
+    def _write_summary(self, summary: CoverageSummary):
+        self.stream.write(
+            json.dumps(
+                {
+                    "type": "summary",
+                    "functions": summary.functions,
+                    "missing": summary.missing,
+                    "coverage": round(summary.coverage, 2),
+                    "threshold": summary.threshold,
+                    "passed": summary.passed,
+                }
+            )
+            + "\n"
+        )
+
+
+class SarifReporter(Reporter):
+    """A SARIF 2.1.0 log, as consumed by code scanning and annotation tools.
+
+    The log is a single JSON document, which is written incrementally.
+    """
+
+    def __init__(self, stream: TextIO = sys.stdout, quiet: bool = False):
+        super().__init__(stream, quiet)
+        self._results = 0
+
+        header = json.dumps(
+            {
+                "$schema": _SARIF_SCHEMA,
+                "version": "2.1.0",
+                "runs": [
+                    {
+                        "tool": {
+                            "driver": {
+                                "name": "pygendocs",
+                                "informationUri": "https://github.com/mdlafrance/pygendocs",
+                                "rules": [
+                                    {
+                                        "id": _SARIF_RULE_ID,
+                                        "shortDescription": {
+                                            "text": "Function is missing a docstring."
+                                        },
+                                    }
+                                ],
+                            }
+                        },
+                        "results": [],
+                    }
+                ],
+            }
+        )
+
+        # NOTE: Split the document where the results go, so they can be written
+        #       between the two halves as they arrive.
+        self._header, self._footer = header.rsplit('"results": []', 1)
+
+        self.stream.write(self._header + '"results": [')
+
+    def _write_function(self, fn: ResolvedFunction):
+        if self._results:
+            self.stream.write(",")
+
+        self._results += 1
+
+        self.stream.write(
+            json.dumps(
+                {
+                    "ruleId": _SARIF_RULE_ID,
+                    "level": "warning",
+                    "message": {"text": f"{fn.qualified_name} is missing a docstring."},
+                    "locations": [
+                        {
+                            "physicalLocation": {
+                                "artifactLocation": {
+                                    "uri": display_path(fn.source_file).replace(
+                                        os.sep, "/"
+                                    )
+                                },
+                                "region": {
+                                    "startLine": fn.lineno,
+                                    "startColumn": fn.col_offset + 1,
+                                    "endLine": fn.end_lineno,
+                                },
+                            }
+                        }
+                    ],
+                    "logicalLocations": [
+                        {"fullyQualifiedName": fn.qualified_name, "kind": "function"}
+                    ],
+                }
+            )
+        )
+
+    def _write_summary(self, summary: CoverageSummary):
+        properties = json.dumps(
+            {
+                "functions": summary.functions,
+                "missing": summary.missing,
+                "coverage": round(summary.coverage, 2),
+                "threshold": summary.threshold,
+                "passed": summary.passed,
+            }
+        )
+
+        self.stream.write(f'], "properties": {properties}' + self._footer + "\n")
+
+
+_REPORTERS = {
+    ReportFormat.rich: RichReporter,
+    ReportFormat.text: TextReporter,
+    ReportFormat.json: JsonReporter,
+    ReportFormat.sarif: SarifReporter,
+}
+
+
+def get_reporter(
+    fmt: ReportFormat, stream: TextIO = sys.stdout, quiet: bool = False
+) -> Reporter:
+    """Create a reporter writing the given format to `stream`."""
+    return _REPORTERS[ReportFormat(fmt)](stream, quiet)
+
+
+def display_path(path: str) -> str:
+    """Path to display for `path`, relative to the current directory if it is
+    inside it."""
+    rel = os.path.relpath(path)
+    return path if rel.startswith(os.pardir) else rel
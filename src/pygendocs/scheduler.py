@@ -0,0 +1,336 @@
+"""Rate limiting, retries, and adaptive concurrency for requests to the llm server.
+
+Requests made through a `RequestScheduler` are throttled to the configured
+request and token rates, retried with jittered exponential backoff on transient
+failures, and limited to a number of concurrent requests which shrinks when the
+server signals overload and grows again while it is healthy.
+"""
+
+import email.utils
+import logging
+import random
+import threading
+import time
+
+from typing import Callable, Optional, TypeVar
+
+import openai
+
+from .config import PyGenDocsConfiguration
+
+_LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """Thread safe token bucket refilling at a constant rate per minute.
+
+    The bucket holds at most one minute's worth of tokens, so bursts up to the
+    per minute limit are allowed.
+    """
+
+    def __init__(
+        self,
+        per_minute: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate = per_minute / 60
+        """Tokens added to the bucket per second."""
+
+        self.capacity = per_minute
+        """Maximum number of tokens the bucket can hold."""
+
+        self._tokens = per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1):
+        """Block until `amount` tokens are available, and take them.
+
+        Requests larger than the capacity of the bucket wait for a full bucket.
+        """
+        amount = min(amount, self.capacity)
+
+        # NOTE: Waiters hold the lock while sleeping, so they are served in order.
+        with self._lock:
+            while True:
+                now = self._clock()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+
+                self._sleep((amount - self._tokens) / self.rate)
+
+
+class AIMDLimiter:
+    """Concurrency limit using additive increase, multiplicative decrease.
+
+    The limit grows by roughly one for every `limit` successful requests, and is
+    halved when the server is overloaded, either by explicit rate limiting or by a
+    spike in latency. Decreases are spaced out by the typical request latency, so a
+    burst of failures from one window only counts once.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        decrease_factor: float = 0.5,
+        latency_spike_factor: float = 3.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.decrease_factor = decrease_factor
+        self.latency_spike_factor = latency_spike_factor
+
+        self.limit: float = self.max_limit
+        """Current number of requests allowed in flight at once."""
+
+        self.in_flight = 0
+        """Current number of requests in flight."""
+
+        self._latency: Optional[float] = None
+        self._samples = 0
+        self._last_decrease = float("-inf")
+        self._clock = clock
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until another request may be sent."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+
+            self.in_flight += 1
+
+    def release(self):
+        """Mark a request acquired with `acquire` as finished."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self, latency: float):
+        """Record a successful request which took `latency` seconds."""
+        with self._cond:
+            spiked = (
+                self._samples >= 5
+                and latency > self._latency * self.latency_spike_factor
+            )
+
+            self._latency = (
+                latency
+                if self._latency is None
+                else 0.8 * self._latency + 0.2 * latency
+            )
+            self._samples += 1
+
+            if spiked:
+                self._decrease()
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            self._cond.notify_all()
+
+    def on_overload(self):
+        """Record a request rejected because the server is overloaded."""
+        with self._cond:
+            self._decrease()
+
+    def _decrease(self):
+        now = self._clock()
+
+        if now - self._last_decrease < (self._latency or 1.0):
+            return
+
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+
+        _LOGGER.debug(f"Reduced request concurrency to {int(self.limit)}")
+
+
+class RequestScheduler:
+    """Sends requests subject to rate limits, retries, and adaptive concurrency."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        on_attempt: Optional[Callable[[float, Optional[Exception]], None]] = None,
+    ):
+        self.limiter = AIMDLimiter(max_concurrency, clock=clock)
+        """Adaptive limit on the number of requests in flight."""
+
+        self.request_bucket = (
+            TokenBucket(requests_per_minute, clock, sleep)
+            if requests_per_minute
+            else None
+        )
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute, clock, sleep) if tokens_per_minute else None
+        )
+
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.on_attempt = on_attempt
+        """Optional callback receiving the latency of every request attempt, and the
+        error it raised if it failed. Called from the thread sending the request."""
+
+        self._clock = clock
+        self._sleep = sleep
+
+    @classmethod
+    def from_config(cls, cfg: PyGenDocsConfiguration, **kwargs) -> "RequestScheduler":
+        return cls(
+            max_concurrency=cfg.llm_concurrency,
+            requests_per_minute=cfg.llm_requests_per_minute,
+            tokens_per_minute=cfg.llm_tokens_per_minute,
+            max_retries=cfg.llm_max_retries,
+            **kwargs,
+        )
+
+    @property
+    def limits_tokens(self) -> bool:
+        """Whether or not requests are limited by a tokens per minute rate, and so
+        need token estimates passed to `call`."""
+        return self.token_bucket is not None
+
+    def call(
+        self,
+        request: Callable[[], T],
+        tokens: int = 0,
+        on_retry: Optional[Callable[[Exception, float], None]] = None,
+    ) -> T:
+        """Send `request`, retrying it on transient failures.
+
+        Args:
+            request: Callable which performs the request.
+            tokens: Estimated number of tokens used by the request, counted against
+                the tokens per minute limit.
+            on_retry: Optional callback receiving the error and delay each time the
+                request is retried.
+
+        Returns:
+            The return value of `request`.
+
+        Raises:
+            The last error raised by `request`, once it is not retryable or retries
+            have been exhausted.
+        """
+        for attempt in range(self.max_retries + 1):
+            if self.request_bucket is not None:
+                self.request_bucket.acquire(1)
+
+            if self.token_bucket is not None and tokens:
+                self.token_bucket.acquire(tokens)
+
+            self.limiter.acquire()
+            start = self._clock()
+
+            try:
+                result = request()
+
+            except Exception as e:
+                self.limiter.release()
+
+                if self.on_attempt is not None:
+                    self.on_attempt(self._clock() - start, e)
+
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+
+                if is_overloaded(e):
+                    self.limiter.on_overload()
+
+                delay = self._retry_delay(e, attempt)
+
+                _LOGGER.debug(f"Retrying request in {delay:.2f}s after error: {e}")
+
+                if on_retry is not None:
+                    on_retry(e, delay)
+
+                self._sleep(delay)
+                continue
+
+            latency = self._clock() - start
+
+            self.limiter.release()
+            self.limiter.on_success(latency)
+
+            if self.on_attempt is not None:
+                self.on_attempt(latency, None)
+
+            return result
+
+    def _retry_delay(self, e: Exception, attempt: int) -> float:
+        """Delay before retrying after the `attempt`th failure, honouring any delay
+        requested by the server."""
+        requested = retry_after(e)
+
+        if requested is not None:
+            return min(self.max_delay, requested) + random.uniform(0, self.base_delay)
+
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+def is_retryable(e: Exception) -> bool:
+    """Whether or not the request which raised `e` may succeed if retried."""
+    if isinstance(e, openai.APIConnectionError):
+        return True
+
+    status = getattr(e, "status_code", None)
+
+    return status in (408, 409, 429) or (status is not None and status >= 500)
+
+
+def is_overloaded(e: Exception) -> bool:
+    """Whether or not `e` signals that the server is overloaded."""
+    return isinstance(e, openai.APITimeoutError) or getattr(e, "status_code", None) in (
+        429,
+        503,
+    )
+
+
+def retry_after(e: Exception) -> Optional[float]:
+    """The number of seconds the server asked to wait before retrying, read from
+    the `Retry-After` headers of the response attached to `e`, if any."""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+
+    if not headers:
+        return None
+
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+
+        value = headers.get("retry-after")
+
+        if value is None:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            date = email.utils.parsedate_to_datetime(value)
+            return max(0.0, date.timestamp() - time.time())
+
+    except (TypeError, ValueError):
+        return None
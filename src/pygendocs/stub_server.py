@@ -0,0 +1,254 @@
+"""A stand-in for an OpenAI compatible chat completions server, for load testing.
+
+The stub answers `POST .../chat/completions` requests after a randomized delay,
+generating a fixed number of tokens at a configurable rate, and fails a
+configurable fraction of requests. Both plain and streamed completions are
+supported, as are the batched prompts sent by `llm.generate_function_docstrings_batched`.
+"""
+
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+import uuid
+
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+_LOGGER = logging.getLogger(__name__)
+
+_BATCH_FUNCTION_NUMBER = re.compile(r"^### Function (\d+)$", re.MULTILINE)
+
+
+@dataclass
+class StubServerConfig:
+    """Behaviour of a `StubServer`."""
+
+    latency: float = 0.5
+    """Median seconds before the first token of a completion is sent."""
+
+    latency_sigma: float = 0.5
+    """Shape of the log-normal distribution latencies are drawn from. Zero makes
+    every request take exactly `latency`."""
+
+    error_rate: float = 0.0
+    """Fraction of requests which fail, after waiting out their latency."""
+
+    error_status: int = 500
+    """HTTP status code of failed requests."""
+
+    tokens_per_second: float = 50.0
+    """Rate at which completion tokens are generated. Zero or less sends the whole
+    completion at once."""
+
+    completion_tokens: int = 40
+    """Number of tokens in each completion."""
+
+    seed: Optional[int] = None
+    """Seed for the random number generator, for reproducible runs."""
+
+
+class StubServer:
+    """Threaded http server mimicking the chat completions endpoint.
+
+    The server runs on a background thread between `start` and `stop`, or for the
+    duration of a `with` block.
+    """
+
+    def __init__(
+        self,
+        config: Optional[StubServerConfig] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.config = config or StubServerConfig()
+
+        self.requests = 0
+        """Number of completion requests received."""
+
+        self.errors = 0
+        """Number of completion requests deliberately failed."""
+
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        """Base url of the api served, for use as `llm_api_url`."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubServer":
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+        _LOGGER.debug(f"Stub llm server listening on {self.url}")
+
+        return self
+
+    def stop(self):
+        """Stop serving requests and close the server socket."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *_):
+        self.stop()
+
+    def _sample(self) -> Tuple[float, bool]:
+        """Draw the latency of a request, and whether or not it should fail."""
+        cfg = self.config
+
+        with self._lock:
+            self.requests += 1
+
+            latency = cfg.latency * math.exp(self._rng.gauss(0, cfg.latency_sigma))
+            fail = self._rng.random() < cfg.error_rate
+
+            if fail:
+                self.errors += 1
+
+        return latency, fail
+
+
+def _make_handler(server: StubServer) -> type:
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            _LOGGER.debug(format % args)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send_json(404, {"error": {"message": "Not found"}})
+
+            try:
+                request = json.loads(body)
+                prompt = request["messages"][-1]["content"]
+            except (ValueError, KeyError, IndexError, TypeError):
+                return self._send_json(400, {"error": {"message": "Bad request"}})
+
+            cfg = server.config
+            latency, fail = server._sample()
+
+            time.sleep(latency)
+
+            if fail:
+                return self._send_json(
+                    cfg.error_status,
+                    {"error": {"message": "Stub failure", "type": "server_error"}},
+                )
+
+            tokens = _completion_tokens(prompt, cfg.completion_tokens)
+            delay = 1 / cfg.tokens_per_second if cfg.tokens_per_second > 0 else 0
+            model = request.get("model", "stub")
+
+            if request.get("stream"):
+                return self._stream(tokens, delay, model)
+
+            time.sleep(delay * len(tokens))
+
+            self._send_json(
+                200,
+                {
+                    "id": f"chatcmpl-{uuid.uuid4().hex}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {
+                                "role": "assistant",
+                                "content": "".join(tokens),
+                            },
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": len(prompt) // 4 + 1,
+                        "completion_tokens": len(tokens),
+                        "total_tokens": len(prompt) // 4 + 1 + len(tokens),
+                    },
+                },
+            )
+
+        def _stream(self, tokens: List[str], delay: float, model: str):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+            for i, token in enumerate(tokens + [None]):
+                if i:
+                    time.sleep(delay)
+
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "delta": {} if token is None else {"content": token},
+                            "finish_reason": "stop" if token is None else None,
+                        }
+                    ],
+                }
+                self._send_chunk(f"data: {json.dumps(chunk)}\n\n")
+
+            self._send_chunk("data: [DONE]\n\n")
+            self._send_chunk("")
+
+        def _send_chunk(self, data: str):
+            encoded = data.encode()
+            self.wfile.write(f"{len(encoded):x}\r\n".encode() + encoded + b"\r\n")
+            self.wfile.flush()
+
+        def _send_json(self, status: int, payload: dict):
+            encoded = json.dumps(payload).encode()
+
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+    return _Handler
+
+
+def _completion_tokens(prompt: str, count: int) -> List[str]:
+    """Split a canned reply to `prompt` into roughly `count` tokens, answering each
+    function of a batched prompt with its own docstring."""
+    numbers = _BATCH_FUNCTION_NUMBER.findall(prompt)
+
+    if numbers:
+        per_function = max(1, count // len(numbers))
+        reply = json.dumps({n: _docstring(per_function) for n in numbers})
+        size = max(1, len(reply) // count)
+        return [reply[i : i + size] for i in range(0, len(reply), size)]
+
+    return ['"""'] + [" word"] * max(0, count - 2) + ['."""']
+
+
+def _docstring(words: int) -> str:
+    return "Stub docstring" + " word" * max(0, words - 2) + "."
@@ -0,0 +1,387 @@
+"""Discovery of source files beneath the input paths given to pygendocs.
+
+Directories are walked lazily with `os.scandir`, and excluded or git-ignored
+directories are pruned before they are descended into.
+"""
+
+import logging
+import os
+import re
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Pattern
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class _Rule:
+    """A single compiled gitignore-style pattern."""
+
+    regex: Pattern
+    negate: bool
+    dir_only: bool
+    anchored: bool
+
+
+class IgnoreSpec:
+    """A list of gitignore-style glob patterns, relative to a base directory.
+
+    Patterns follow gitignore semantics: a pattern containing a slash is matched
+    against the path relative to `base`, otherwise it is matched against the file
+    name at any depth. A trailing slash only matches directories, a leading `!`
+    negates the pattern, and later patterns take precedence over earlier ones.
+    """
+
+    def __init__(self, patterns: Iterable[str], base: str | Path):
+        self.base = os.path.abspath(base)
+        """Directory which anchored patterns are relative to."""
+
+        self.rules: List[_Rule] = [
+            r for r in (_compile_pattern(p) for p in patterns) if r is not None
+        ]
+
+    @classmethod
+    def from_file(cls, file: str | Path) -> "IgnoreSpec":
+        """Read patterns from a `.gitignore` formatted `file`."""
+        with open(file, "r", errors="replace") as f:
+            return cls(f.read().splitlines(), os.path.dirname(os.path.abspath(file)))
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """Test the absolute `path` against the patterns in this spec.
+
+        Returns True if the path is matched, False if it is matched by a negated
+        pattern, or None if no pattern applies to it.
+        """
+        if not self.rules:
+            return None
+
+        name = os.path.basename(path)
+
+        # NOTE: Anchored patterns can't apply to paths outside of the base directory.
+        rel = None
+
+        if path.startswith(self.base + os.sep):
+            rel = path[len(self.base) + 1 :].replace(os.sep, "/")
+
+        result = None
+
+        for rule in self.rules:
+            if rule.dir_only and not is_dir:
+                continue
+
+            target = rel if rule.anchored else name
+
+            if target is not None and rule.regex.match(target):
+                result = not rule.negate
+
+        return result
+
+
+@dataclass
+class WalkRules:
+    """Rules selecting the source files among the entries of a directory."""
+
+    include: IgnoreSpec
+    """Patterns which files must match to be yielded."""
+
+    exclude: IgnoreSpec
+    """Patterns for files and directories to skip."""
+
+    respect_gitignore: bool = True
+    """Whether or not to skip paths ignored by `.gitignore` files."""
+
+    @classmethod
+    def from_patterns(
+        cls,
+        include: Iterable[str] = ("*.py",),
+        exclude: Iterable[str] = (),
+        respect_gitignore: bool = True,
+        base: str | Path = ".",
+    ) -> "WalkRules":
+        """Compile `include` and `exclude`, anchoring them to `base`."""
+        return cls(
+            IgnoreSpec(include, base), IgnoreSpec(exclude, base), respect_gitignore
+        )
+
+
+def iter_source_files(
+    paths: Iterable[str | Path],
+    include: Iterable[str] = ("*.py",),
+    exclude: Iterable[str] = (),
+    respect_gitignore: bool = True,
+    base: str | Path = ".",
+    on_directory: Optional[Callable[[str], None]] = None,
+    rules_for: Optional[Callable[[str], WalkRules]] = None,
+) -> Iterator[str]:
+    """Lazily yield the source files found in the given input `paths`.
+
+    Directories are recursed into in sorted order, so files are yielded in the same
+    order as sorting all of their paths. Explicitly given files are yielded if they
+    match `include`, even if they would otherwise be excluded or ignored.
+
+    Args:
+        paths: Files and directories to search.
+        include: Glob patterns which files must match to be yielded.
+        exclude: Glob patterns for files and directories to skip.
+        respect_gitignore: Whether or not to skip paths ignored by `.gitignore` files.
+        base: Directory which anchored `include` and `exclude` patterns are
+            relative to.
+        on_directory: Optional callback receiving the absolute path of each
+            directory walked, before its entries are listed.
+        rules_for: Optional callback returning the rules applying to the entries
+            of each absolute directory path, instead of `include`, `exclude`,
+            `respect_gitignore`, and `base`.
+
+    Yields:
+        The absolute path of each source file, without duplicates.
+    """
+    if rules_for is None:
+        rules = WalkRules.from_patterns(include, exclude, respect_gitignore, base)
+        rules_for = lambda directory: rules
+
+    seen = set()
+
+    for root in sorted(set(os.path.abspath(p) for p in paths)):
+        if os.path.isdir(root):
+            respect = rules_for(root).respect_gitignore
+            ignores = _find_parent_gitignores(root) if respect else []
+            files = _walk(root, ignores, rules_for, on_directory)
+
+        elif os.path.isfile(root) and rules_for(os.path.dirname(root)).include.match(
+            root, False
+        ):
+            files = [root]
+
+        else:
+            continue
+
+        for f in files:
+            if f not in seen:
+                seen.add(f)
+                yield f
+
+
+def filter_source_files(
+    files: Iterable[str | Path],
+    paths: Iterable[str | Path] = (),
+    include: Iterable[str] = ("*.py",),
+    exclude: Iterable[str] = (),
+    base: str | Path = ".",
+    rules_for: Optional[Callable[[str], WalkRules]] = None,
+) -> Iterator[str]:
+    """Lazily yield the given existing `files` which `iter_source_files` would find
+    beneath the input `paths`, without walking any directories.
+
+    Files are yielded if they are, or are inside, one of the `paths`, match
+    `include`, and neither they nor any of their parent directories beneath `base`
+    match `exclude`. If no `paths` are given, files are not limited by location.
+    Gitignore files are not consulted. See `iter_source_files` for `rules_for`.
+
+    Yields:
+        The absolute path of each matching file, in sorted order.
+    """
+    if rules_for is None:
+        rules = WalkRules.from_patterns(include, exclude, base=base)
+        rules_for = lambda directory: rules
+
+    roots = [os.path.abspath(p) for p in paths]
+    base = os.path.abspath(base)
+
+    for f in sorted(set(os.path.abspath(f) for f in files)):
+        if roots and not any(f == r or f.startswith(r + os.sep) for r in roots):
+            continue
+
+        parent = os.path.dirname(f)
+
+        if not os.path.isfile(f) or not rules_for(parent).include.match(f, False):
+            continue
+
+        if f in roots:
+            yield f
+            continue
+
+        excluded = rules_for(parent).exclude.match(f, False)
+
+        while not excluded and parent not in (base, os.path.dirname(parent)):
+            excluded = rules_for(os.path.dirname(parent)).exclude.match(parent, True)
+            parent = os.path.dirname(parent)
+
+        if not excluded:
+            yield f
+
+
+def _walk(
+    directory: str,
+    ignores: List[IgnoreSpec],
+    rules_for: Callable[[str], WalkRules],
+    on_directory: Optional[Callable[[str], None]] = None,
+) -> Iterator[str]:
+    if on_directory is not None:
+        on_directory(directory)
+
+    rules = rules_for(directory)
+
+    if rules.respect_gitignore:
+        gitignore = os.path.join(directory, ".gitignore")
+
+        if os.path.isfile(gitignore):
+            ignores = ignores + [IgnoreSpec.from_file(gitignore)]
+
+    try:
+        with os.scandir(directory) as it:
+            entries = sorted(it, key=lambda e: e.name)
+    except OSError as e:
+        _LOGGER.warning(f"Skipping unreadable directory {directory}: {e}")
+        return
+
+    for entry in entries:
+        # NOTE: Symlinked directories are not followed, to avoid cycles.
+        is_dir = entry.is_dir(follow_symlinks=False)
+
+        if not is_dir and not entry.is_file():
+            continue
+
+        if rules.exclude.match(entry.path, is_dir) or (
+            rules.respect_gitignore and _is_ignored(ignores, entry.path, is_dir)
+        ):
+            continue
+
+        if is_dir:
+            yield from _walk(entry.path, ignores, rules_for, on_directory)
+
+        elif rules.include.match(entry.path, False):
+            yield entry.path
+
+
+def _is_ignored(ignores: List[IgnoreSpec], path: str, is_dir: bool) -> bool:
+    """Whether `path` is ignored by the given gitignore specs, in which deeper
+    specs take precedence."""
+    result = False
+
+    for spec in ignores:
+        match = spec.match(path, is_dir)
+
+        if match is not None:
+            result = match
+
+    return result
+
+
+def _find_parent_gitignores(directory: str) -> List[IgnoreSpec]:
+    """Collect the `.gitignore` files which apply to `directory` from its parent
+    directories, up to the root of the git repository containing it.
+
+    If `directory` is not inside a git repository, no parent ignores apply.
+    """
+    parents = []
+    current = os.path.dirname(directory)
+
+    # NOTE: `directory` itself is handled by the walk.
+    if os.path.exists(os.path.join(directory, ".git")):
+        return []
+
+    while True:
+        parents.append(current)
+
+        if os.path.exists(os.path.join(current, ".git")):
+            break
+
+        parent = os.path.dirname(current)
+
+        if parent == current:
+            return []
+
+        current = parent
+
+    return [
+        IgnoreSpec.from_file(os.path.join(p, ".gitignore"))
+        for p in reversed(parents)
+        if os.path.isfile(os.path.join(p, ".gitignore"))
+    ]
+
+
+def _compile_pattern(pattern: str) -> Optional[_Rule]:
+    """Compile a single gitignore-style `pattern`, or return None for blank lines
+    and comments."""
+    pattern = pattern.rstrip()
+
+    if not pattern or pattern.startswith("#"):
+        return None
+
+    negate = pattern.startswith("!")
+
+    if negate:
+        pattern = pattern[1:]
+
+    elif pattern.startswith("\\"):
+        pattern = pattern[1:]
+
+    dir_only = pattern.endswith("/")
+    pattern = pattern.rstrip("/")
+
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+
+    if not pattern:
+        return None
+
+    return _Rule(
+        regex=re.compile(_translate_glob(pattern) + r"\Z"),
+        negate=negate,
+        dir_only=dir_only,
+        anchored=anchored,
+    )
+
+
+def _translate_glob(pattern: str) -> str:
+    """Translate a glob `pattern` into a regular expression matching a relative
+    posix path.
+
+    `*` and `?` do not match slashes, while `**` matches across directories.
+    """
+    res = []
+    i, n = 0, len(pattern)
+
+    while i < n:
+        c = pattern[i]
+
+        if pattern.startswith("**/", i):
+            res.append("(?:.*/)?")
+            i += 3
+            continue
+
+        if pattern.startswith("**", i):
+            res.append(".*")
+            i += 2
+            continue
+
+        if c == "*":
+            res.append("[^/]*")
+
+        elif c == "?":
+            res.append("[^/]")
+
+        elif c == "[" and "]" in pattern[i + 2 :]:
+            j = pattern.index("]", i + 2)
+            body = pattern[i + 1 : j]
+
+            if body.startswith("!"):
+                body = "^" + body[1:]
+
+            res.append("[" + body.replace("\\", "\\\\") + "]")
+            i = j + 1
+            continue
+
+        elif c == "\\" and i + 1 < n:
+            res.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+
+        else:
+            res.append(re.escape(c))
+
+        i += 1
+
+    return "".join(res)
@@ -0,0 +1,88 @@
+import time
+
+from pygendocs.cache import DocstringCache
+from pygendocs.config import LLMConfiguration
+from pygendocs.llm import docstring_cache_key
+
+CFG = LLMConfiguration(model="gpt-4", api_token_env_key="KEY")
+
+
+def test_cache_key_ignores_formatting():
+    a = "def foo(a, b):\n    return a + b\n"
+    b = "def foo( a,b ):  # add\n\n    return (a + b)\n"
+
+    assert docstring_cache_key(a, CFG) == docstring_cache_key(b, CFG)
+    assert docstring_cache_key(a, CFG) != docstring_cache_key(
+        "def foo(a, b):\n    return a - b\n", CFG
+    )
+
+
+def test_cache_key_covers_model_and_style():
+    body = "def foo():\n    pass\n"
+    key = docstring_cache_key(body, CFG)
+
+    assert key != docstring_cache_key(body, CFG.model_copy(update={"model": "other"}))
+    assert key != docstring_cache_key(
+        body, CFG.model_copy(update={"docstring_style": "Numpydoc"})
+    )
+
+
+def test_cache_key_covers_budget_of_trimmed_functions():
+    short = "def foo():\n    pass\n"
+    long = "def foo():\n" + "    x = 1\n" * 200
+
+    def budget(n):
+        return CFG.model_copy(update={"prompt_token_budget": n})
+
+    assert docstring_cache_key(short, budget(50)) == docstring_cache_key(short, CFG)
+    assert docstring_cache_key(long, budget(50)) != docstring_cache_key(long, CFG)
+    assert docstring_cache_key(long, budget(50)) != docstring_cache_key(
+        long, budget(100)
+    )
+
+
+def test_cache_key_covers_prompt_variant():
+    source = "def foo():\n    pass\n"
+
+    assert docstring_cache_key(source, CFG) == docstring_cache_key(
+        source, CFG, batched=False
+    )
+    assert docstring_cache_key(source, CFG) != docstring_cache_key(
+        source, CFG, batched=True
+    )
+
+
+def test_cache_round_trip_and_stats(tmp_path):
+    with DocstringCache.open(tmp_path) as cache:
+        assert cache.get("a") is None
+        cache.put("a", "Docs")
+        assert cache.get("a") == "Docs"
+
+    with DocstringCache.open(tmp_path) as cache:
+        stats = cache.stats()
+
+        assert (stats.entries, stats.hits, stats.misses) == (1, 1, 1)
+        assert stats.size_bytes == sum(
+            f.stat().st_size for f in tmp_path.rglob("docstrings.sqlite3*")
+        )
+
+        cache.clear()
+
+        assert cache.stats().entries == 0
+
+
+def test_cache_prune(tmp_path):
+    with DocstringCache.open(tmp_path) as cache:
+        for key in "abcd":
+            cache.put(key, key)
+            time.sleep(0.01)
+
+        ### Entry 'a' was used most recently, so survives
+        cache.get("a")
+
+        assert cache.prune(max_entries=2) == 2
+        assert cache.get("a") == "a"
+        assert cache.get("d") == "d"
+        assert cache.get("b") is None
+
+        assert cache.prune(max_age_days=0) == 2
@@ -5,3 +5,36 @@ def test_dummy():
     """Dummy test"""
 
     assert True
+
+
+def test_run_yes_writes_cached_docstrings(tmp_path, monkeypatch):
+    from pygendocs import dispatch
+    from pygendocs.cache import DocstringCache
+    from pygendocs.cli import generate_and_write
+    from pygendocs.config import PyGenDocsConfiguration
+    from pygendocs.functions import get_functions_from_file
+    from pygendocs.journal import RunJournal
+    from pygendocs.llm import docstring_cache_key
+
+    src = tmp_path / "module.py"
+    src.write_text("def a():\n    return 1\n\n\ndef b():\n    return 2\n")
+    a, b = get_functions_from_file(src)
+
+    cfg = PyGenDocsConfiguration(
+        cache_dir=str(tmp_path / "cache"), llm_api_token_env_key="KEY"
+    )
+
+    with DocstringCache.open(cfg.cache_dir) as cache:
+        cache.put(docstring_cache_key(a.source_str, cfg.llm_configuration), "Cached a.")
+
+    monkeypatch.setattr(
+        dispatch, "generate_function_docstring", lambda body, cfg: "Generated b."
+    )
+
+    journal = RunJournal.open(cfg.cache_dir)
+    journal.reset()
+
+    writer = generate_and_write([a, b], {}, cfg, journal)
+
+    assert set(writer.written) == {a, b}
+    assert "Cached a." in src.read_text() and "Generated b." in src.read_text()
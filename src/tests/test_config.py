@@ -0,0 +1,74 @@
+from pygendocs.cli import filter_by_file_config, filter_functions, get_scan_filter
+from pygendocs.config import ConfigResolver
+from pygendocs.functions import FunctionFilter, get_functions_from_file
+
+
+def _monorepo(root):
+    (root / "pyproject.toml").write_text('[tool.pygendocs]\ndocstring_style = "reST"\n')
+
+    pkg = root / "packages" / "pkg" / "src"
+    pkg.mkdir(parents=True)
+    (root / "packages" / "pkg" / "pyproject.toml").write_text(
+        "[tool.pygendocs]\nignore_internal = true\n"
+    )
+
+    (root / "top.py").write_text("def _a():\n    pass\n")
+    (pkg / "inner.py").write_text("def _b():\n    pass\n")
+
+    return root / "top.py", pkg / "inner.py"
+
+
+def test_nearest_pyproject_applies_per_file(tmp_path):
+    top, inner = _monorepo(tmp_path)
+
+    resolver = ConfigResolver({"jobs": 2, "ignore_private": None})
+
+    top_cfg = resolver.for_file(top)
+    inner_cfg = resolver.for_file(inner)
+
+    assert top_cfg.docstring_style.value == "reST" and not top_cfg.ignore_internal
+    assert inner_cfg.docstring_style.value == "Google" and inner_cfg.ignore_internal
+    assert top_cfg.jobs == inner_cfg.jobs == 2
+
+    # NOTE: Memoized per pyproject.toml, not only per directory.
+    assert resolver.for_directory(inner.parent.parent) is inner_cfg
+
+
+def test_functions_are_filtered_by_each_files_config(tmp_path):
+    top, inner = _monorepo(tmp_path)
+    resolver = ConfigResolver()
+
+    functions = get_functions_from_file(top) + get_functions_from_file(inner)
+
+    assert get_scan_filter(resolver.for_file(top), resolver) == FunctionFilter()
+
+    functions = filter_by_file_config(functions, resolver)
+    assert [fn.name for fn in functions] == ["_a"]
+    assert filter_functions(functions, resolver.for_file(top), resolver) == functions
+
+
+def test_nested_excludes_apply_from_the_repo_root(tmp_path, monkeypatch):
+    from pygendocs.cli import get_functions_from_paths
+
+    monkeypatch.chdir(tmp_path)
+
+    (tmp_path / "pyproject.toml").write_text("[tool.pygendocs]\nscan_index = false\n")
+    (tmp_path / "a" / "gen").mkdir(parents=True)
+    (tmp_path / "a" / "pyproject.toml").write_text(
+        '[tool.pygendocs]\nscan_index = false\nexclude = ["gen/g.py"]\n'
+    )
+
+    (tmp_path / "gen").mkdir()
+    (tmp_path / "gen" / "g.py").write_text("def top_gen():\n    pass\n")
+    (tmp_path / "a" / "gen" / "g.py").write_text("def nested_gen():\n    pass\n")
+    (tmp_path / "a" / "module.py").write_text("def nested():\n    pass\n")
+
+    resolver = ConfigResolver()
+    cfg = resolver.for_directory(tmp_path)
+
+    functions = get_functions_from_paths([tmp_path], cfg, resolver=resolver)
+    assert sorted(fn.name for fn in functions) == ["nested", "top_gen"]
+
+    changes = {str(f): [(1, 2)] for f in tmp_path.rglob("*.py")}
+    functions = get_functions_from_paths([], cfg, changes=changes, resolver=resolver)
+    assert sorted(fn.name for fn in functions) == ["nested", "top_gen"]
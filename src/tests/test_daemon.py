@@ -0,0 +1,107 @@
+import os
+import tempfile
+import threading
+import time
+
+from pygendocs import daemon
+from pygendocs.config import PyGenDocsConfiguration
+from pygendocs.daemon import WatchedTree, check_with_daemon, query_daemon, serve
+from pygendocs.functions import FunctionFilter
+
+
+def _bump_mtime(path):
+    # NOTE: So changes within the filesystem's timestamp resolution are noticed.
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+def _write(path, source):
+    path.write_text(source)
+    _bump_mtime(path)
+
+
+def test_watched_tree_reparses_only_changed_files(tmp_path, monkeypatch):
+    _write(tmp_path / "a.py", "def a():\n    pass\n")
+    _write(tmp_path / "b.py", 'def b():\n    """Doc."""\n')
+
+    tree = WatchedTree([tmp_path], PyGenDocsConfiguration(jobs=1))
+
+    assert tree.refresh() == 2
+    assert tree.refresh() == 0
+
+    ### Unchanged directories are not walked again
+    with monkeypatch.context() as m:
+        m.setattr(daemon, "iter_source_files", None)
+
+        _write(tmp_path / "b.py", 'def b():\n    """Docs."""\n')
+        assert tree.refresh() == 1
+
+    _write(tmp_path / "a.py", "def a():\n    pass\n\ndef c():\n    pass\n")
+    (tmp_path / "b.py").unlink()
+    _bump_mtime(tmp_path)
+
+    assert tree.refresh() == 1
+
+    response = tree.handle({"command": "check", "paths": [str(tmp_path)], "filter": {}})
+
+    assert response["ok"]
+    assert [fn["name"] for fn in response["functions"]] == ["a", "c"]
+
+    assert not tree.handle(
+        {"command": "check", "paths": [str(tmp_path.parent)], "filter": {}}
+    )["ok"]
+
+
+def test_check_with_daemon_roundtrip(tmp_path):
+    _write(tmp_path / "a.py", "def a():\n    pass\n\ndef _b():\n    pass\n")
+
+    tree = WatchedTree([tmp_path], PyGenDocsConfiguration(jobs=1))
+    tree.refresh()
+
+    # NOTE: Unix socket paths are limited to around 100 characters.
+    socket_path = os.path.join(tempfile.mkdtemp(), "watch.sock")
+
+    assert query_daemon(socket_path, {"command": "status"}) is None
+
+    stop = threading.Event()
+    thread = threading.Thread(target=serve, args=(tree, socket_path, 60.0, None, stop))
+    thread.start()
+
+    try:
+        for _ in range(100):
+            if os.path.exists(socket_path):
+                break
+            time.sleep(0.01)
+
+        cfg = PyGenDocsConfiguration()
+        functions, error = check_with_daemon(
+            socket_path, [tmp_path], FunctionFilter(ignore_internal=True), cfg
+        )
+
+        assert error is None
+        assert [fn.name for fn in functions] == ["a"]
+
+        ### Files saved since the last poll are answered from their current state
+        _write(tmp_path / "a.py", "def a():\n    pass\n\ndef d():\n    pass\n")
+        _write(tmp_path / "e.py", "def e():\n    pass\n")
+        _bump_mtime(tmp_path)
+
+        functions, error = check_with_daemon(
+            socket_path, [tmp_path], FunctionFilter(), cfg
+        )
+
+        assert [fn.name for fn in functions] == ["a", "d", "e"]
+
+        ### Clients finding files differently scan for themselves
+        cfg.exclude = cfg.exclude + ["e.py"]
+        functions, error = check_with_daemon(
+            socket_path, [tmp_path], FunctionFilter(), cfg
+        )
+
+        assert functions is None and "different" in error
+
+    finally:
+        stop.set()
+        thread.join()
+
+    assert not os.path.exists(socket_path)
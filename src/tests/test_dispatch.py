@@ -0,0 +1,212 @@
+import threading
+import time
+
+from pygendocs import dispatch
+from pygendocs.cache import DocstringCache
+from pygendocs.config import LLMConfiguration
+from pygendocs.functions import get_functions_from_file
+
+
+def _functions(tmp_path, count):
+    src = tmp_path / "module.py"
+    src.write_text(
+        "".join(f"def func_{i}():\n    return {i}\n\n" for i in range(count))
+    )
+
+    return get_functions_from_file(src)
+
+
+def test_dispatch_is_bounded_and_ordered(tmp_path, monkeypatch):
+    functions = _functions(tmp_path, 12)
+
+    lock = threading.Lock()
+    in_flight = 0
+    peak = 0
+
+    def fake_generate(body, cfg):
+        nonlocal in_flight, peak
+
+        with lock:
+            in_flight += 1
+            peak = max(peak, in_flight)
+
+        time.sleep(0.01)
+
+        with lock:
+            in_flight -= 1
+
+        if "func_3" in body:
+            raise TimeoutError("timed out")
+
+        return f"Docstring for {body.split('(')[0]}"
+
+    monkeypatch.setattr(dispatch, "generate_function_docstring", fake_generate)
+
+    snapshots = []
+    finished = {}
+
+    results = dispatch.generate_function_docstrings(
+        functions,
+        LLMConfiguration(model="test", api_token_env_key="KEY"),
+        concurrency=3,
+        on_progress=snapshots.append,
+        on_result=finished.__setitem__,
+    )
+
+    assert peak <= 3
+    assert list(results.docstrings) == [f for f in functions if f.name != "func_3"]
+    assert [f.name for f in results.errors] == ["func_3"]
+    assert finished == results.docstrings
+    assert all(isinstance(e, TimeoutError) for e in results.errors.values())
+
+    final = max(snapshots, key=lambda p: p.done + p.failed)
+    assert (final.done, final.failed, final.in_flight) == (11, 1, 0)
+
+
+def test_dispatch_serves_cached_docstrings(tmp_path, monkeypatch):
+    functions = _functions(tmp_path, 3)
+    cfg = LLMConfiguration(model="test", api_token_env_key="KEY")
+
+    calls = []
+
+    def fake_generate(body, cfg):
+        calls.append(body)
+        return "Docs"
+
+    monkeypatch.setattr(dispatch, "generate_function_docstring", fake_generate)
+
+    with DocstringCache.open(tmp_path / "cache") as cache:
+        first = dispatch.generate_function_docstrings(functions, cfg, cache=cache)
+        second = dispatch.generate_function_docstrings(functions, cfg, cache=cache)
+
+    assert len(calls) == 3
+    assert first.docstrings == second.docstrings
+    assert list(second.docstrings) == functions
+
+
+def test_dispatch_treats_empty_docstrings_as_failures(tmp_path, monkeypatch):
+    functions = _functions(tmp_path, 2)
+    cfg = LLMConfiguration(model="test", api_token_env_key="KEY")
+
+    def fake_generate(body, cfg):
+        return None if "func_0" in body else ""
+
+    monkeypatch.setattr(dispatch, "generate_function_docstring", fake_generate)
+
+    finished = {}
+
+    with DocstringCache.open(tmp_path / "cache") as cache:
+        results = dispatch.generate_function_docstrings(
+            functions, cfg, cache=cache, on_result=finished.__setitem__
+        )
+
+        assert cache.stats().entries == 0
+
+    assert results.docstrings == finished == {}
+    assert list(results.errors) == functions
+    assert all(isinstance(e, ValueError) for e in results.errors.values())
+
+
+def test_dispatch_batches_with_fallback(tmp_path, monkeypatch):
+    functions = _functions(tmp_path, 4)
+
+    batches = []
+    singles = []
+
+    def fake_batched(bodies, cfg):
+        batches.append(len(bodies))
+
+        if len(batches) == 2:
+            raise ValueError("max_tokens is too large")
+
+        # NOTE: Leave the last function unparsed.
+        return [f"Batched {i}" for i in range(len(bodies) - 1)] + [None]
+
+    def fake_generate(body, cfg):
+        singles.append(body)
+        return "Single"
+
+    monkeypatch.setattr(dispatch, "generate_function_docstrings_batched", fake_batched)
+    monkeypatch.setattr(dispatch, "generate_function_docstring", fake_generate)
+    monkeypatch.setattr(
+        dispatch, "pack_batches", lambda bodies, budget, model: [[0, 1], [2, 3]]
+    )
+
+    results = dispatch.generate_function_docstrings(
+        functions,
+        LLMConfiguration(model="test", api_token_env_key="KEY"),
+        batch_token_budget=100,
+    )
+
+    assert batches == [2, 2]
+    assert len(singles) == 3
+    assert not results.errors
+    assert list(results.docstrings.values()) == [
+        "Batched 0",
+        "Single",
+        "Single",
+        "Single",
+    ]
+
+
+def test_dispatch_streams_partial_docstrings(tmp_path, monkeypatch):
+    from pygendocs.llm import CompletionStats
+
+    functions = _functions(tmp_path, 2)
+
+    def fake_streamed(body, cfg, on_text=None):
+        on_text("Partial")
+        on_text("Partial docs")
+        return "Partial docs", CompletionStats(0.1, 0.5, 4)
+
+    monkeypatch.setattr(dispatch, "generate_function_docstring_streamed", fake_streamed)
+
+    partials = []
+
+    results = dispatch.generate_function_docstrings(
+        functions,
+        LLMConfiguration(model="test", api_token_env_key="KEY"),
+        stream=True,
+        on_partial=lambda fn, text: partials.append((fn.name, text)),
+    )
+
+    assert list(results.docstrings.values()) == ["Partial docs"] * 2
+    assert [s.tokens_per_second for s in results.stats.values()] == [10.0, 10.0]
+    assert partials[-1][1] is None
+    assert ("func_0", "Partial docs") in partials
+
+
+def test_identical_bodies_are_generated_once(tmp_path, monkeypatch):
+    functions = []
+
+    for i, name in enumerate(["helper", "helper", "other"]):
+        src = tmp_path / f"copy_{i}.py"
+        src.write_text(f"def {name}(x):\n    # copy {i}\n    return x  + 1\n")
+        functions += get_functions_from_file(src)
+
+    calls = []
+
+    def fake_generate(body, cfg):
+        calls.append(body)
+        return '"""Add one."""'
+
+    monkeypatch.setattr(dispatch, "generate_function_docstring", fake_generate)
+
+    cfg = LLMConfiguration(model="test", api_token_env_key="KEY")
+    finished = []
+
+    results = dispatch.generate_function_docstrings(
+        functions, cfg, deduplicate=True, on_result=lambda fn, d: finished.append(fn)
+    )
+
+    assert len(calls) == 2
+    assert list(results.docstrings) == functions
+    assert sorted(finished, key=functions.index) == functions
+    assert (results.generated, results.deduplicated) == (3, 1)
+
+    calls.clear()
+    results = dispatch.generate_function_docstrings(
+        functions, cfg, deduplicate=True, deduplicate_ignore_names=True
+    )
+
+    assert len(calls) == 1 and results.deduplicated == 2
@@ -0,0 +1,80 @@
+import openai
+import pytest
+
+from pygendocs.endpoints import Endpoint, EndpointPool
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _pool(n: int, clock: _Clock) -> EndpointPool:
+    return EndpointPool(
+        [Endpoint(f"http://replica-{i}", client=None) for i in range(n)],
+        eject_after=2,
+        eject_seconds=10.0,
+        clock=clock,
+    )
+
+
+def _fail(pool: EndpointPool) -> Endpoint:
+    with pytest.raises(openai.APIConnectionError):
+        with pool.endpoint() as endpoint:
+            raise openai.APIConnectionError(request=None)
+
+    return endpoint
+
+
+def test_routes_to_least_outstanding_endpoint():
+    pool = _pool(2, _Clock())
+
+    with pool.endpoint() as a:
+        with pool.endpoint() as b:
+            assert a is not b
+
+        with pool.endpoint() as c:
+            assert c is b
+
+    assert [e.requests for e in pool.endpoints] == [1, 2]
+
+
+def test_ejects_and_readmits_failing_endpoint():
+    clock = _Clock()
+    pool = _pool(2, clock)
+    bad = pool.endpoints[1]
+
+    # NOTE: Keep the other endpoint busy, so that failures land on `bad`.
+    with pool.endpoint():
+        assert _fail(pool) is bad
+        assert not pool.is_ejected(bad)
+        assert _fail(pool) is bad
+        assert pool.is_ejected(bad)
+
+        with pool.endpoint() as endpoint:
+            assert endpoint is not bad
+
+    clock.now = 11.0
+    assert not pool.is_ejected(bad)
+
+    # NOTE: A readmitted endpoint is ejected again by a single failure.
+    with pool.endpoint():
+        assert _fail(pool) is bad
+
+    assert pool.is_ejected(bad)
+    assert (bad.failures, bad.ejections) == (3, 2)
+
+
+def test_client_errors_do_not_eject():
+    pool = _pool(1, _Clock())
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            with pool.endpoint():
+                raise ValueError()
+
+    assert not pool.is_ejected(pool.endpoints[0])
+    assert pool.endpoints[0].failures == 0
@@ -0,0 +1,170 @@
+from pygendocs.functions import (
+    FunctionFilter,
+    IncrementalWriter,
+    get_functions_from_file,
+    get_functions_from_files,
+    write_new_docstrings,
+)
+
+
+def _write_sources(root, count=6):
+    files = []
+
+    for i in range(count):
+        f = root / f"module_{i}.py"
+        f.write_text(
+            f"def func_{i}():\n"
+            f"    return {i}\n"
+            "\n"
+            "\n"
+            "class Foo:\n"
+            "    def method(self):\n"
+            '        """Documented"""\n'
+            "        return 1\n"
+        )
+        files.append(f)
+
+    return files
+
+
+def test_parallel_parse_matches_serial(tmp_path):
+    """Parsing with a process pool returns the same functions in the same order."""
+    files = _write_sources(tmp_path)
+
+    serial = get_functions_from_files(files, jobs=1)
+    parallel = get_functions_from_files(files, jobs=3)
+
+    assert [(f.source_file, f.name) for f in serial] == [
+        (f.source_file, f.name) for f in parallel
+    ]
+    assert [f.has_docstring for f in serial] == [f.has_docstring for f in parallel]
+    assert len(serial) == 12
+
+
+def test_parse_no_files():
+    assert get_functions_from_files([], jobs=4) == []
+
+
+def test_write_new_docstrings_single_pass(tmp_path):
+    """All docstrings for a file are inserted in one atomic rewrite."""
+    files = _write_sources(tmp_path, count=2)
+    files[0].chmod(0o755)
+
+    functions = [f for f in get_functions_from_files(files) if not f.has_docstring]
+    write_new_docstrings({fn: f'"""Docs for {fn.name}"""' for fn in functions}, jobs=2)
+
+    assert files[0].stat().st_mode & 0o777 == 0o755
+    assert not list(tmp_path.glob(".*.tmp"))
+
+    rescanned = get_functions_from_files(files)
+
+    assert all(fn.has_docstring for fn in rescanned)
+    assert 'def func_0():\n    """Docs for func_0"""\n    return 0\n' in (
+        files[0].read_text()
+    )
+
+
+def test_write_through_symlink_keeps_link(tmp_path):
+    target = tmp_path / "real" / "module.py"
+    target.parent.mkdir()
+    target.write_text("def foo():\n    return 1\n")
+
+    link = tmp_path / "module.py"
+    link.symlink_to(target)
+
+    write_new_docstrings(
+        {fn: '"""Docs."""' for fn in get_functions_from_files([link])}, jobs=1
+    )
+
+    assert link.is_symlink()
+    assert '"""Docs."""' in target.read_text()
+    assert not list(target.parent.glob(".*.tmp"))
+
+
+def test_records_read_source_lazily(tmp_path):
+    src = tmp_path / "module.py"
+    src.write_text(
+        "class Foo:\n"
+        "    def method(self):\n"
+        "        def inner():\n"
+        "            return 'é'\n"
+        "\n"
+        "        return inner\n"
+    )
+
+    functions = {f.name: f for f in get_functions_from_files([src])}
+
+    assert functions["method"].qualified_name == "Foo.method"
+    assert functions["inner"].qualified_name == "Foo.method.<locals>.inner"
+    assert functions["inner"].source_str == "def inner():\n            return 'é'"
+    assert not hasattr(functions["inner"], "__dict__")
+
+
+def test_visitor_collects_async_and_qualified_names(tmp_path):
+    src = tmp_path / "module.py"
+    src.write_text(
+        "async def fetch():\n"
+        "    return 1\n"
+        "\n"
+        "\n"
+        "class Foo:\n"
+        "    def __init__(self):\n"
+        "        pass\n"
+        "\n"
+        "    def _helper(self):\n"
+        "        def run():\n"
+        "            pass\n"
+        "\n"
+        "    def __private(self):\n"
+        "        pass\n"
+        "\n"
+        "\n"
+        "if True:\n"
+        "    def run():\n"
+        "        pass\n"
+    )
+
+    everything = get_functions_from_files([src])
+
+    assert sorted(f.qualified_name for f in everything) == [
+        "Foo.__init__",
+        "Foo.__private",
+        "Foo._helper",
+        "Foo._helper.<locals>.run",
+        "fetch",
+        "run",
+    ]
+    assert len(set(everything)) == len(everything)
+
+    filtered = get_functions_from_files(
+        [src],
+        function_filter=FunctionFilter(
+            ignore_constructors=True, ignore_internal=True, ignore_private=True
+        ),
+    )
+
+    assert sorted(f.qualified_name for f in filtered) == [
+        "Foo._helper.<locals>.run",
+        "fetch",
+        "run",
+    ]
+
+
+def test_incremental_writer_writes_files_once_complete(tmp_path):
+    a, b = tmp_path / "a.py", tmp_path / "b.py"
+    a.write_text("def a1():\n    pass\n\ndef a2():\n    pass\n")
+    b.write_text("def b1():\n    pass\n")
+
+    a1, a2 = get_functions_from_file(a)
+    (b1,) = get_functions_from_file(b)
+
+    written = []
+
+    with IncrementalWriter([a1, a2, b1], on_write=lambda f, d: written.append(f)) as w:
+        w.put(a1, '"""A1."""')
+        w.put(b1, '"""B1."""')
+
+    # NOTE: b.py is complete first, and a.py is only written with what it got on close.
+    assert written == [str(b), str(a)]
+    assert set(w.written) == {a1, b1}
+    assert '"""A1."""' in a.read_text() and '"""' not in a.read_text().split("a2")[1]
@@ -0,0 +1,131 @@
+import subprocess
+
+from pygendocs.cli import get_functions_from_paths
+from pygendocs.config import PyGenDocsConfiguration
+from pygendocs.git import changed_line_ranges
+
+
+def _git(cwd, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@test", *args],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+    )
+
+
+def test_only_changed_functions_are_scanned(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    module = tmp_path / "pkg" / "module.py"
+    module.parent.mkdir()
+    module.write_text(
+        "def first():\n    return 1\n\n\ndef second():\n    return 2\n\n\n"
+        "def third():\n    return 3\n"
+    )
+    (tmp_path / "other.py").write_text("def untouched():\n    return 0\n")
+
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "initial")
+
+    module.write_text(module.read_text().replace("return 2", "return 22"))
+    _git(tmp_path, "add", str(module))
+    (tmp_path / "unstaged.py").write_text("def unstaged():\n    return 0\n")
+
+    changes = changed_line_ranges(staged=True)
+
+    assert changes == {str(module): [(6, 6)]}
+    assert changed_line_ranges("HEAD", paths=["other.py"]) == {}
+
+    cfg = PyGenDocsConfiguration(scan_index=False)
+    functions = get_functions_from_paths([tmp_path], cfg, changes=changes)
+
+    assert [fn.name for fn in functions] == ["second"]
+
+
+def test_untracked_files_are_changed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    (tmp_path / ".gitignore").write_text("ignored.py\n")
+    (tmp_path / "old.py").write_text("def old():\n    return 0\n")
+
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "initial")
+
+    new = tmp_path / "pkg" / "new.py"
+    new.parent.mkdir()
+    new.write_text("def new():\n    return 1\n\n\ndef newer():\n    return 2\n")
+    (tmp_path / "ignored.py").write_text("def ignored():\n    return 3\n")
+
+    changes = changed_line_ranges("HEAD")
+
+    assert changes == {str(new): [(1, 6)]}
+    assert changed_line_ranges(staged=True) == {}
+
+    cfg = PyGenDocsConfiguration(scan_index=False)
+    functions = get_functions_from_paths([tmp_path], cfg, changes=changes)
+
+    assert sorted(fn.name for fn in functions) == ["new", "newer"]
+
+
+def test_repo_has_changes_is_scoped_to_paths(tmp_path, monkeypatch):
+    from pygendocs.git import repo_has_changes
+
+    monkeypatch.chdir(tmp_path)
+
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "module.py").write_text("x = 1\n")
+    (tmp_path / ".gitignore").write_text("build/\n")
+
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "initial")
+
+    (tmp_path / "build").mkdir()
+    (tmp_path / "build" / "output.py").write_text("y = 2\n")
+    (tmp_path / ".pygendocs_cache").mkdir()
+    (tmp_path / ".pygendocs_cache" / "index").write_text("")
+
+    assert not repo_has_changes(exclude=[".pygendocs_cache"])
+    assert repo_has_changes()
+
+    (tmp_path / "docs.py").write_text("z = 3\n")
+
+    assert repo_has_changes()
+    assert not repo_has_changes(["src"])
+
+    (tmp_path / "src" / "module.py").write_text("x = 2\n")
+
+    assert repo_has_changes(["src"])
+
+
+def test_cache_dir_is_ignored_by_git(tmp_path, monkeypatch):
+    from pygendocs.cache import DocstringCache
+    from pygendocs.git import repo_has_changes
+
+    monkeypatch.chdir(tmp_path)
+
+    (tmp_path / "module.py").write_text("def foo():\n    return 1\n")
+
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "initial")
+
+    cfg = PyGenDocsConfiguration()
+    get_functions_from_paths([tmp_path], cfg)
+    DocstringCache.open(cfg.cache_dir).close()
+
+    assert (tmp_path / cfg.cache_dir / "scan_index.json").exists()
+
+    status = subprocess.run(
+        ["git", "status", "--porcelain", "--untracked-files=all"],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    assert status == ""
+    assert not repo_has_changes()
@@ -0,0 +1,81 @@
+import os
+
+from pygendocs import index as index_module
+from pygendocs.functions import FunctionFilter
+from pygendocs.index import ScanIndex, get_functions_with_index
+
+
+def test_unchanged_files_are_not_reparsed(tmp_path, monkeypatch):
+    src = tmp_path / "module.py"
+    src.write_text("def foo():\n    return 1\n")
+    cache_dir = tmp_path / "cache"
+
+    index = ScanIndex.load(cache_dir)
+    first = get_functions_with_index([src], index)
+    index.save()
+
+    parsed = []
+    real_parse_files = index_module.parse_files
+
+    def tracking_parse_files(files, jobs=1, function_filter=None):
+        parsed.extend(files)
+        return real_parse_files(files, jobs, function_filter)
+
+    monkeypatch.setattr(index_module, "parse_files", tracking_parse_files)
+
+    ### Unchanged file is served from the index
+    second = get_functions_with_index([src], ScanIndex.load(cache_dir))
+
+    assert parsed == []
+    assert [f.name for f in second] == [f.name for f in first] == ["foo"]
+
+    ### Touched, but unmodified, file is served from the index
+    st = os.stat(src)
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    get_functions_with_index([src], ScanIndex.load(cache_dir))
+
+    assert parsed == []
+
+    ### Modified file is parsed again
+    src.write_text("def bar():\n    return 2\n")
+
+    third = get_functions_with_index([src], ScanIndex.load(cache_dir))
+
+    assert parsed == [str(src)]
+    assert [f.name for f in third] == ["bar"]
+
+
+def test_rebuild_discards_index(tmp_path):
+    src = tmp_path / "module.py"
+    src.write_text("def foo():\n    return 1\n")
+
+    index = ScanIndex.load(tmp_path)
+    get_functions_with_index([src], index)
+    index.save()
+
+    assert ScanIndex.load(tmp_path).entries
+    assert not ScanIndex.load(tmp_path, rebuild=True).entries
+
+
+def test_index_is_reused_across_filters(tmp_path, monkeypatch):
+    src = tmp_path / "module.py"
+    src.write_text("def foo():\n    return 1\n\n\ndef _bar():\n    return 2\n")
+
+    index = ScanIndex.load(tmp_path)
+    get_functions_with_index([src], index)
+    index.save()
+
+    parsed = []
+    monkeypatch.setattr(
+        index_module, "parse_files", lambda files, jobs=1: parsed.extend(files) or []
+    )
+
+    functions = get_functions_with_index(
+        [src], ScanIndex.load(tmp_path), function_filter=FunctionFilter(True, True)
+    )
+
+    assert parsed == []
+    assert [f.name for f in functions] == ["foo"]
+    stored = ScanIndex.load(tmp_path).entries[str(src)].functions
+    assert sorted(f.name for f in stored) == ["_bar", "foo"]
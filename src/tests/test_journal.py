@@ -0,0 +1,28 @@
+from pygendocs.functions import get_functions_from_file
+from pygendocs.journal import RunJournal
+
+
+def test_resume_skips_changed_functions(tmp_path):
+    src = tmp_path / "module.py"
+    src.write_text("def a():\n    return 1\n\n\ndef b():\n    return 2\n")
+
+    a, b = get_functions_from_file(src)
+
+    journal = RunJournal.open(tmp_path / "cache")
+    journal.reset()
+    journal.append(a, '"""Doc a."""')
+    journal.append(b, '"""Doc b."""')
+
+    # NOTE: Simulate a run killed while writing a record.
+    with open(journal.path, "a") as f:
+        f.write('{"file": "trunc')
+
+    assert journal.resume([a, b]) == {a: '"""Doc a."""', b: '"""Doc b."""'}
+
+    src.write_text("def a():\n    return 1\n\n\ndef b():\n    return 3\n")
+    a, b = get_functions_from_file(src)
+
+    assert journal.resume([a, b]) == {a: '"""Doc a."""'}
+
+    journal.remove()
+    assert journal.resume([a, b]) == {}
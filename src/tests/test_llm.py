@@ -0,0 +1,148 @@
+from pygendocs import llm
+
+
+def test_parse_batched_reply():
+    reply = 'Sure!\n```json\n{"1": "First", "3": "", "4": 5}\n```'
+
+    assert llm._parse_batched_reply(reply, 4) == ["First", None, None, None]
+    assert llm._parse_batched_reply("not json", 2) == [None, None]
+    assert llm._parse_batched_reply(None, 2) == [None, None]
+
+
+def test_pack_batches(monkeypatch):
+    monkeypatch.setattr(llm, "count_tokens", lambda text, model: len(text))
+    monkeypatch.setattr(llm, "_BATCH_PROMPT_TEMPLATE", "{style}{count}{functions}")
+    monkeypatch.setattr(llm, "_BATCH_FUNCTION_TEMPLATE", "{function_body}")
+
+    bodies = ["a" * 40, "b" * 40, "c" * 30, "d" * 200, "e" * 10]
+
+    assert llm.pack_batches(bodies, 100, "gpt-4") == [[0, 1], [2], [3], [4]]
+
+    # NOTE: The 7 tokens of the prompt template count towards the budget too.
+    assert llm.pack_batches(bodies, 85, "gpt-4") == [[0], [1, 2], [3], [4]]
+
+
+def test_trim_function_body_keeps_signature_and_outcomes(monkeypatch):
+    monkeypatch.setattr(llm, "count_tokens", lambda text, model: len(text.split()))
+
+    body = (
+        "def f(a):\n"
+        + "".join(f"    x{i} = a + {i}\n" for i in range(50))
+        + "    if a:\n        raise ValueError(a)\n"
+        + "    def inner():\n        return 0\n"
+        + "    return x0"
+    )
+
+    trimmed = llm.trim_function_body(body, 40, "gpt-4").splitlines()
+
+    assert trimmed[:3] == ["def f(a):", "    x0 = a + 0", "    x1 = a + 1"]
+    assert trimmed[-4:] == [
+        "    if a:",
+        "        raise ValueError(a)",
+        "    # ... 2 lines omitted ...",
+        "    return x0",
+    ]
+    assert sum(len(line.split()) for line in trimmed) <= 40 + 2
+
+    cfg = llm.LLMConfiguration(
+        model="gpt-4", api_token_env_key="KEY", prompt_token_budget=1000
+    )
+    saved = []
+
+    assert llm.prepare_function_body(body, cfg, on_trim=saved.append) == body
+    assert saved == []
+
+    cfg = cfg.model_copy(update={"prompt_token_budget": 40})
+
+    assert llm.prepare_function_body(body, cfg, on_trim=saved.append) != body
+    assert len(saved) == 1 and saved[0] > 0
+
+
+def test_stream_completion_reports_partials_and_stats():
+    from types import SimpleNamespace
+
+    from pygendocs.config import LLMConfiguration
+
+    def chunk(content):
+        return SimpleNamespace(
+            choices=[SimpleNamespace(delta=SimpleNamespace(content=content))]
+        )
+
+    class FakeCompletions:
+        def create(self, **kwargs):
+            assert kwargs["stream"] is True
+            return iter([chunk(None), chunk("Adds "), chunk("two numbers.")])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()))
+    partials = []
+
+    text, stats = llm.stream_completion(
+        client,
+        LLMConfiguration(model="test", api_token_env_key="KEY"),
+        "Document this",
+        on_text=partials.append,
+    )
+
+    assert text == "Adds two numbers."
+    assert partials == ["Adds ", "Adds two numbers."]
+    assert stats.time_to_first_token is not None
+    assert stats.duration >= stats.time_to_first_token
+    assert stats.completion_tokens > 0
+
+
+def test_tokens_are_only_counted_across_several_endpoints(monkeypatch):
+    from types import SimpleNamespace
+
+    from pygendocs.config import LLMConfiguration
+    from pygendocs.endpoints import Endpoint, EndpointPool
+
+    class FakeCompletions:
+        def create(self, **kwargs):
+            message = SimpleNamespace(content='"""Docs."""')
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=message)],
+                usage=SimpleNamespace(prompt_tokens=10, completion_tokens=3),
+            )
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions()))
+    cfg = LLMConfiguration(model="test", api_token_env_key="KEY")
+
+    def no_tokenizer(text, model):
+        raise AssertionError("Counted tokens locally")
+
+    monkeypatch.setattr(llm, "count_tokens", no_tokenizer)
+
+    for replicas in (1, 2):
+        pool = EndpointPool([Endpoint(None, client) for _ in range(replicas)])
+        monkeypatch.setattr(llm, "get_endpoint_pool", lambda cfg: pool)
+
+        assert llm.generate_function_docstring("def foo(): pass", cfg) == '"""Docs."""'
+
+        tokens = sum(e.completion_tokens for e in pool.endpoints)
+        assert tokens == (3 if replicas > 1 else 0)
+
+
+def test_encoding_is_loaded_once_across_threads(monkeypatch):
+    import threading
+    import time
+
+    loads = []
+
+    def slow_load(model):
+        loads.append(model)
+        time.sleep(0.05)
+
+    monkeypatch.setattr(llm, "_load_encoding", slow_load)
+    monkeypatch.setattr(llm, "_ENCODINGS", {})
+
+    threads = [
+        threading.Thread(target=llm._get_encoding, args=("model",)) for _ in range(8)
+    ]
+
+    for t in threads:
+        t.start()
+
+    for t in threads:
+        t.join()
+
+    assert loads == ["model"]
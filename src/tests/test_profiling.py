@@ -0,0 +1,67 @@
+import json
+import subprocess
+import sys
+
+from pygendocs import profiling
+
+
+def test_spans_are_ignored_when_disabled():
+    with profiling.span("phase") as s:
+        s.add(files=1)
+
+    assert list(profiling.timed_iter("walk", [1, 2])) == [1, 2]
+    assert not profiling.is_enabled()
+
+
+def test_profiler_summarizes_and_traces_spans(tmp_path):
+    profiler = profiling.enable()
+
+    try:
+        with profiling.span("command"):
+            for _ in range(2):
+                with profiling.span("write.file", docstrings=2) as s:
+                    s.add(bytes=100)
+
+            assert list(profiling.timed_iter("scan.walk", "abc")) == ["a", "b", "c"]
+    finally:
+        profiling.disable()
+
+    summary = {p.name: p for p in profiler.summary()}
+
+    assert list(summary) == ["command", "write.file", "scan.walk"]
+    assert summary["write.file"].calls == 2
+    assert summary["write.file"].attrs == {"docstrings": 4, "bytes": 200}
+    assert summary["scan.walk"].attrs == {"items": 3}
+    assert summary["command"].total >= summary["write.file"].total
+
+    profiler.write_trace(tmp_path / "trace.json", command="check")
+    trace = json.loads((tmp_path / "trace.json").read_text())
+
+    assert trace["command"] == "check"
+    assert [s["name"] for s in trace["spans"]][0] == "command"
+
+
+def test_profile_does_not_corrupt_json_report(tmp_path):
+    (tmp_path / "module.py").write_text("def foo():\n    return 1\n")
+
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pygendocs",
+            "check",
+            ".",
+            "--profile",
+            "--format",
+            "json",
+        ],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+    records = [json.loads(line) for line in proc.stdout.splitlines()]
+
+    assert records[-1]["type"] == "summary"
+    assert "profile trace" in proc.stderr
@@ -0,0 +1,58 @@
+import io
+import json
+
+from pygendocs.functions import get_functions_from_file
+from pygendocs.report import CoverageSummary, ReportFormat, get_reporter
+
+
+def _report(tmp_path, monkeypatch, fmt, quiet=False):
+    monkeypatch.chdir(tmp_path)
+
+    (tmp_path / "module.py").write_text(
+        "def first():\n    pass\n\n\nclass A:\n    def second(self):\n        pass\n"
+    )
+    functions = get_functions_from_file(tmp_path / "module.py")
+
+    out = io.StringIO()
+    reporter = get_reporter(fmt, out, quiet)
+
+    for fn in functions:
+        reporter.function(fn)
+
+    reporter.finish(CoverageSummary(functions=4, missing=2, threshold=80))
+
+    return out.getvalue()
+
+
+def test_text_and_json_reports(tmp_path, monkeypatch):
+    assert _report(tmp_path, monkeypatch, ReportFormat.text).splitlines() == [
+        "module.py:1:1: first is missing a docstring",
+        "module.py:6:5: A.second is missing a docstring",
+        "50.00% of 4 functions have docstrings (threshold 80%): failed",
+    ]
+
+    records = [
+        json.loads(line)
+        for line in _report(tmp_path, monkeypatch, ReportFormat.json).splitlines()
+    ]
+
+    assert [r["qualified_name"] for r in records[:2]] == ["first", "A.second"]
+    assert records[-1]["type"] == "summary" and records[-1]["passed"] is False
+
+    quiet = _report(tmp_path, monkeypatch, ReportFormat.json, quiet=True)
+    assert len(quiet.splitlines()) == 1
+
+
+def test_sarif_report_is_valid_json(tmp_path, monkeypatch):
+    log = json.loads(_report(tmp_path, monkeypatch, ReportFormat.sarif))
+    run = log["runs"][0]
+
+    assert log["version"] == "2.1.0"
+    assert [
+        r["locations"][0]["physicalLocation"]["region"]["startLine"]
+        for r in run["results"]
+    ] == [1, 6]
+    assert run["properties"]["coverage"] == 50.0
+
+    empty = json.loads(_report(tmp_path, monkeypatch, ReportFormat.sarif, quiet=True))
+    assert empty["runs"][0]["results"] == []
@@ -0,0 +1,116 @@
+import pytest
+
+from pygendocs.scheduler import AIMDLimiter, RequestScheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = FakeResponse(headers or {})
+
+
+def test_token_bucket_throttles():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock, clock.sleep)
+
+    bucket.acquire(60)
+    bucket.acquire(30)
+
+    assert clock.now == pytest.approx(30)
+
+
+def test_aimd_limiter():
+    clock = FakeClock()
+    limiter = AIMDLimiter(8, clock=clock)
+
+    limiter.on_overload()
+    assert limiter.limit == 4
+
+    ### Repeated overloads within one latency window only count once
+    limiter.on_overload()
+    assert limiter.limit == 4
+
+    for _ in range(40):
+        clock.now += 1
+        limiter.on_success(1.0)
+
+    assert limiter.limit == 8
+
+    ### A latency spike reduces the limit
+    clock.now += 10
+    limiter.on_success(10.0)
+    assert limiter.limit == 4
+
+
+def test_scheduler_retries_with_retry_after():
+    clock = FakeClock()
+    scheduler = RequestScheduler(
+        max_retries=3, base_delay=0.0, clock=clock, sleep=clock.sleep
+    )
+
+    attempts = []
+
+    def request():
+        attempts.append(clock.now)
+
+        if len(attempts) == 1:
+            raise FakeStatusError(429, {"retry-after": "7"})
+        if len(attempts) == 2:
+            raise FakeStatusError(503)
+
+        return "ok"
+
+    retries = []
+
+    assert scheduler.call(request, on_retry=lambda e, d: retries.append(d)) == "ok"
+    assert len(attempts) == 3
+    assert retries[0] == 7
+
+
+def test_scheduler_does_not_retry_client_errors():
+    scheduler = RequestScheduler(max_retries=3, sleep=lambda s: None)
+
+    attempts = []
+
+    def request():
+        attempts.append(1)
+        raise FakeStatusError(400)
+
+    with pytest.raises(FakeStatusError):
+        scheduler.call(request)
+
+    assert len(attempts) == 1
+
+
+def test_scheduler_gives_up_after_max_retries():
+    scheduler = RequestScheduler(max_retries=2, base_delay=0.0, sleep=lambda s: None)
+
+    attempts = []
+
+    def request():
+        attempts.append(1)
+        raise FakeStatusError(500)
+
+    with pytest.raises(FakeStatusError):
+        scheduler.call(request)
+
+    assert len(attempts) == 3
@@ -0,0 +1,77 @@
+"""Guards against regressions in the startup time of the pygendocs cli.
+
+`check` is commonly run as a pre-commit hook, so it must not pay for importing
+the llm or git dependencies it never uses.
+"""
+import subprocess
+import sys
+import time
+
+import pytest
+
+HEAVY_MODULES = ["openai", "tiktoken", "git"]
+
+STARTUP_BUDGET_SECONDS = 3.0
+"""Generous wall time budget, to catch large regressions without being flaky."""
+
+
+def _run_python(code: str, cwd) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+
+
+def _loaded_heavy_modules_after(statement: str, cwd) -> list:
+    code = "\n".join(
+        [
+            "import sys",
+            "from pygendocs.__main__ import app",
+            "try:",
+            f"    {statement}",
+            "except SystemExit:",
+            "    pass",
+            f"print('LOADED:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+        ]
+    )
+
+    proc = _run_python(code, cwd)
+    assert proc.returncode == 0, proc.stderr
+
+    loaded = proc.stdout.rsplit("LOADED:", 1)[-1].strip()
+
+    return [m for m in loaded.split(",") if m]
+
+
+def test_import_does_not_load_heavy_modules(tmp_path):
+    assert _loaded_heavy_modules_after("pass", tmp_path) == []
+
+
+def test_check_does_not_load_heavy_modules(tmp_path):
+    (tmp_path / "module.py").write_text("def foo():\n    return 1\n")
+
+    statement = f"app(['check', {str(tmp_path)!r}, '--no-index'])"
+
+    assert _loaded_heavy_modules_after(statement, tmp_path) == []
+
+
+@pytest.mark.parametrize(
+    "args", [["check", "--help"], ["check", ".", "--no-index"]], ids=["help", "noop"]
+)
+def test_check_startup_time(tmp_path, args):
+    start = time.perf_counter()
+
+    proc = subprocess.run(
+        [sys.executable, "-m", "pygendocs", *args],
+        cwd=tmp_path,
+        capture_output=True,
+        timeout=60,
+    )
+
+    elapsed = time.perf_counter() - start
+
+    assert proc.returncode == 0, proc.stderr
+    assert elapsed < STARTUP_BUDGET_SECONDS
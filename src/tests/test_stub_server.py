@@ -0,0 +1,45 @@
+from pygendocs import llm
+from pygendocs.bench import run_load_test, write_load_test_functions
+from pygendocs.config import LLMConfiguration, PyGenDocsConfiguration
+from pygendocs.stub_server import StubServer, StubServerConfig
+
+
+def test_stub_server_plain_and_streamed_completions(monkeypatch):
+    monkeypatch.setenv("STUB_KEY", "stub")
+
+    config = StubServerConfig(latency=0.01, latency_sigma=0, completion_tokens=5)
+
+    with StubServer(config) as server:
+        cfg = LLMConfiguration(
+            model="stub", api_token_env_key="STUB_KEY", base_url=server.url
+        )
+        client = llm.get_llm_api_client(cfg)
+
+        plain = llm.dispatch_completion(client, cfg, "Say hello")
+        streamed, stats = llm.stream_completion(client, cfg, "Say hello")
+
+    assert plain == streamed == '""" word word word."""'
+    assert stats.time_to_first_token >= 0.01
+    assert server.requests == 2
+
+
+def test_load_test_counts_failed_attempts(tmp_path, monkeypatch):
+    monkeypatch.setenv("STUB_KEY", "stub")
+
+    config = StubServerConfig(
+        latency=0.001, latency_sigma=0, error_rate=1.0, tokens_per_second=0
+    )
+
+    with StubServer(config) as server:
+        cfg = PyGenDocsConfiguration(
+            llm_api_url=server.url,
+            llm_api_token_env_key="STUB_KEY",
+            llm_max_retries=0,
+            cache_dir=str(tmp_path / "cache"),
+        )
+
+        result = run_load_test(write_load_test_functions(tmp_path, 3), cfg)
+
+    assert (result.succeeded, result.failed) == (0, 3)
+    assert result.errors == {"HTTP 500": 3}
+    assert result.latency_percentile(50) is None
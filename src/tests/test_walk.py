@@ -0,0 +1,65 @@
+import os
+
+from pygendocs.walk import IgnoreSpec, iter_source_files
+
+
+def _touch(root, *paths):
+    for p in paths:
+        f = root / p
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_text("")
+
+
+def test_walk_is_sorted_and_prunes(tmp_path):
+    _touch(
+        tmp_path,
+        "b.py",
+        "a/z.py",
+        "a/b/c.py",
+        "a/notes.txt",
+        "node_modules/pkg/x.py",
+        "generated/out.py",
+        "generated/keep.py",
+        "src/build/skip.py",
+    )
+    (tmp_path / ".gitignore").write_text("generated/*\n!generated/keep.py\n")
+
+    files = list(
+        iter_source_files(
+            [tmp_path, tmp_path / "a"],
+            exclude=["node_modules", "build/"],
+            base=tmp_path,
+        )
+    )
+    rel = [os.path.relpath(f, tmp_path) for f in files]
+
+    assert rel == ["a/b/c.py", "a/z.py", "b.py", "generated/keep.py"]
+    assert rel == sorted(rel, key=lambda p: p.split("/"))
+
+
+def test_explicit_files_ignore_excludes(tmp_path):
+    _touch(tmp_path, "build/skip.py", "build/notes.txt")
+
+    files = list(
+        iter_source_files(
+            [tmp_path / "build/skip.py", tmp_path / "build/notes.txt"],
+            exclude=["build"],
+        )
+    )
+
+    assert files == [str(tmp_path / "build/skip.py")]
+
+
+def test_ignore_spec_patterns(tmp_path):
+    spec = IgnoreSpec(["*.log", "/top.py", "docs/**/gen_*.py", "out/"], tmp_path)
+
+    def match(rel, is_dir=False):
+        return spec.match(str(tmp_path / rel), is_dir)
+
+    assert match("deep/dir/error.log")
+    assert match("top.py")
+    assert match("pkg/top.py") is None
+    assert match("docs/gen_a.py")
+    assert match("docs/x/y/gen_b.py")
+    assert match("out", is_dir=True)
+    assert match("out") is None